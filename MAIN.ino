@@ -4,6 +4,7 @@
 #include "DHT.h"
 #include <RH_ASK.h>
 #include <SPI.h> // dla kompilacji RH_ASK
+#include <util/crc16.h>
 // ---------- Piny HX711 ----------
 const int DT_PIN     = 10;
 const int SCK_PIN    = 3;
@@ -44,6 +45,40 @@ const float CHANGE_THRESHOLD = 0.1;  // kg
 // ---------- ASK radio ----------
 RH_ASK rf_driver;
 
+// ---------- Ramka binarna (pasieka/frame.py, wersja 1) ----------
+const uint8_t HIVE_ID    = 1;     // numer ula, inny w każdym nadajniku
+const uint8_t FRAME_MAGIC = 0xBE;
+const uint8_t FRAME_VERSION = 1;
+const uint8_t FLAG_BOOT  = 0x01;  // pierwsza ramka po starcie
+struct __attribute__((packed)) Frame {
+  uint8_t magic, version, hive, flags;
+  uint16_t seq;
+  int32_t mass;                   // g
+  int16_t t1, h1, t2, h2;         // 0.1 C / 0.1 %
+  uint16_t crc;                   // CRC-16/CCITT-FALSE bajtów przed crc
+};
+uint16_t frame_seq = 0;
+uint8_t frame_flags = FLAG_BOOT;
+
+int16_t tenths(float v) {
+  return isnan(v) ? INT16_MIN : (int16_t)round(v * 10.0);
+}
+
+void send_frame(float mass, float t1, float h1, float t2, float h2) {
+  Frame f;
+  f.magic = FRAME_MAGIC; f.version = FRAME_VERSION; f.hive = HIVE_ID; f.flags = frame_flags;
+  f.seq = frame_seq++;
+  f.mass = isnan(mass) ? INT32_MIN : (int32_t)round(mass * 1000.0);
+  f.t1 = tenths(t1); f.h1 = tenths(h1); f.t2 = tenths(t2); f.h2 = tenths(h2);
+  uint16_t crc = 0xFFFF;
+  const uint8_t *p = (const uint8_t*)&f;
+  for (uint8_t i = 0; i < offsetof(Frame, crc); i++) crc = _crc_xmodem_update(crc, p[i]);
+  f.crc = crc;
+  frame_flags = 0;
+  rf_driver.send((uint8_t*)&f, sizeof(f));
+  rf_driver.waitPacketSent();
+}
+
 
 
 int elapsed_time = 0;
@@ -227,14 +262,11 @@ elapsed_time++;
 
 
 
-    String msg = "" + String(mass, 3) + "kg " + String(t1, 1)
-           + "C " + String(h1, 1) + "% " + String(t2, 1)
-           + "C " + String(h2, 1) + "%";
-
-  rf_driver.send((uint8_t*)msg.c_str(), msg.length());
-  rf_driver.waitPacketSent();
+    // 20 B ramki binarnej zamiast ~40 znaków tekstu (odbiornik.ino wypisuje ją jako "B:<hex>")
+    send_frame(mass, t1, h1, t2, h2);
     // debug
-    Serial.print("RF-> "); Serial.print(msg); Serial.print("   "); Serial.println(h1);
+    Serial.print("RF-> #"); Serial.print(frame_seq - 1); Serial.print(" "); Serial.print(mass, 3);
+    Serial.print("kg "); Serial.print(t1, 1); Serial.print("C "); Serial.println(h1);
     elapsed_time = 0;
   }
 
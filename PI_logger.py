@@ -24,23 +24,104 @@ i dopisuje je linia po linii do pliku logu.
      1) ścieżka do portu szeregowego (np. /dev/ttyACM0)
      2) prędkość transmisji (baudrate), np. 115200
      3) ścieżka do pliku, w który będziemy dopisywać log
+     4) (opcjonalnie) polityka fsync: none, interval (domyślnie), every-batch
+
+   Opcje (na końcu):
+     --bulk       odbiór hurtowy (pasieka/bulk.py): read(in_waiting), podział
+                  na linie na bajtach, jeden odczyt zegara na partię - przy
+                  wyższym baudrate albo wielu ulach zwykła pętla nie nadąża
+     --echo=S     ostatnia odebrana linia na konsolę najwyżej co S sekund
+                  (w trybie --bulk zamiast podsumowania każdej partii)
+
+   Log zapisywany jest partiami (pasieka/logwriter.py), nie linia po linii:
+   mniej zapisów na kartę SD, a po zaniku zasilania ginie najwyżej partia.
 """
 
 import sys
 import serial
 import time
 
+from pasieka.bulk import BatchClock, Echo, read_available, take_lines
+from pasieka.logwriter import POLICIES, LogWriter
+
+
+def log_lines(ser, logfile, echo=None):
+    # Zwykła pętla: linia po linii
+    while True:
+        try:
+            line = ser.readline().decode('utf-8', errors='replace').strip()
+            logfile.maybe_flush()   # readline wraca co sekundę (timeout=1) także bez danych
+            if line:
+                # Domyślnie linie już zawierają newline, więc strip() usuwa \r\n
+                timestamp_pi = time.strftime("%Y-%m-%d %H:%M:%S")
+                # Możemy zapisać: <timestamp_pi>;<dane_z_arduino>
+                zapis = f"{timestamp_pi};{line}\n"
+                logfile.write(zapis)
+                if echo:
+                    echo([line.encode()])
+        except serial.SerialException as e:
+            print(f"Błąd odczytu z portu: {e}")
+            break
+        except UnicodeDecodeError:
+            # Ignorujemy linie, których nie da się zdekodować
+            continue
+
+
+def log_bulk(ser, logfile, echo=None):
+    # Odbiór hurtowy: wszystko, co czeka w porcie, jako jedna partia
+    buf = bytearray()
+    clock = BatchClock(ser.baudrate / 10)      # 8N1: 10 bitów na bajt
+    while True:
+        try:
+            buf += read_available(ser)     # bez danych wraca po timeout=1
+        except serial.SerialException as e:
+            print(f"Błąd odczytu z portu: {e}")
+            break
+        lines, after = take_lines(buf)
+        if lines:
+            logfile.write_lines(clock.format(lines, after))
+            if echo:
+                echo(lines)
+        else:
+            logfile.maybe_flush()
+
+
+def parse_args(argv):
+    # (argumenty pozycyjne, opcje) albo None, gdy coś się nie zgadza
+    args, options = [], {'bulk': False, 'echo': None}
+    for a in argv[1:]:
+        name, _, value = a.partition('=')
+        if name == '--bulk' and not value:
+            options['bulk'] = True
+        elif name == '--echo':
+            options['echo'] = float(value or 1.0)
+        elif a.startswith('--'):
+            return None
+        else:
+            args.append(a)
+    if len(args) not in (3, 4) or len(args) == 4 and args[3] not in POLICIES:
+        return None
+    return args, options
+
+
 def main():
-    if len(sys.argv) != 4:
-        print("Użycie: {} <port_szeregowy> <baudrate> <plik_z_logiem>".format(sys.argv[0]))
+    try:
+        parsed = parse_args(sys.argv)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        print("Użycie: {} <port_szeregowy> <baudrate> <plik_z_logiem> [{}] [--bulk] [--echo=S]".format(
+            sys.argv[0], "|".join(POLICIES)))
         sys.exit(1)
+    args, options = parsed
 
-    port_name = sys.argv[1]
-    baud_rate = int(sys.argv[2])
-    log_filename = sys.argv[3]
+    port_name = args[0]
+    baud_rate = int(args[1])
+    log_filename = args[2]
+    policy = args[3] if len(args) == 4 else 'interval'
 
     try:
-        ser = serial.Serial(port=port_name, baudrate=baud_rate, timeout=1)
+        ser = serial.serial_for_url(port_name, baudrate=baud_rate, timeout=1)  # także socket:// (pasieka/replay.py)
     except serial.SerialException as e:
         print(f"Błąd otwarcia portu szeregowego: {e}")
         sys.exit(1)
@@ -49,23 +130,15 @@ def main():
 
     # Główna pętla odbierająca dane:
     try:
-        with open(log_filename, "a", buffering=1) as logfile:  # buffering=1 -> linia po linii
-            while True:
-                try:
-                    line = ser.readline().decode('utf-8', errors='replace').strip()
-                    if line:
-                        # Domyślnie linie już zawierają newline, więc strip() usuwa \r\n
-                        timestamp_pi = time.strftime("%Y-%m-%d %H:%M:%S")
-                        # Możemy zapisać: <timestamp_pi>;<dane_z_arduino>
-                        zapis = f"{timestamp_pi};{line}\n"
-                        logfile.write(zapis)
-                        print(f"Zapisano: {zapis.strip()}")
-                except serial.SerialException as e:
-                    print(f"Błąd odczytu z portu: {e}")
-                    break
-                except UnicodeDecodeError:
-                    # Ignorujemy linie, których nie da się zdekodować
-                    continue
+        # wypisujemy podsumowanie partii zamiast każdej linii
+        def report(lines, size):
+            print(f"Zapisano {lines} linii ({size} B), ostatnia: {logfile.tail(1)[0].strip()}")
+
+        with LogWriter(log_filename, policy, on_flush=None if options['bulk'] else report) as logfile:
+            if logfile.recovered:
+                print(f"Obcięto {logfile.recovered} B uszkodzonego końca logu.")
+            echo = Echo(options['echo']) if options['echo'] is not None else None
+            (log_bulk if options['bulk'] else log_lines)(ser, logfile, echo)
     except KeyboardInterrupt:
         print("Przerwano działanie skryptu przez użytkownika (CTRL+C).")
     finally:
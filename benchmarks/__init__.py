@@ -0,0 +1 @@
+"""Pomiary wydajności; uruchamiać z katalogu głównego: python3 -m benchmarks.<nazwa>."""
@@ -0,0 +1,78 @@
+"""
+Opóźnienie komend AT: silnik z kodem końcowym vs stary send_at ze sleepem.
+
+    python3 -m benchmarks.bench_at [--latency 0.05] [-n 20] [--legacy]
+
+Modem jest udawany (pasieka.fake_modem) na pty, więc wynik nie zależy od
+sieci GSM, tylko od samego sposobu czytania odpowiedzi.
+"""
+
+import argparse
+import statistics
+import time
+
+import serial
+
+from pasieka.fake_modem import FakeModem
+from pasieka.modem import ATEngine
+
+
+def legacy_send_at(cmd, ser, timeout=2):
+    # kopia dawnego send_at z merge1.py
+    ser.write((cmd + '\r').encode())
+    time.sleep(timeout)
+    lines = []
+    while ser.in_waiting:
+        line = ser.readline().decode(errors='ignore').strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def bench_engine(port, n):
+    ser = serial.Serial(port, 115200)
+    modem = ATEngine(ser)
+    modem.command('ATE0')
+    times = []
+    for _ in range(n):
+        resp = modem.command('AT+CMGF=1')
+        assert resp.ok, resp
+        times.append(resp.elapsed)
+    ser.close()
+    return times
+
+
+def bench_legacy(port, n):
+    ser = serial.Serial(port, 115200, timeout=1)
+    times = []
+    for _ in range(n):
+        t0 = time.monotonic()
+        legacy_send_at('AT+CMGF=1', ser)
+        times.append(time.monotonic() - t0)
+    ser.close()
+    return times
+
+
+def report(name, times):
+    print(f"{name:8s} n={len(times):3d}  mediana={statistics.median(times) * 1000:8.1f} ms  "
+          f"max={max(times) * 1000:8.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--latency', type=float, default=0.05, help='opóźnienie odpowiedzi modemu [s]')
+    ap.add_argument('-n', type=int, default=20, help='liczba komend')
+    ap.add_argument('--legacy', action='store_true', help='zmierz też stary send_at (2 s na komendę)')
+    args = ap.parse_args()
+
+    modem = FakeModem(latency=args.latency).start()
+    try:
+        report('engine', bench_engine(modem.port, args.n))
+        if args.legacy:
+            report('legacy', bench_legacy(modem.port, min(args.n, 3)))
+    finally:
+        modem.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Czas składania odpowiedzi na komendy SMS (pasieka/commands.py) przy
+agregatach z całego sezonu.
+
+    python3 -m benchmarks.bench_commands [--days 180]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from pasieka.commands import CommandHandler
+from pasieka.rollup import Rollup, rebuild
+from pasieka.telemetry import SAMPLE_DTYPE, Sample
+
+QUERIES = ['status', 'avg 24h', 'delta 7d', 'min temp tonight', 'max mass 3d', 'history mass 3d', 'avg 90m']
+
+
+def synthetic_season(days, period=6):
+    n = days * 86400 // period
+    now = time.time()
+    s = np.zeros(n, dtype=SAMPLE_DTYPE)
+    phase = np.arange(n) / (86400 / period) * 2 * np.pi
+    s['ts'] = now - n * period + np.arange(n) * period
+    s['mass'] = 30 + np.sin(phase) + np.arange(n) * 1e-5
+    s['t1'] = 15 + 5 * np.sin(phase)
+    s['h1'] = 55
+    s['t2'] = 20
+    s['h2'] = 60
+    return s
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('--days', type=int, default=180)
+    ap.add_argument('-n', type=int, default=50, help='powtórzeń na komendę')
+    args = ap.parse_args()
+
+    samples = synthetic_season(args.days)
+    with tempfile.TemporaryDirectory() as d:
+        rebuild(d, samples)
+        rollup = Rollup(d)
+        rollup.add(Sample(*samples[-1].tolist()))
+        handler = CommandHandler(lambda: Sample(*samples[-1].tolist()), rollup)
+        for q in QUERIES:
+            times = []
+            for _ in range(args.n):
+                reply = handler.handle(q)
+                times.append(handler.last_elapsed)
+            print(f"{q:18s} mediana={statistics.median(times) * 1000:6.2f} ms  "
+                  f"max={max(times) * 1000:6.2f} ms  {len(reply):3d} zn.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Przepustowość zapisu logu: open(buffering=1) kontra LogWriter z każdą
+polityką fsync (pasieka/logwriter.py). Na Pi warto podać --dir na karcie SD.
+
+    python3 -m benchmarks.bench_logwriter [-n 20000] [--dir /home/pi/tmp]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from pasieka.logwriter import POLICIES, LogWriter
+from pasieka.telemetry import format_log_line
+
+RAW = "31.234kg 21.5C 55.0% 22.1C 60.2%"
+
+
+def bench_line_buffered(path, lines):
+    t = time.perf_counter()
+    with open(path, 'a', buffering=1, encoding='utf-8') as f:
+        for line in lines:
+            f.write(line)
+    return time.perf_counter() - t
+
+
+def bench_writer(path, lines, policy, batch_lines):
+    t = time.perf_counter()
+    # fsync_interval=0.5 s, żeby polityka interval zrobiła kilka fsync w krótkim pomiarze
+    with LogWriter(path, policy, batch_lines=batch_lines, fsync_interval=0.5) as w:
+        for line in lines:
+            w.write(line)
+    return time.perf_counter() - t, w.counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('-n', type=int, default=20000, help='liczba linii')
+    ap.add_argument('--batch', type=int, default=64, help='linii na partię')
+    ap.add_argument('--dir', default=None, help='katalog na pliki testowe')
+    args = ap.parse_args()
+
+    now = time.time()
+    lines = [format_log_line(now + i, RAW) for i in range(args.n)]
+    with tempfile.TemporaryDirectory(dir=args.dir) as d:
+        dt = bench_line_buffered(os.path.join(d, 'buffering1.csv'), lines)
+        print(f"{'buffering=1':12s} {args.n / dt:10.0f} linii/s")
+        for policy in POLICIES:
+            dt, counts = bench_writer(os.path.join(d, f'{policy}.csv'), lines, policy, args.batch)
+            print(f"{policy:12s} {args.n / dt:10.0f} linii/s  "
+                  f"partie={counts['batches']} fsync={counts['fsyncs']}")
+
+
+if __name__ == '__main__':
+    main()
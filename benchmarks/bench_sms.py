@@ -0,0 +1,86 @@
+"""
+Obciążenie ścieżki SMS w merge1.py na udawanym modemie (pasieka.fake_modem):
+seria zapytań od właściciela i czas do wysłania każdej odpowiedzi.
+
+    python3 -m benchmarks.bench_sms [-n 500] [--mode cmt|sim] [--latency 0.02 --jitter 0.01]
+
+cmt - zapytania przychodzą jako URC +CMT (AT+CNMI=2,2), jedno po drugim,
+sim - n wiadomości czeka w skrzynce SIM przy starcie (przegląd AT+CMGL).
+
+Losowość modemu ma stałe ziarno, więc kolejne uruchomienia są porównywalne.
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+import merge1
+from pasieka.aio import open_serial
+from pasieka.commands import CommandHandler
+from pasieka.fake_modem import FakeModem
+from pasieka.modem import AsyncATEngine
+from pasieka.outbox import Outbox, RateLimiter
+from pasieka.rollup import Rollup
+
+
+async def run(fake, args, directory):
+    merge1.commands = CommandHandler(lambda: None, Rollup(directory))
+    # bez limitu na odbiorcę - mierzymy sam modem i kolejkę
+    merge1.outbox = Outbox(limiter=RateLimiter(rate=1e9, burst=1e9), retry_delay=0.05)
+    modem = AsyncATEngine()
+    transport = await open_serial(fake.port, 115200, modem)
+    modem.on('+CMT', lambda u: merge1.on_cmt(u, modem))
+    tasks = [asyncio.create_task(modem.dispatch()), asyncio.create_task(merge1.outbox.run())]
+    await merge1.init_modem(modem)
+    fake.error_rate = args.error_rate   # błędy dopiero po konfiguracji (bez AT+CNMI nie ma +CMT)
+    merge1.outbox.attach(modem)
+
+    t0 = time.monotonic()
+    if args.mode == 'sim':
+        delivered = [t0] * args.n
+        await merge1.sweep_inbox(modem)
+    else:
+        loop = asyncio.get_running_loop()
+        delivered = await loop.run_in_executor(None, fake.burst, args.n, merge1.TARGET_NUMBER, 'status')
+    while len(fake.sent) < args.n and time.monotonic() - t0 < args.timeout:
+        await asyncio.sleep(0.01)
+    total = time.monotonic() - t0
+    for t in tasks:
+        t.cancel()
+    transport.close()
+    return delivered, total
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument('-n', type=int, default=500, help='liczba zapytań')
+    ap.add_argument('--mode', choices=('cmt', 'sim'), default='cmt')
+    ap.add_argument('--latency', type=float, default=0.02, help='opóźnienie odpowiedzi modemu [s]')
+    ap.add_argument('--jitter', type=float, default=0.01, help='losowy dodatek do opóźnienia [s]')
+    ap.add_argument('--error-rate', type=float, default=0.0, help='odsetek komend z błędem')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--timeout', type=float, default=600.0)
+    args = ap.parse_args()
+
+    fake = FakeModem(args.latency, args.jitter, capacity=max(30, args.n), seed=args.seed).start()
+    if args.mode == 'sim':
+        fake.fill_inbox(args.n, sender=merge1.TARGET_NUMBER, text='status')
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            delivered, total = asyncio.run(run(fake, args, d))
+    finally:
+        fake.stop()
+    latency = [s - d for s, d in zip(fake.sent_times, delivered)]
+    print(f"{args.mode}: {len(fake.sent)}/{args.n} odpowiedzi w {total:.2f} s "
+          f"({len(fake.sent) / total:.1f}/s), komend AT: {fake.commands}, "
+          f"ponowień: {merge1.outbox.counts['retried']}")
+    if latency:
+        q = statistics.quantiles(latency, n=100, method='inclusive') if len(latency) > 1 else latency * 99
+        print(f"opóźnienie odpowiedzi: mediana={statistics.median(latency) * 1000:.0f} ms  "
+              f"p95={q[94] * 1000:.0f} ms  max={max(latency) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
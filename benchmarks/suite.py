@@ -0,0 +1,643 @@
+"""
+Zestaw pomiarów gorących ścieżek po stronie Pi, z wynikiem w stałym
+formacie JSON do porównywania commitów (i Pi z komputerem).
+
+    python3 -m benchmarks.suite run [-o wynik.json] [--quick] [--only parse_cmgl,ingest]
+    python3 -m benchmarks.suite compare stary.json nowy.json [--threshold 0.10]
+
+Przypadki:
+
+* ingest      - pętla odbioru (podział na linie, dekodowanie, format,
+                zapis CSV/segment/agregaty) na syntetycznym strumieniu
+                ramek; realtime = ile razy szybciej niż nadaje łącze 115200,
+* serial_loop - pętla PI_logger.py na pseudoterminalu: readline() linia
+                po linii kontra odbiór hurtowy (--bulk),
+* frame_decode - dekodowanie pomiarów: ramki tekstowe (parse_frame linia
+                po linii) kontra binarne (pasieka/frame.py, cały bufor
+                naraz i linie "B:<hex>" odbiornika),
+* parse_cmgl  - parsowanie odpowiedzi AT+CMGL dla 1-1000 wiadomości
+                (tryb tekstowy i PDU ze składaniem części),
+* inbox_drain - przegląd pełnej skrzynki SIM (merge1.sweep_inbox) na
+                udawanym modemie, od AT+CMGL do usunięcia wiadomości,
+* log_filename - wybór nazwy nowego logu: stare get_log_filename
+                (listowanie katalogu) kontra katalog (catalog.json),
+* sms_latency - czas od SMS-a z zapytaniem do wysłania odpowiedzi na
+                udawanym modemie (opóźnienie i ziarno stałe),
+* history     - wczytanie historii: cały CSV, zakres 24 h z CSV, segmenty,
+                zakres 24 h z archiwum xz,
+* startup     - start całego merge1.main() z udawanym modemem i Arduino
+                (ramka co 50 ms): czas do pierwszego zapisanego pomiaru
+                i do gotowości SMS; modem świeżo włączony (cold, trzeba go
+                ustawić) albo już ustawiony (warm, restart samego Pi),
+* uplink      - godzina pomiarów co 6 s (1 i 4 ule) jako partia do
+                wysyłki przez GPRS: rozmiar, kodowanie, wysyłka przez
+                udawany modem do lokalnego serwera (pasieka/uplink.py),
+* analysis    - raport dobowy z historii (pasieka/analysis.py) w jednym
+                procesie kontra pula procesów na wszystkich rdzeniach.
+
+Dane są generowane deterministycznie, a wynik ma stałe klucze
+("<przypadek>[param=wartość]") posortowane alfabetycznie, więc dwa pliki
+JSON da się porównać także zwykłym diffem. Czasy to sekundy na jedno
+wywołanie (mediana, min i p95 z --repeat powtórzeń); mniej = lepiej.
+Na Pi warto podać --dir na karcie SD (tam trafiają logi).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import serial
+
+import PI_logger
+import merge1
+import merge2_electric_boogaloo as merge2
+from benchmarks import bench_sms
+from pasieka import analysis, archive, frame, gsm7, inbox, uplink
+from pasieka.aio import LineReader, open_serial
+from pasieka.catalog import CHECKPOINT_ROWS, Catalog, LogEntry, checkpoint_path, pack_checkpoints
+from pasieka.commands import CommandHandler
+from pasieka.fake_modem import FakeModem
+from pasieka.ingest import DEFAULT_HIVE, Ingest, SourceStats
+from pasieka.logwriter import LogWriter
+from pasieka.metrics import METRICS
+from pasieka.modem import AsyncATEngine
+from pasieka.outbox import Outbox
+from pasieka.rollup import Rollup
+from pasieka.store import SegmentWriter, segment_path
+from pasieka.telemetry import format_log_line, load_log, parse_frame
+
+FORMAT = 1
+BAUD_BYTES = 115200 / 10        # 8N1: 10 bitów na bajt
+FRAME = "M:{:.3f}kg T1:{:.1f}C H1:{:.1f}% T2:{:.1f}C H2:{:.1f}%"
+CHUNK = 64                      # typowy odczyt z USB CDC Arduino
+PERIOD = 6                      # s między ramkami w danych historycznych
+
+
+def measure(fn, repeat, setup=None, number=None, min_time=0.05):
+    """
+    Czasy jednego wywołania fn. Krótkie wywołania są powtarzane w pętli
+    (jak timeit; number=None - tyle, by pomiar trwał min_time), z setup
+    każde wywołanie fn(setup()) dostaje świeże dane.
+    """
+    if setup is not None:
+        times = []
+        for _ in range(repeat):
+            arg = setup()
+            t = time.perf_counter()
+            fn(arg)
+            times.append(time.perf_counter() - t)
+        return times
+    t = time.perf_counter()
+    fn()                        # rozgrzewka i kalibracja liczby wywołań
+    if number is None:
+        number = max(1, int(min_time / max(time.perf_counter() - t, 1e-9)))
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t) / number)
+    return times
+
+
+def summarize(times, **extra):
+    q = statistics.quantiles(times, n=20, method='inclusive')[18] if len(times) > 1 else times[0]
+    out = {'n': len(times), 'median': statistics.median(times), 'min': min(times), 'p95': q}
+    out.update(extra)
+    return {k: round_sig(v) for k, v in out.items()}
+
+
+def round_sig(v):
+    return float(f'{v:.6g}') if isinstance(v, float) else v
+
+
+def key(name, **params):
+    return name + ''.join(f'[{k}={v}]' for k, v in params.items())
+
+
+def quiet():
+    # komunikaty loggera i merge1 nie należą do wyniku
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def local_noon():
+    t = time.localtime()
+    return time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 12, 0, 0, 0, 0, -1))
+
+# --- przypadki ---
+
+
+def synthetic_stream(lines):
+    rng = np.random.default_rng(1)
+    out = []
+    for i in range(lines):
+        if i % 50 == 49:
+            out.append("RF: brak pakietu")      # komunikat odbiornika bez ramki
+        else:
+            m, t1, h1 = 30 + rng.random(), 20 + rng.random(), 55 + rng.random()
+            out.append(FRAME.format(m, t1, h1, t1 + 1, h1 + 5))
+    return ''.join(f'{line}\r\n' for line in out).encode()
+
+
+def case_ingest(args, work):
+    lines = 5000 if args.quick else 20000
+    data = synthetic_stream(lines)
+    chunks = [data[i:i + CHUNK] for i in range(0, len(data), CHUNK)]
+    t0 = local_noon()
+    runs = iter(range(args.repeat))
+
+    def setup():
+        return os.path.join(work, f'ingest{next(runs)}')
+
+    def run(log_dir):
+        with quiet():
+            ingest = Ingest(log_dir, [])
+            stats = SourceStats('bench')
+            reader = LineReader()
+            queue = reader.lines
+            n = 0
+            for chunk in chunks:
+                reader.data_received(chunk)
+                while not queue.empty():
+                    ingest._route(stats, DEFAULT_HIVE, queue.get_nowait(), t0 + n * 0.01)
+                    n += 1
+            for h in ingest.hives.values():
+                h.close()
+
+    times = measure(run, args.repeat, setup)
+    med = statistics.median(times)
+    return {key('ingest', lines=lines): summarize(
+        times, lines_per_s=lines / med, realtime=len(data) / BAUD_BYTES / med)}
+
+
+def stop_at(logfile, size, main):
+    """Wątek czekający na size B w logu; potem przerywa pętlę odbioru w głównym wątku."""
+    while logfile.size < size:
+        time.sleep(0.002)
+    signal.pthread_kill(main, signal.SIGINT)    # przerywa też czekanie w select() pyserial
+
+
+def case_serial_loop(args, work):
+    lines = 5000 if args.quick else 20000
+    stream = os.path.join(work, 'serial.bin')
+    with open(stream, 'wb') as f:
+        f.write(data := synthetic_stream(lines))
+    size = sum(len(line.strip()) + 21 for line in data.split(b'\n') if line.strip())    # "<czas>;" i '\n'
+    out = {}
+    for method, loop in (('readline', PI_logger.log_lines), ('bulk', PI_logger.log_bulk)):
+        times = []
+        for i in range(args.repeat):
+            master, slave = os.openpty()
+            ser = serial.Serial(os.ttyname(slave), 115200, timeout=1)
+            try:
+                with LogWriter(os.path.join(work, f'serial_{method}{i}.csv'), 'none') as logfile:
+                    # "Arduino" to osobny proces - wątek nadawcy walczyłby o GIL z mierzoną pętlą
+                    watcher = threading.Thread(target=stop_at, args=(logfile, size, threading.get_ident()),
+                                               daemon=True)
+                    t = time.perf_counter()
+                    sender = subprocess.Popen(['cat', stream], stdout=master)
+                    watcher.start()
+                    try:
+                        loop(ser, logfile)
+                    except KeyboardInterrupt:
+                        pass
+                    times.append(time.perf_counter() - t)
+                    sender.wait()
+            finally:
+                ser.close()
+                os.close(master)
+                os.close(slave)
+        med = statistics.median(times)
+        out[key('serial_loop', lines=lines, method=method)] = summarize(
+            times, lines_per_s=lines / med, realtime=len(data) / BAUD_BYTES / med)
+    return out
+
+
+def case_frame_decode(args, work):
+    n = 1000
+    rng = np.random.default_rng(3)
+    values = np.column_stack([30 + rng.random(n), 20 + rng.random(n), 55 + rng.random(n),
+                              21 + rng.random(n), 60 + rng.random(n)]).tolist()
+    text = [FRAME.format(*v).encode() for v in values]
+    frames = [frame.encode(1 + i % 4, i, *v) for i, v in enumerate(values)]
+    buf = b''.join(frames)
+    lines = [frame.encode_line(frames[i:i + 3]) for i in range(0, n, 3)]     # 3 ramki na pakiet RH_ASK
+    out = {}
+    times = measure(lambda: [parse_frame(line, 0.0) for line in text], args.repeat)
+    out[key('frame_decode', format='text')] = summarize(
+        times, frames_per_s=n / statistics.median(times), bytes_per_frame=round_sig(sum(map(len, text)) / n))
+    times = measure(lambda: frame.to_samples(frame.decode(buf)[0], 0.0), args.repeat)
+    out[key('frame_decode', format='binary')] = summarize(
+        times, frames_per_s=n / statistics.median(times), bytes_per_frame=frame.FRAME_SIZE)
+    times = measure(lambda: [frame.parse_line(line, 0.0) for line in lines], args.repeat)
+    out[key('frame_decode', format='hex_lines')] = summarize(
+        times, frames_per_s=n / statistics.median(times), bytes_per_frame=round_sig(sum(map(len, lines)) / n))
+    return out
+
+
+def cmgl_lines(count):
+    lines = []
+    for i in range(count):
+        lines.append(f'+CMGL: {i + 1},"REC UNREAD","+48600{i:06d}","","25/05/01,12:{i % 60:02d}:00+08"')
+        lines.append(f'status {i}')
+    return lines + ['OK']
+
+
+def cmgl_pdu_lines(count):
+    lines = []
+    for i in range(count):
+        # co dziesiąty wpis to część długiej wiadomości (UDH)
+        concat = (i // 10 & 0xFF, 2, 1 + i // 10 % 2) if i % 10 == 9 else None
+        pdu, length = gsm7.deliver_pdu(f'+48600{i:06d}', f'status {i}', f'25/05/01,12:{i % 60:02d}:00+08', concat)
+        lines += [f'+CMGL: {i + 1},0,,{length}', pdu]
+    return lines + ['OK']
+
+
+def case_parse_cmgl(args, work):
+    out = {}
+    for count in (1, 10, 100, 1000):
+        lines = cmgl_lines(count)
+        times = measure(lambda: inbox.parse_cmgl(lines), args.repeat)
+        out[key('parse_cmgl', messages=count)] = summarize(
+            times, messages_per_s=count / statistics.median(times))
+        lines = cmgl_pdu_lines(count)
+        times = measure(lambda: inbox.assemble(inbox.parse_listing(lines)), args.repeat)
+        out[key('parse_cmgl_pdu', messages=count)] = summarize(
+            times, messages_per_s=count / statistics.median(times))
+    return out
+
+
+async def drain(fake, work):
+    merge1.commands = CommandHandler(lambda: None, Rollup(work))
+    merge1.outbox = Outbox()        # odpowiedzi tylko trafiają do kolejki
+    modem = AsyncATEngine()
+    transport = await open_serial(fake.port, 115200, modem)
+    dispatcher = asyncio.create_task(modem.dispatch())
+    try:
+        await merge1.init_modem(modem)
+        t = time.perf_counter()
+        await merge1.sweep_inbox(modem)
+        return time.perf_counter() - t
+    finally:
+        dispatcher.cancel()
+        transport.close()
+
+
+def case_inbox_drain(args, work):
+    n = 30                          # typowa pojemność karty SIM
+    times = []
+    for _ in range(args.repeat):
+        fake = FakeModem(latency=0.02, jitter=0.01, capacity=n, seed=1).start()
+        fake.fill_inbox(n - 2, sender=merge1.TARGET_NUMBER, text='status')
+        fake.add_long_sms(merge1.TARGET_NUMBER, 'x' * 200)
+        try:
+            with quiet():
+                times.append(asyncio.run(drain(fake, work)))
+        finally:
+            fake.stop()
+        if fake.inbox:
+            raise RuntimeError(f"w skrzynce zostało {len(fake.inbox)} wiadomości")
+    return {key('inbox_drain', messages=n, modem_latency_ms=20): summarize(times, commands=fake.commands)}
+
+
+def fill_log_dir(log_dir, logs):
+    """Katalog jak po logs dniach pracy: CSV, znacznik .commit, punkty kontrolne, segment i catalog.json."""
+    cat = Catalog(log_dir)
+    start = local_noon() - logs * 86400
+    rows = 86400 // PERIOD
+    for seq in range(1, logs + 1):
+        first = start + (seq - 1) * 86400
+        date = time.strftime('%Y%m%d', time.localtime(first))
+        entry = LogEntry(seq, date, f'{seq:03d}_{date}.csv', first, first + (rows - 1) * PERIOD, rows, rows * 56)
+        cat.entries[entry.name] = entry
+        path = os.path.join(log_dir, entry.name)
+        open(path, 'wb').close()
+        open(path + '.commit', 'wb').close()
+        with open(checkpoint_path(path), 'wb') as f:
+            f.write(pack_checkpoints([[first + r * PERIOD, r, r * 56] for r in range(0, rows, CHECKPOINT_ROWS)]))
+        os.makedirs(segment_path(path), exist_ok=True)
+    cat.next_seq = logs + 1
+    cat.save()
+
+
+def case_log_filename(args, work):
+    out = {}
+    for logs in ((100, 999) if not args.quick else (100,)):
+        log_dir = os.path.join(work, f'logi{logs}')
+        fill_log_dir(log_dir, logs)
+        entries = len(os.listdir(log_dir))
+        times = measure(lambda: merge2.get_log_filename(log_dir), args.repeat)
+        out[key('log_filename', logs=logs, method='listdir')] = summarize(times, dir_entries=entries)
+        # start merge1: wczytanie catalog.json i rejestracja nowego pliku (zapis katalogu)
+        times = measure(lambda: Catalog(log_dir).next_log(), args.repeat, number=1)
+        out[key('log_filename', logs=logs, method='catalog')] = summarize(times, dir_entries=entries)
+    return out
+
+
+def case_sms_latency(args, work):
+    n = 30 if args.quick else 100
+    opts = argparse.Namespace(mode='cmt', n=n, error_rate=0.0, timeout=120.0)
+    fake = FakeModem(latency=0.02, jitter=0.01, capacity=max(30, n), seed=1).start()
+    try:
+        with quiet():
+            delivered, total = asyncio.run(bench_sms.run(fake, opts, work))
+    finally:
+        fake.stop()
+    latency = [s - d for s, d in zip(fake.sent_times, delivered)]
+    if len(latency) < n:
+        raise RuntimeError(f"wysłano {len(latency)}/{n} odpowiedzi")
+    return {key('sms_latency', messages=n, modem_latency_ms=20): summarize(
+        latency, replies_per_s=n / total)}
+
+
+def write_history(log_dir, days):
+    rng = np.random.default_rng(2)
+    start = local_noon() - days * 86400
+    rows = 86400 // PERIOD
+    paths = []
+    for day in range(days):
+        ts = start + day * 86400 + np.arange(rows) * PERIOD
+        mass = 30 + np.cumsum(rng.normal(0, 0.001, rows))
+        temp = 15 + 5 * np.sin(np.arange(rows) / rows * 2 * np.pi)
+        date = time.strftime('%Y%m%d', time.localtime(ts[0]))
+        path = os.path.join(log_dir, f'{day + 1:03d}_{date}.csv')
+        with open(path, 'w') as f:
+            f.writelines(format_log_line(t, FRAME.format(m, c, 55.0, c + 1, 60.0))
+                         for t, m, c in zip(ts.tolist(), mass.tolist(), temp.tolist()))
+        paths.append(path)
+    return paths
+
+
+def case_history(args, work):
+    days = 7 if args.quick else 30
+    log_dir = os.path.join(work, 'historia')
+    os.makedirs(log_dir)
+    paths = write_history(log_dir, days)
+    cat = Catalog(log_dir)
+    t1 = cat.sorted()[-1].last_ts + 1
+    rows = days * 86400 // PERIOD
+    out = {}
+
+    def add(source, times, count):
+        out[key('history', days=days, source=source)] = summarize(times, rows=count)
+
+    add('csv_all', measure(lambda: [load_log(p) for p in paths], args.repeat, number=1), rows)
+    add('csv_24h', measure(lambda: cat.read_range(t1 - 86400, t1), args.repeat), 86400 // PERIOD)
+    for p in paths:
+        with SegmentWriter(segment_path(p)) as seg:
+            seg.extend(load_log(p))
+    add('segment_all', measure(lambda: cat.read_range(), args.repeat, number=1), rows)
+    for p in paths:
+        os.rename(segment_path(p), segment_path(p) + '.off')
+        archive.compress(p, 'xz')
+    add('xz_24h', measure(lambda: cat.read_range(t1 - 86400, t1), args.repeat), 86400 // PERIOD)
+    return out
+
+
+STARTUP_STAGES = ('first_sample', 'sms_ready')
+
+
+async def start_daemon(timeout=30.0):
+    """merge1.main() do osiągnięcia STARTUP_STAGES, potem SIGINT; zwraca METRICS.marks."""
+    daemon = asyncio.create_task(merge1.main())
+    deadline = time.monotonic() + timeout
+    await asyncio.sleep(0)          # main() zeruje etapy poprzedniego startu (METRICS.start())
+    while not all(s in METRICS.marks for s in STARTUP_STAGES) and time.monotonic() < deadline:
+        await asyncio.sleep(0.002)
+    marks = dict(METRICS.marks)
+    os.kill(os.getpid(), signal.SIGINT)
+    await daemon
+    return marks
+
+
+def case_startup(args, work):
+    saved = {name: getattr(merge1, name) for name in
+             ('get_log_dir', 'ARDUINO_PORTS', 'MODEM_PORT', 'METRICS_PORT', 'METRICS_FILE')}
+    out = {}
+    try:
+        for state in ('cold', 'warm'):
+            stages = {s: [] for s in STARTUP_STAGES}
+            for i in range(args.repeat):
+                fake = FakeModem(latency=0.02, jitter=0.01, seed=1).start()
+                if state == 'warm':
+                    fake.cnmi, fake.cnmi_mt = merge1.MODEM_SETTINGS['+CNMI'], 2
+                    fake.cscs, fake.csmp = merge1.MODEM_EXTRA_SETTINGS['+CSCS'], merge1.MODEM_EXTRA_SETTINGS['+CSMP']
+                arduino, slave = os.openpty()
+                running = True
+
+                def send():
+                    while running:
+                        os.write(arduino, FRAME.format(30.0, 20.0, 55.0, 21.0, 60.0).encode() + b'\r\n')
+                        time.sleep(0.05)
+
+                sender = threading.Thread(target=send, daemon=True)
+                sender.start()
+                log_dir = os.path.join(work, 'start', f'{state}{i}')
+                merge1.get_log_dir = lambda: log_dir
+                merge1.ARDUINO_PORTS, merge1.MODEM_PORT = [os.ttyname(slave)], fake.port
+                merge1.METRICS_PORT = merge1.METRICS_FILE = None
+                try:
+                    with quiet():
+                        marks = asyncio.run(start_daemon())
+                finally:
+                    running = False
+                    sender.join()
+                    fake.stop()
+                    os.close(arduino)
+                    os.close(slave)
+                for s in STARTUP_STAGES:
+                    if s not in marks:
+                        raise RuntimeError(f"start bez etapu {s}")
+                    stages[s].append(marks[s])
+            for s, times in stages.items():
+                out[key('startup', modem=state, stage=s)] = summarize(times, commands=fake.commands)
+    finally:
+        for name, value in saved.items():
+            setattr(merge1, name, value)
+    return out
+
+
+def hour_records(hives):
+    rng = np.random.default_rng(4)
+    rows = 3600 // PERIOD
+    out = np.zeros(rows * hives, dtype=uplink.SPOOL_DTYPE)
+    out['hive'] = np.tile([str(h + 1).encode() for h in range(hives)], rows)
+    out['ts'] = local_noon() + np.repeat(np.arange(rows) * PERIOD, hives)
+    out['mass'] = 30 + np.cumsum(rng.normal(0, 0.002, len(out)))
+    out['t1'], out['h1'] = np.round(20 + rng.normal(0, 0.3, len(out)), 1), 55.0
+    out['t2'], out['h2'] = np.round(21 + rng.normal(0, 0.3, len(out)), 1), 60.0
+    return out
+
+
+async def upload_hour(fake, records, work):
+    server = uplink.Receiver(os.path.join(work, 'odebrane')).serve('127.0.0.1', 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    modem = AsyncATEngine()
+    transport = await open_serial(fake.port, 115200, modem)
+    dispatcher = asyncio.create_task(modem.dispatch())
+    up = uplink.Uplink(os.path.join(work, 'uplink'), f'http://127.0.0.1:{server.server_port}/', modem=modem)
+    modem.on('+HTTPACTION', up.on_httpaction)
+    try:
+        for rec in records:
+            up.add(rec['hive'].decode(), rec.tolist()[1:])
+        t = time.perf_counter()
+        await up.upload()
+        return time.perf_counter() - t
+    finally:
+        up.spool.close()
+        dispatcher.cancel()
+        transport.close()
+        server.shutdown()
+        server.server_close()
+
+
+def case_uplink(args, work):
+    out = {}
+    for hives in (1, 4):
+        records = hour_records(hives)
+        data = uplink.encode_batch(records, 0, 'pasieka')
+        times = measure(lambda: uplink.encode_batch(records, 0, 'pasieka'), args.repeat)
+        out[key('uplink', hives=hives, stage='encode')] = summarize(
+            times, records=len(records), batch_bytes=len(data), raw_bytes=records.nbytes)
+    fake = FakeModem(latency=0.02, seed=1).start()
+    try:
+        with quiet():
+            elapsed = asyncio.run(upload_hour(fake, hour_records(1), os.path.join(work, 'uplink')))
+    finally:
+        fake.stop()
+    out[key('uplink', hives=1, stage='upload', modem_latency_ms=20)] = summarize(
+        [elapsed], http_bytes=sum(n for _, _, n in fake.uploads), at_commands=fake.commands)
+    return out
+
+
+def case_analysis(args, work):
+    days = 7 if args.quick else 30
+    log_dir = os.path.join(work, 'historia')
+    os.makedirs(log_dir)
+    write_history(log_dir, days)
+    rows = days * 86400 // PERIOD
+    out = {}
+    for workers in sorted({1, os.cpu_count() or 1}):
+        times = measure(lambda: analysis.analyze(log_dir, workers=workers), args.repeat, number=1)
+        out[key('analysis', days=days, workers=workers)] = summarize(times, rows=rows)
+    return out
+
+
+CASES = {
+    'ingest': case_ingest,
+    'serial_loop': case_serial_loop,
+    'frame_decode': case_frame_decode,
+    'parse_cmgl': case_parse_cmgl,
+    'inbox_drain': case_inbox_drain,
+    'log_filename': case_log_filename,
+    'sms_latency': case_sms_latency,
+    'history': case_history,
+    'startup': case_startup,
+    'uplink': case_uplink,
+    'analysis': case_analysis,
+}
+
+# --- uruchomienie i porównanie ---
+
+
+def environment():
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        rev = None
+    return {
+        'commit': rev,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+    }
+
+
+def run(args):
+    names = args.only.split(',') if args.only else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        sys.exit(f"nieznane przypadki: {', '.join(unknown)} (dostępne: {', '.join(CASES)})")
+    results = {}
+    for name in names:
+        with tempfile.TemporaryDirectory(dir=args.dir) as work:
+            t = time.perf_counter()
+            part = CASES[name](args, work)
+        for k, r in part.items():
+            print(f"{k:50s} mediana={r['median'] * 1000:10.3f} ms  p95={r['p95'] * 1000:10.3f} ms")
+        print(f"  ({name}: {time.perf_counter() - t:.1f} s)", file=sys.stderr)
+        results.update(part)
+    doc = {'format': FORMAT, 'quick': args.quick, 'repeat': args.repeat,
+           'env': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(doc, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print(f"Zapisano {args.output}")
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    for doc, path in ((base, args.base), (new, args.new)):
+        if doc.get('format') != FORMAT:
+            sys.exit(f"{path}: nieobsługiwany format {doc.get('format')}")
+    print(f"{base['env'].get('commit')} ({base['env']['machine']}) -> "
+          f"{new['env'].get('commit')} ({new['env']['machine']})")
+    worse = 0
+    for k in sorted(set(base['results']) | set(new['results'])):
+        a, b = base['results'].get(k), new['results'].get(k)
+        if a is None or b is None:
+            print(f"{k:50s} {'tylko w nowym' if a is None else 'tylko w starym'}")
+            continue
+        ratio = b['median'] / a['median'] if a['median'] else float('inf')
+        mark = ''
+        if ratio > 1 + args.threshold:
+            mark = '  WOLNIEJ'
+            worse += 1
+        elif ratio < 1 - args.threshold:
+            mark = '  szybciej'
+        print(f"{k:50s} {a['median'] * 1000:10.3f} -> {b['median'] * 1000:10.3f} ms  x{ratio:5.2f}{mark}")
+    return 1 if worse and args.strict else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('run', help='uruchom pomiary')
+    p.add_argument('-o', '--output', help='plik JSON z wynikami')
+    p.add_argument('--only', help=f"przypadki po przecinku: {','.join(CASES)}")
+    p.add_argument('--repeat', type=int, default=5, help='powtórzeń każdego pomiaru')
+    p.add_argument('--quick', action='store_true', help='mniejsze dane (np. na Pi przy każdym commicie)')
+    p.add_argument('--dir', default=None, help='katalog na pliki tymczasowe')
+    p = sub.add_parser('compare', help='porównaj dwa pliki JSON')
+    p.add_argument('base')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=0.10, help='względna zmiana uznawana za różnicę')
+    p.add_argument('--strict', action='store_true', help='kod wyjścia 1, gdy coś zwolniło')
+    args = ap.parse_args()
+    if args.cmd == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
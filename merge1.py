@@ -1,159 +1,365 @@
 import os
-import re
-import datetime
 import time
-import threading
+import signal
+import asyncio
+import tempfile
 import serial
+from concurrent.futures import ProcessPoolExecutor
 
+from pasieka import archive, inbox
+from pasieka.aio import open_serial
+from pasieka.commands import CommandHandler
+from pasieka.ingest import DEFAULT_HIVE, Ingest
+from pasieka.metrics import METRICS
+from pasieka.modem import AsyncATEngine, parse_cmt, parse_cmti
+from pasieka.outbox import PRIORITY_ALARM, Outbox
+from pasieka.pipeline import DiskWriter, Stage
+from pasieka.uplink import Uplink
 
-def get_log_filename(base_dir='pasieka_logi'):
-    # Upewnij się, że katalog istnieje
+
+def get_log_dir(base_dir='pasieka_logi'):
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    log_dir = os.path.join(script_dir, base_dir)
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    # Znajdź istniejące pliki z wzorcem "NNN_YYYYMMDD.csv"
-    pattern = re.compile(r'^(\d{3})_(\d{8})\.csv$')
-    seqs = []
-    for fname in os.listdir(log_dir):
-        m = pattern.match(fname)
-        if m:
-            seqs.append(int(m.group(1)))
-    next_seq = max(seqs) + 1 if seqs else 1
-    date_str = datetime.date.today().strftime('%Y%m%d')
-    filename = f"{next_seq:03d}_{date_str}.csv"
-    return os.path.join(log_dir, filename)
+    return os.path.join(script_dir, base_dir)
 
 # Konfiguracja portów i parametrów
-ARDUINO_PORT = '/dev/ttyACM0'
+ARDUINO_PORTS = ['/dev/ttyACM*']  # ścieżki albo wzorce; każdy odbiornik w tej samej pętli
 ARDUINO_BAUDRATE = 115200
+HIVES = {}              # port -> ul dla ramek bez "UL:<id>", np. {'/dev/ttyACM1': '2'}
+PRIMARY_HIVE = DEFAULT_HIVE  # ul, o który pytają komendy SMS
+FRAME_HIVES = {'1': PRIMARY_HIVE}  # numer z ramki (HIVE_ID w MAIN.ino) -> ul; inne numery to osobne ule
+CAPTURE_DIR = None      # katalog na nagrania surowych bajtów z odbiorników (pasieka/replay.py)
 MODEM_PORT = '/dev/serial0'
 MODEM_BAUDRATE = 115200
-CHECK_INTERVAL = 30  # sekundy między sprawdzeniami SMS
+MODEM_PROBE_TIMEOUT = 0.25  # s na odpowiedź na AT przy sprawdzaniu, czy modem już działa
+MODEM_BOOT_TIMEOUT = 20     # po tylu sekundach bez odpowiedzi konfigurujemy mimo to
+# Ustawienia modemu: odczytywane jedną komendą i zmieniane tylko, gdy są inne
+# (modem pamięta je do restartu, więc po restarcie samego Pi nic nie wysyłamy)
+MODEM_SETTINGS = {
+    '+CMGF': '1',               # tryb tekstowy SMS
+    '+CNMI': '2,2,0,1,0',       # nowe SMS od razu jako URC +CMT, raporty jako +CDS
+}
+MODEM_EXTRA_SETTINGS = {        # niepotrzebne do odbioru SMS - po przeglądzie skrzynki
+    '+CSCS': '"GSM"',           # charset
+    '+CSMP': '49,167,0,0',      # prośba o raport doręczenia
+}
+RECONNECT_DELAY = 5  # sekundy przed ponownym otwarciem portu
+# Niepełna wiadomość wieloczęściowa na SIM: przy +CNMI=2,2 brakujące części przychodzą
+# jako +CMT i nie trafiają na SIM, więc po tylu sekundach obsługujemy to, co jest, i usuwamy
+FRAGMENT_TIMEOUT = 15 * 60
+LOG_FSYNC = 'interval'  # none / interval / every-batch (pasieka/logwriter.py)
+VERBOSE = False         # True = wypisuj każdą linię z Arduino
+# Kolejki między etapami (pasieka/pipeline.py): port -> parser -> zapis na kartę / konsola
+LINE_QUEUE = 4096       # linii na port; parser nie nadąża -> LINE_POLICY
+LINE_POLICY = 'drop-oldest'     # block = port czeka (bajty w buforze jądra) / drop-oldest
+DISK_QUEUE = 256        # partii/operacji czekających na zapis na kartę w wątku zapisu
+DISK_POLICY = 'spill'   # block / spill (nadmiar do DISK_SPILL, najwyżej DISK_SPILL_LIMIT B); potem porty czekają
+DISK_SPILL = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                          'pasieka-spill.bin')
+DISK_SPILL_LIMIT = 32 << 20
+CONSOLE_QUEUE = 256     # linie do wypisania przy VERBOSE; zapchany stdout gubi najstarsze
+ROTATION = archive.RotationPolicy(daily=True, max_bytes=None)  # nowy plik logu o północy
+LOG_CODEC = 'xz'        # kompresja zamkniętych logów: gz / xz (pasieka/archive.py)
 TARGET_NUMBER = '+48665464949'
-TRIGGER_TEXT = 'status'
-
-# Zmienne współdzielone\last_line = None
-run_event = threading.Event()
-run_event.set()
-
-# Funkcje do obsługi modemu GSM
-
-def send_at(cmd, ser, timeout=2):
-    ser.write((cmd + '\r').encode())
-    time.sleep(timeout)
-    lines = []
-    while ser.in_waiting:
-        line = ser.readline().decode(errors='ignore').strip()
-        if line:
-            lines.append(line)
-    return lines
-
-
-def init_modem(ser):
-    send_at('AT', ser)
-    send_at('ATE0', ser)             # wyłącz echo
-    send_at('AT+CMGF=1', ser)        # tryb tekstowy SMS
-    send_at('AT+CSCS="GSM"', ser)  # charset
-
-
-def parse_cmgl(lines):
-    messages = []
-    header_re = re.compile(r'^\+CMGL: (\d+),"([^"]+)","([^"]+)",.*"([^"]+)"$')
-    i = 0
-    while i < len(lines):
-        m = header_re.match(lines[i])
-        if m:
-            idx = int(m.group(1))
-            status = m.group(2)
-            sender = m.group(3)
-            date = m.group(4)
-            txt = lines[i+1] if i+1 < len(lines) else ''
-            messages.append({'index': idx, 'status': status, 'sender': sender, 'date': date, 'text': txt.strip()})
-            i += 2
-        else:
-            i += 1
-    return messages
-
-
-def delete_message(idx, ser):
-    send_at(f'AT+CMGD={idx}', ser)
-
-
-def send_sms(number, text, ser):
-    send_at(f'AT+CMGS="{number}"', ser)
-    ser.write(text.encode() + b'\x1A')  # Ctrl+Z
-    time.sleep(5)
-    resp = []
-    while ser.in_waiting:
-        resp.append(ser.readline().decode(errors='ignore').strip())
-    return resp
-
-# Wątek logujący dane z Arduino do CSV
-
-def serial_logger(log_path):
-    global last_line
-    try:
-        ser = serial.Serial(ARDUINO_PORT, ARDUINO_BAUDRATE, timeout=1)
-        with open(log_path, 'a', buffering=1) as logfile:
-            while run_event.is_set():
-                try:
-                    raw = ser.readline().decode('utf-8', errors='replace').strip()
-                except serial.SerialException:
-                    break
-                if raw:
-                    # raw zawiera "<timestamp_ms>,<analogValue>"
-                    last_line = raw
-                    logfile.write(raw + '\n')
-                    print(f"Zapisano: {raw}")
-    except Exception as e:
-        print(f"Błąd w serial_logger: {e}")
-    finally:
-        ser.close()
-        print("serial_logger zakończony.")
+METRICS_PORT = 9108     # http://127.0.0.1:9108/metrics (pasieka/metrics.py); None = bez serwera
+METRICS_FILE = 'metrics.json'  # migawka w katalogu logów co METRICS_INTERVAL s; None = bez pliku
+METRICS_INTERVAL = 60
+# Wysyłka pomiarów przez GPRS (pasieka/uplink.py): kolejka na karcie, partie co UPLINK_INTERVAL s
+UPLINK_URL = None       # np. 'http://serwer.domowy:8080/pasieka'; None = bez wysyłki
+UPLINK_APN = 'internet'
+UPLINK_STATION = 'pasieka'      # nazwa pasieki na serwerze
+UPLINK_INTERVAL = 3600
+
+# Stan współdzielony - wszystkie zadania działają w jednej pętli asyncio
+commands = None       # komendy SMS (pasieka/commands.py), tworzone w main()
+outbox = None         # kolejka SMS-ów wychodzących (pasieka/outbox.py), tworzona w main()
+archiver = None       # pula procesów do kompresji zamkniętych logów, tworzona w main()
+disk = None           # wątek zapisu na kartę (pasieka/pipeline.DiskWriter), tworzony w main()
+uplink = None         # wysyłka przez GPRS (pasieka/uplink.py), tworzona w main(), gdy UPLINK_URL
+background = set()    # zadania kompresji w toku
+fragments = {}        # (nadawca, ref, liczba części) -> time.monotonic() pierwszego przeglądu z tą wiadomością
+
+# Funkcje do obsługi modemu GSM (komendy idą przez AsyncATEngine, patrz pasieka/modem.py)
+
+async def wait_modem(modem):
+    # Krótkie AT co chwilę zamiast stałego czekania: gotowy modem odpowiada od razu,
+    # uruchamiający się - gdy tylko zacznie. False, gdy milczy dłużej niż MODEM_BOOT_TIMEOUT.
+    deadline = time.monotonic() + MODEM_BOOT_TIMEOUT
+    while True:
+        resp = await modem.command('AT', timeout=MODEM_PROBE_TIMEOUT)
+        if resp.ok:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        if not resp.timed_out:
+            await asyncio.sleep(MODEM_PROBE_TIMEOUT)    # ERROR - modem jeszcze nie gotowy
+
+
+async def configure_modem(modem, settings):
+    # AT+CMGF?;+CNMI? -> "+CMGF: 1", "+CNMI: 2,2,0,1,0"; różnice jedną komendą łączoną
+    current = {}
+    resp = await modem.command('AT' + ';'.join(f'{name}?' for name in settings))
+    if resp.ok:
+        for line in resp.lines:
+            name, sep, value = line.partition(':')
+            if sep:
+                current[name.strip()] = value.strip()
+    changes = [f'{name}={value}' for name, value in settings.items() if current.get(name) != value]
+    if changes and not (await modem.command('AT' + ';'.join(changes))).ok:
+        for change in changes:      # modem bez komend łączonych - po jednej
+            await modem.command('AT' + change)
+    return changes
+
+
+async def init_modem(modem):
+    # Tylko to, bez czego nie ma odbioru SMS; reszta w finish_modem_setup()
+    return await configure_modem(modem, MODEM_SETTINGS)
+
 
-# Wątek nasłuchujący SMS i odpowiadający
+async def finish_modem_setup(modem):
+    await modem.command('ATE0')             # wyłącz echo (silnik i tak je pomija)
+    return await configure_modem(modem, MODEM_EXTRA_SETTINGS)
 
-def sms_listener():
+
+async def delete_message(idx, modem):
+    await modem.command(f'AT+CMGD={idx}')
+
+# Odbiór danych z odbiorników (pasieka/ingest.py): CSV, segmenty, agregaty i detektor per ul
+
+async def compress_log(log_path):
+    loop = asyncio.get_running_loop()
     try:
-        ser = serial.Serial(MODEM_PORT, MODEM_BAUDRATE, timeout=1)
-        time.sleep(1)
-        init_modem(ser)
-        print("Modem SMS zainicjalizowany.")
-        while run_event.is_set():
-            lines = send_at('AT+CMGL="ALL"', ser, timeout=3)
-            msgs = parse_cmgl(lines)
-            for m in msgs:
-                print(f"> SMS#{m['index']} od {m['sender']}: {m['text']}")
-                if m['sender'] == TARGET_NUMBER and m['text'].lower() == TRIGGER_TEXT.lower():
-                    reply = last_line or 'Brak danych'
-                    send_sms(TARGET_NUMBER, reply, ser)
-                    print(f"Wysłano odpowiedź: {reply}")
-                delete_message(m['index'], ser)
-            time.sleep(CHECK_INTERVAL)
+        if disk is not None:
+            # zamknięty log może mieć jeszcze partie w kolejce zapisu
+            await loop.run_in_executor(None, disk.drain)
+        path, raw, packed = await loop.run_in_executor(archiver, archive.compress, log_path, LOG_CODEC)
+        print(f"Skompresowano {path}: {raw} B -> {packed} B")
     except Exception as e:
-        print(f"Błąd w sms_listener: {e}")
-    finally:
-        ser.close()
-        print("sms_listener zakończony.")
+        print(f"Błąd kompresji {log_path}: {e}")
 
-if __name__ == '__main__':
-    # Przygotowanie pliku logów
-    log_file = get_log_filename()
-    print(f"Logi będą zapisywane w: {log_file}")
 
-    # Uruchom wątki
-    t1 = threading.Thread(target=serial_logger, args=(log_file,), daemon=True)
-    t2 = threading.Thread(target=sms_listener, daemon=True)
-    t1.start()
-    t2.start()
+def archive_later(log_path):
+    # kompresja w osobnym procesie - logger nie czeka
+    task = asyncio.create_task(compress_log(log_path))
+    background.add(task)
+    task.add_done_callback(background.discard)
+
+
+def submit_alert(hive, alert):
+    print(f"Alarm ({hive}): {alert.message}")
+    text = alert.message if hive == PRIMARY_HIVE else f"Ul {hive}: {alert.message}"
+    # seria alarmów tego samego rodzaju = jeden SMS (pasieka/outbox.py)
+    outbox.submit(TARGET_NUMBER, text, PRIORITY_ALARM, key=f'alert:{hive}:{alert.kind}')
+
+
+def print_reading(reading):
+    print(f"Zapisano ({reading.source}, {reading.hive}): {reading.raw}")
+
+# Zadanie obsługujące SMS
+
+async def handle_sms(sender, text, modem):
+    print(f"> SMS od {sender}: {text}")
+    if sender == TARGET_NUMBER:
+        # odpowiedź ze stanu w pamięci i agregatów, bez czytania logów
+        reply = commands.handle(text)
+        print(f"Odpowiedź gotowa w {commands.last_elapsed * 1000:.1f} ms")
+        # nie czekamy na modem - wysyła zadanie outbox.run()
+        outbox.submit(TARGET_NUMBER, reply)
+        print(f"Odpowiedź w kolejce: {reply}")
 
+
+async def sweep_inbox(modem):
+    # Jednorazowy przegląd skrzynki SIM - tylko po starcie i po ponownym połączeniu.
+    # Tryb PDU: części długich SMS-ów są składane; parser dostaje linie w miarę napływu.
+    parser = inbox.ListingParser()
+    resp = await modem.command_pdu('AT+CMGL=4', timeout=10, on_line=parser.feed)
+    if not resp.ok:
+        print(f"Błąd odczytu skrzynki SIM: {resp.final}")
+        return
+    # AT+CMGL=4 to także zapisane wysłane/niewysłane - obsługujemy tylko odebrane
+    messages = inbox.assemble([r for r in parser.close() if r.status.startswith('REC')])
+    for m in messages:
+        if m.complete:
+            await handle_sms(m.sender, m.text, modem)
+    now = time.monotonic()
+    seen = {(m.sender, m.ref, m.parts): fragments.get((m.sender, m.ref, m.parts), now)
+            for m in messages if not m.complete}
+    expired = [m for m in messages if not m.complete and now - seen[(m.sender, m.ref, m.parts)] >= FRAGMENT_TIMEOUT]
+    for m in expired:
+        print(f"Niepełna wiadomość od {m.sender} ({len(m.indices)}/{m.parts} części) "
+              f"czeka dłużej niż {FRAGMENT_TIMEOUT} s - obsługa bez brakujących części")
+        del seen[(m.sender, m.ref, m.parts)]
+        await handle_sms(m.sender, m.text, modem)
+    fragments.clear()
+    fragments.update(seen)
+    if not fragments:
+        # wszystko odczytane = przeczytane; jedna komenda zamiast AT+CMGD na wiadomość
+        # (SMS, który przyszedł po AT+CMGL, jest nieprzeczytany i zostaje)
+        if messages:
+            await modem.command(f'AT+CMGD=1,{inbox.DEL_READ}', timeout=10)
+        return
+    print(f"Niepełne wiadomości w skrzynce: {len(fragments)}, czekają na brakujące części "
+          f"(najwyżej {FRAGMENT_TIMEOUT} s)")
+    for m in messages:
+        if m.complete or m in expired:
+            for idx in m.indices:
+                await delete_message(idx, modem)
+
+
+async def expire_fragments(modem):
+    # ponowny przegląd tylko, gdy na SIM czekają części - wtedy przeterminowane znikają
+    while True:
+        await asyncio.sleep(FRAGMENT_TIMEOUT / 2)
+        if fragments:
+            await sweep_inbox(modem)
+
+
+async def on_cmt(urc, modem):
+    sender, _, text = parse_cmt(urc)
+    await handle_sms(sender, text, modem)
+
+
+async def on_cmti(urc, modem):
+    # SMS zapisany w pamięci (np. klasa 2) - odczytaj, obsłuż i usuń
+    idx = parse_cmti(urc)
+    if idx is None:
+        return
+    msg = inbox.parse_cmgr((await modem.command(f'AT+CMGR={idx}')).lines)
+    if msg:
+        await handle_sms(msg['sender'], msg['text'], modem)
+    await delete_message(idx, modem)
+
+
+async def on_cpin(urc, modem):
+    # +CPIN: READY bez pytania = modem się zrestartował, trzeba go ustawić od nowa
+    print(f"Modem: +CPIN: {urc.value}")
+    if urc.value == 'READY':
+        await init_modem(modem)
+        await sweep_inbox(modem)
+        await finish_modem_setup(modem)
+
+
+async def on_ring(urc, modem):
+    print("Modem: RING")
+
+
+async def sms_listener():
+    while True:
+        modem = AsyncATEngine()
+        try:
+            transport = await open_serial(MODEM_PORT, MODEM_BAUDRATE, modem)
+        except serial.SerialException as e:
+            print(f"Błąd otwarcia portu modemu: {e}, ponowna próba za {RECONNECT_DELAY} s")
+            await asyncio.sleep(RECONNECT_DELAY)
+            continue
+        for name, handler in (('+CMT', on_cmt), ('+CMTI', on_cmti), ('+CPIN', on_cpin), ('RING', on_ring)):
+            modem.on(name, lambda u, h=handler: h(u, modem))
+        modem.on('+CDS', outbox.on_cds)
+        if uplink is not None:
+            modem.on('+HTTPACTION', uplink.on_httpaction)
+        dispatcher = asyncio.create_task(modem.dispatch())
+        expiry = asyncio.create_task(expire_fragments(modem))
+        collector = lambda: {'urc_queue_depth': modem.urcs.qsize(), 'modem_read_peak_bytes': transport.read_peak}
+        METRICS.add_collector(collector)
+        try:
+            if await wait_modem(modem):
+                METRICS.mark('modem_ready')
+            else:
+                print(f"Modem nie odpowiada na AT od {MODEM_BOOT_TIMEOUT} s, konfiguracja mimo to")
+            changed = await init_modem(modem)
+            elapsed = METRICS.mark('sms_ready')
+            print(f"Modem SMS zainicjalizowany{f' po {elapsed:.2f} s od startu' if elapsed else ''}"
+                  f" (zmienione: {', '.join(changed) or 'nic'}).")
+            await sweep_inbox(modem)
+            METRICS.mark('inbox_swept')
+            await finish_modem_setup(modem)
+            # wiadomości zebrane bez modemu czekają w kolejce i wychodzą teraz
+            outbox.attach(modem)
+            if uplink is not None:
+                uplink.attach(modem)
+            exc = await transport.closed
+        finally:
+            METRICS.remove_collector(collector)
+            outbox.attach(None)
+            if uplink is not None:
+                uplink.attach(None)
+            dispatcher.cancel()
+            expiry.cancel()
+            transport.close()
+        print(f"Utracono port modemu: {exc}, ponowna próba za {RECONNECT_DELAY} s")
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def serve_metrics():
     try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("Przerwano działanie programu.")
-        run_event.clear()
-        t1.join()
-        t2.join()
-        print("Zamknięto wszystkie wątkami. Program zakończony.")
+        await METRICS.serve(port=METRICS_PORT)
+    except OSError as e:
+        print(f"Serwer metryk nie wystartował (port {METRICS_PORT}): {e}")
+
+
+async def main():
+    global commands, outbox, archiver, disk, uplink
+    METRICS.start()
+    archiver = ProcessPoolExecutor(max_workers=1)
+    outbox = Outbox()
+    # Zapis na kartę w osobnym wątku: wolny fsync nie wstrzymuje odczytu portów
+    disk = DiskWriter(DISK_QUEUE, DISK_POLICY, DISK_SPILL, DISK_SPILL_LIMIT)
+    # Każdy ul ma własny katalog logów z numeracją plików (pasieka/catalog.py)
+    ingest = Ingest(get_log_dir(), ARDUINO_PORTS, ARDUINO_BAUDRATE, HIVES, FRAME_HIVES,
+                    rescan=RECONNECT_DELAY, capture_dir=CAPTURE_DIR, line_queue=LINE_QUEUE,
+                    line_policy=LINE_POLICY, policy=LOG_FSYNC, rotation=ROTATION, io=disk)
+    ingest.on_alert = submit_alert
+    ingest.on_rotate = archive_later     # także logi z poprzednich uruchomień
+    stages = [disk]
+    if VERBOSE:
+        console = Stage('console', print_reading, CONSOLE_QUEUE, 'drop-oldest')
+        ingest.on_reading = console.put
+        stages.append(console)
+    METRICS.add_collector(ingest.metrics)
+    for stage in stages:
+        METRICS.add_collector(stage.metrics)
+    METRICS.add_collector(outbox.metrics)
+    METRICS.add_collector(lambda: {'archive_jobs': len(background)})
+    if UPLINK_URL:
+        # pomiary czekają w kolejce na karcie, także gdy modem jeszcze nie działa
+        uplink = Uplink(os.path.join(get_log_dir(), 'uplink'), UPLINK_URL, UPLINK_STATION,
+                        UPLINK_APN, UPLINK_INTERVAL, io=disk)
+        ingest.on_sample = uplink.add
+        METRICS.add_collector(uplink.metrics)
+
+    # Jedna pętla, trzy zadania (i metryki); zamknięcie przez anulowanie, bez czekania na wątki.
+    # Porty otwierają się od razu, a pierwsze AT do modemu idzie, zanim wczytamy katalog
+    # logów ula - modem odpowiada w tym samym czasie.
+    tasks = [asyncio.create_task(sms_listener()),
+             asyncio.create_task(ingest.run()),
+             asyncio.create_task(outbox.run())]
+    await asyncio.sleep(0)
+    # bez await aż do utworzenia commands - żaden SMS nie zostanie obsłużony wcześniej
+    primary = ingest.hive(PRIMARY_HIVE)
+    commands = CommandHandler(primary.recent.latest, primary.rollup)
+    print(f"Logi będą zapisywane w: {get_log_dir()}")
+    if uplink is not None:
+        tasks.append(asyncio.create_task(uplink.run()))
+    if METRICS_PORT is not None:
+        tasks.append(asyncio.create_task(serve_metrics()))
+    if METRICS_FILE is not None:
+        tasks.append(asyncio.create_task(
+            METRICS.run_snapshots(os.path.join(get_log_dir(), METRICS_FILE), METRICS_INTERVAL)))
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    print("Przerwano działanie programu.")
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # ule zamknięte - wątki etapów kończą swoje kolejki (ostatnie partie i fsync)
+    for stage in reversed(stages):
+        stage.close()
+    # rozpoczęta kompresja kończy się normalnie, pozostałe pliki poczekają na następny start
+    archiver.shutdown(wait=True, cancel_futures=True)
+    print("Zamknięto wszystkie zadania. Program zakończony.")
+
+if __name__ == '__main__':
+    asyncio.run(main())
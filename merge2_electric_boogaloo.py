@@ -5,6 +5,8 @@ import time
 import threading
 import serial
 
+from pasieka.modem import ATEngine
+
 # ---- KONFIGURACJA ----
 ARDUINO_PORT = '/dev/ttyACM0'    # port Arduino
 ARDUINO_BAUDRATE = 115200
@@ -34,24 +36,12 @@ def get_log_filename(base_dir='pasieka_logi'):
     return os.path.join(log_dir, filename)
 
 
-def send_at(cmd, ser, timeout=2):
-    """Wyślij komendę AT i zwróć odpowiedź jako listę linii."""
-    ser.write((cmd + '\r').encode())
-    time.sleep(timeout)
-    out = []
-    while ser.in_waiting:
-        line = ser.readline().decode(errors='ignore').strip()
-        if line:
-            out.append(line)
-    return out
-
-
-def init_modem(ser):
+def init_modem(modem):
     """Inicjalizacja modemu GSM w trybie tekstowym SMS."""
-    send_at('AT', ser)
-    send_at('ATE0', ser)
-    send_at('AT+CMGF=1', ser)
-    send_at('AT+CSCS="GSM"', ser)
+    modem.command('AT')
+    modem.command('ATE0')
+    modem.command('AT+CMGF=1')
+    modem.command('AT+CSCS="GSM"')
 
 
 def parse_cmgl(lines):
@@ -72,17 +62,15 @@ def parse_cmgl(lines):
     return msgs
 
 
-def delete_message(idx, ser):
+def delete_message(idx, modem):
     """Usuwa SMS o danym idx."""
-    send_at(f'AT+CMGD={idx}', ser)
+    modem.command(f'AT+CMGD={idx}')
 
 
-def send_sms(number, text, ser):
+def send_sms(number, text, modem):
     """Wysyła SMS pod numer number z treścią text."""
-    send_at(f'AT+CMGS="{number}"', ser)
-    ser.write(text.encode() + b'\x1A')
-    time.sleep(5)
-    # możemy odczytać potwierdzenie, ale nie jest konieczne
+    # czekamy na +CMGS / OK zamiast stałych 5 s
+    modem.send_sms(number, text)
 
 
 def serial_logger(log_path):
@@ -112,18 +100,19 @@ def sms_listener():
     try:
         ser = serial.Serial(MODEM_PORT, MODEM_BAUDRATE, timeout=1)
         time.sleep(1)
-        init_modem(ser)
+        modem = ATEngine(ser)
+        init_modem(modem)
         print("Modem SMS zainicjalizowany.")
         while run_event.is_set():
-            resp = send_at('AT+CMGL="ALL"', ser, timeout=3)
-            msgs = parse_cmgl(resp)
+            resp = modem.command('AT+CMGL="ALL"', timeout=3)
+            msgs = parse_cmgl(resp.lines)
             for m in msgs:
                 print(f"> SMS#{m['index']} od {m['sender']}: {m['text']}")
                 if m['sender'] == TARGET_NUMBER and m['text'].lower() == TRIGGER_TEXT:
                     reply = last_count or 'Brak danych'
                     print(f"-> Odpowiadam: {reply}")
-                    send_sms(TARGET_NUMBER, reply, ser)
-                delete_message(m['index'], ser)
+                    send_sms(TARGET_NUMBER, reply, modem)
+                delete_message(m['index'], modem)
             time.sleep(CHECK_INTERVAL)
     except Exception as e:
         print(f"Błąd sms_listener: {e}")
@@ -19,8 +19,18 @@ void loop() {
   uint8_t buflen = sizeof(buf);
 
   if (driver.recv(buf, &buflen)) {
-    buf[buflen] = '\0'; // zakończ string
-    Serial.print("Odebrano: ");
-    Serial.println((char*)buf);
+    if (buflen >= 2 && buf[0] == 0xBE && buf[1] == 1) {
+      // ramka binarna (MAIN.ino send_frame) - jako hex, dekoduje Pi (pasieka/frame.py)
+      Serial.print("B:");
+      for (uint8_t i = 0; i < buflen; i++) {
+        if (buf[i] < 0x10) Serial.print('0');
+        Serial.print(buf[i], HEX);
+      }
+      Serial.println();
+    } else {
+      buf[buflen] = '\0'; // zakończ string
+      Serial.print("Odebrano: ");
+      Serial.println((char*)buf);
+    }
   }
 }
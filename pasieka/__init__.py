@@ -0,0 +1,5 @@
+"""
+Wspólne moduły demona pasieki: obsługa modemu GSM (SIM868) i odbiór
+telemetrii z Arduino. Skrypty w katalogu głównym (merge1.py itd.)
+importują stąd zamiast kopiować te same funkcje między sobą.
+"""
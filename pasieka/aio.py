@@ -0,0 +1,171 @@
+"""
+Porty szeregowe jako nieblokujące transporty w pętli asyncio.
+
+pyserial otwieramy z timeout=0, a deskryptor rejestrujemy przez
+loop.add_reader(); przychodzące bajty trafiają do protokołu
+(data_received), tak jak w asyncio.Protocol. Kolejny port to kolejny
+deskryptor w tej samej pętli, bez nowego wątku. Tylko Linux (Raspberry Pi).
+
+Port może być też adresem pyserial z deskryptorem (socket://host:port -
+np. odtwarzanie nagrania, pasieka/replay.py). Z capture= (CaptureWriter)
+wszystkie bajty w obu kierunkach są dodatkowo nagrywane.
+"""
+
+import asyncio
+import time
+
+import serial
+
+from .replay import RX, TX
+
+# najdłuższa linia, jaką trzymamy w buforze - ramka to ok. 100 B; dłuższy ciąg
+# bez \n (zła prędkość portu, szum) jest wyrzucany do najbliższego końca linii
+MAX_LINE = 4096
+
+
+class SerialTransport:
+    """Port pyserial podpięty do pętli zdarzeń."""
+
+    def __init__(self, ser, protocol, loop=None, capture=None):
+        self.ser = ser
+        self.protocol = protocol
+        self.capture = capture
+        self.loop = loop or asyncio.get_running_loop()
+        self.closed = self.loop.create_future()   # wynik: wyjątek, który zamknął port, albo None
+        self.read_peak = 0      # największy jednorazowy odczyt = maksimum zalegających bajtów
+        self.paused = False
+        self._pausers = set()   # kto wstrzymał czytanie (np. LineReader, zapis na kartę)
+        self._fd = ser.fileno()
+        self.loop.add_reader(self._fd, self._on_readable)
+        protocol.connection_made(self)
+
+    def pause_reading(self, reason=None):
+        """
+        Przestaje czytać port (bajty czekają w buforze jądra), jak asyncio.Transport.
+        Czytanie wraca, gdy resume_reading() zawołają wszyscy, którzy wstrzymali (reason).
+        """
+        self._pausers.add(reason)
+        if not self.paused and not self.closed.done():
+            self.paused = True
+            self.loop.remove_reader(self._fd)
+
+    def resume_reading(self, reason=None):
+        self._pausers.discard(reason)
+        if self.paused and not self._pausers and not self.closed.done():
+            self.paused = False
+            self.loop.add_reader(self._fd, self._on_readable)
+
+    def _on_readable(self):
+        try:
+            # pyserial zgłasza SerialException, gdy urządzenie zniknęło (odpięte USB)
+            # z timeout=0 read() zwraca tylko to, co już czeka; socket:// podaje in_waiting 0/1
+            data = self.ser.read(max(self.ser.in_waiting, 4096))
+        except serial.SerialException as e:
+            self._lose(e)
+            return
+        if data:
+            if len(data) > self.read_peak:
+                self.read_peak = len(data)
+            if self.capture:
+                self.capture.write(time.time(), data, RX)
+            self.protocol.data_received(data)
+
+    def write(self, data):
+        if self.capture:
+            self.capture.write(time.time(), data, TX)
+        try:
+            self.ser.write(data)
+        except serial.SerialException as e:
+            self._lose(e)
+
+    def is_closing(self):
+        return self.closed.done()
+
+    def close(self):
+        self._lose(None)
+
+    def _lose(self, exc):
+        if self.closed.done():
+            return
+        if not self.paused:
+            self.loop.remove_reader(self._fd)
+        self.ser.close()
+        if self.capture:
+            self.capture.flush()
+        self.closed.set_result(exc)
+        self.protocol.connection_lost(exc)
+
+
+async def open_serial(port, baudrate, protocol, capture=None):
+    """Otwiera port (ścieżka albo adres pyserial) w trybie nieblokującym i zwraca SerialTransport."""
+    ser = serial.serial_for_url(port, baudrate, timeout=0)
+    return SerialTransport(ser, protocol, capture=capture)
+
+
+class LineReader:
+    """
+    Protokół dzielący strumień bajtów na linie (bez końcówek \\r\\n).
+
+    maxsize ogranicza kolejkę linii (0 = bez limitu); gdy parser nie nadąża:
+    policy='drop-oldest' - najstarsza linia wypada (liczona w dropped),
+    policy='block' - port przestaje być czytany do opróżnienia połowy
+    kolejki (jak w pasieka/pipeline.py, ale bez wątku); limit może być
+    przekroczony o linie z jednego odczytu.
+
+    Linia dłuższa niż MAX_LINE bajtów jest odrzucana (też liczona w
+    dropped), więc bufor portu nie rośnie bez końca.
+    """
+
+    def __init__(self, maxsize=0, policy='drop-oldest'):
+        if policy not in ('block', 'drop-oldest'):
+            raise ValueError(f"polityka kolejki linii: block albo drop-oldest, nie {policy}")
+        self.transport = None
+        self.maxsize = maxsize
+        self.policy = policy
+        self.lines = asyncio.Queue()
+        self.peak = 0           # najwięcej linii czekających w kolejce
+        self.dropped = 0
+        self._buf = bytearray()
+        self._skip = False      # wyrzucamy resztę za długiej linii, do \n
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self._buf += data
+        start = 0
+        while True:
+            nl = self._buf.find(b'\n', start)
+            if nl < 0:
+                break
+            line = bytes(self._buf[start:nl]).strip()
+            if self._skip:
+                self._skip = False
+            elif nl - start > MAX_LINE:
+                self.dropped += 1
+            elif line:
+                if self.maxsize and self.policy == 'drop-oldest' and self.lines.qsize() >= self.maxsize:
+                    self.lines.get_nowait()
+                    self.dropped += 1
+                self.lines.put_nowait(line)
+            start = nl + 1
+        del self._buf[:start]
+        if len(self._buf) > MAX_LINE:
+            if not self._skip:
+                self.dropped += 1
+            self._skip = True
+            self._buf.clear()
+        if self.lines.qsize() > self.peak:
+            self.peak = self.lines.qsize()
+        if self.maxsize and self.policy == 'block' and self.lines.qsize() >= self.maxsize:
+            self.transport.pause_reading()
+
+    def connection_lost(self, exc):
+        self.lines.put_nowait(None)
+
+    async def readline(self):
+        """Następna linia (bytes) albo None po zamknięciu portu."""
+        line = await self.lines.get()
+        if self.transport is not None and self.transport.paused and self.lines.qsize() <= self.maxsize // 2:
+            self.transport.resume_reading()
+        return line
@@ -0,0 +1,328 @@
+"""
+Analiza historii z pasieka_logi dla zakresu dat, na wszystkich rdzeniach.
+
+    python3 -m pasieka.analysis pasieka_logi --from 2025-05-01 --to 2025-05-31
+    python3 -m pasieka.analysis pasieka_logi --hive 2 --report flows --format csv -o pozytki.csv
+    python3 -m pasieka.analysis pasieka_logi --format json -o sezon.json
+
+Ule to katalog logów (ul domyślny) i jego podkatalogi ul_<id>
+(pasieka/ingest.py). Każdy plik NNN_YYYYMMDD z zakresu to osobne zadanie
+w puli procesów: wczytanie segmentu .seg (np.memmap) albo CSV/archiwum
+(telemetry.parse_log - jedno wyrażenie regularne na cały plik), potem
+agregaty dobowe (rollup.backfill) i suma małych zmian masy na dobę.
+Proces główny tylko scala częściowe wyniki (rollup.coalesce - doba
+rozcięta między dwa pliki daje dwa wiersze), więc sezon to kilka sekund.
+
+Raporty:
+
+* daily - ul i doba: masa (pierwsza, ostatnia, min, max), zmiana doby
+  (delta = ostatnia - pierwsza) i przyrost bez skoków (gain - suma zmian
+  między kolejnymi pomiarami mniejszych niż --step-max kg, czyli bez
+  dokładania nadstawek, miodobrania, zdejmowania ula), obwiednia
+  temperatur (min/średnia/max T1, T2) i średnia wilgotność,
+* flows - pożytki: co najmniej --flow-days kolejnych dób z gain >= --flow-min kg,
+* hives - porównanie uli: łączny i średni przyrost, najlepsza doba, doby
+  pożytku, zakres temperatur i miejsce w rankingu przyrostu.
+
+JSON zawiera wszystkie trzy raporty, CSV - jeden (--report).
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .archive import locate, read_span
+from .catalog import LOG_RE
+from .detect import DetectorConfig
+from .rollup import DAY, backfill, bucket_starts, coalesce, local_midnight, mean
+from .store import Segment, segment_path
+from .telemetry import SAMPLE_DTYPE, parse_log
+
+HIVE_DIR_RE = re.compile(r'^ul_(.+)$')
+DEFAULT_HIVE = 'main'           # jak ingest.DEFAULT_HIVE (bez importu asyncio/serial w procesach puli)
+FLOW_MIN = 0.5                  # kg/dobę przyrostu = dzień pożytku
+FLOW_DAYS = 2
+STEP_MAX = DetectorConfig.tip_drop
+REPORTS = ('daily', 'flows', 'hives')
+
+
+def find_hives(log_dir):
+    """{ul: katalog}: katalog logów to ul domyślny, podkatalogi ul_<id> - pozostałe."""
+    hives = {DEFAULT_HIVE: log_dir}
+    for name in sorted(os.listdir(log_dir)):
+        m = HIVE_DIR_RE.match(name)
+        if m and os.path.isdir(os.path.join(log_dir, name)):
+            hives[m.group(1)] = os.path.join(log_dir, name)
+    return hives
+
+
+def files_in_range(directory, first=None, last=None):
+    """
+    Logi NNN_YYYYMMDD.csv (także skompresowane) mogące mieć pomiary z dni
+    first..last (YYYYMMDD). Plik sprzed first wchodzi, jeśli następny
+    zaczyna się dopiero w zakresie - bez rotacji dobowej sięga w niego.
+    """
+    names = {}
+    for fname in os.listdir(directory):
+        m = LOG_RE.match(fname)
+        if m:
+            names.setdefault((int(m.group(1)), m.group(2)), os.path.join(directory, f"{m.group(1)}_{m.group(2)}.csv"))
+    logs = sorted(names.items())
+    out = []
+    for i, ((_, date), path) in enumerate(logs):
+        if last is not None and date > last:
+            continue
+        following = logs[i + 1][0][1] if i + 1 < len(logs) else None
+        if first is not None and date < first and following is not None and following < first:
+            continue
+        out.append(path)
+    return out
+
+
+def read_log(csv_path, t0=None, t1=None):
+    """Pomiary pliku logu z t0 <= ts < t1: segment .seg, gdy jest, inaczej CSV albo archiwum."""
+    seg = segment_path(csv_path)
+    if os.path.isdir(seg):
+        return Segment(seg).to_array(t0, t1)
+    path = locate(csv_path)[0]
+    if path is None:
+        return np.empty(0, dtype=SAMPLE_DTYPE)
+    samples = parse_log(read_span(path))
+    ts = samples['ts']
+    keep = np.ones(len(samples), dtype=bool)
+    if t0 is not None:
+        keep &= ts >= t0
+    if t1 is not None:
+        keep &= ts < t1
+    return samples[keep]
+
+
+def daily_steps(samples, step_max):
+    """
+    (początek doby, suma zmian masy między kolejnymi pomiarami masy o
+    |zmianę| <= step_max, liczba większych skoków) dla każdej doby w samples
+    (rosnąco po ts). Pomiary bez masy (NaN) są pomijane, nie przerywają sumy.
+    """
+    samples = samples[~np.isnan(samples['mass'])]
+    if len(samples) < 2:
+        return np.empty(0, np.int64), np.empty(0), np.empty(0, np.int64)
+    step = np.diff(samples['mass'].astype(np.float64))
+    small = np.abs(step) <= step_max
+    # zmiana należy do doby późniejszego pomiaru
+    days, inverse = np.unique(bucket_starts(samples['ts'][1:], DAY), return_inverse=True)
+    gain = np.bincount(inverse, np.where(small, step, 0), len(days))
+    jumps = np.bincount(inverse, ~small, len(days)).astype(np.int64)
+    return days, gain, jumps
+
+
+def scan_file(task):
+    """
+    Zadanie procesu puli: (ul, ścieżka, t0, t1, step_max) -> (ul, wiersze doby,
+    daily_steps, pierwszy i ostatni pomiar masy jako (ts, masa) albo None).
+    """
+    hive, path, t0, t1, step_max = task
+    samples = read_log(path, t0, t1)
+    samples = samples[np.argsort(samples['ts'], kind='stable')]
+    mass = samples[~np.isnan(samples['mass'])]
+    edges = None
+    if len(mass):
+        edges = (float(mass['ts'][0]), float(mass['mass'][0])), (float(mass['ts'][-1]), float(mass['mass'][-1]))
+    return hive, backfill(samples, DAY), daily_steps(samples, step_max), edges
+
+
+def merge(results, step_max=STEP_MAX):
+    """Częściowe wyniki plików -> {ul: (wiersze doby ROW_DTYPE, gain, jumps)}."""
+    parts = {}
+    for hive, rows, steps, edges in results:
+        parts.setdefault(hive, []).append((rows, steps, edges))
+    out = {}
+    for hive, items in parts.items():
+        rows = np.concatenate([r for r, _, _ in items])
+        rows = coalesce(rows[np.argsort(rows['start'], kind='stable')])
+        starts = [s[0] for _, s, _ in items]
+        gains = [s[1] for _, s, _ in items]
+        jumps = [s[2] for _, s, _ in items]
+        # zmiana między ostatnim pomiarem pliku a pierwszym następnego (rotacja w środku doby)
+        edges = sorted(e for _, _, e in items if e is not None)
+        for (_, (_, prev)), ((ts, first), _) in zip(edges, edges[1:]):
+            step = first - prev
+            starts.append(bucket_starts(np.array([ts]), DAY))
+            gains.append(np.array([step if abs(step) <= step_max else 0.0]))
+            jumps.append(np.array([int(abs(step) > step_max)]))
+        pos = np.searchsorted(rows['start'], np.concatenate(starts))
+        gain = np.bincount(pos, np.concatenate(gains), len(rows))
+        jump = np.bincount(pos, np.concatenate(jumps), len(rows)).astype(np.int64)
+        out[hive] = rows, gain, jump
+    return out
+
+
+def _num(value, digits=3):
+    return None if value is None or math.isnan(value) else round(float(value), digits)
+
+
+def _date(start):
+    return time.strftime('%Y-%m-%d', time.localtime(start))
+
+
+def daily_report(merged, flow_min=FLOW_MIN):
+    out = []
+    for hive, (rows, gain, jumps) in merged.items():
+        t_mean = {m: mean(rows, m) for m in ('t1', 't2', 'h1', 'h2')}
+        for i, r in enumerate(rows):
+            if not r['mass_n'] and not r['t1_n'] and not r['t2_n']:
+                continue
+            out.append({
+                'date': _date(int(r['start'])), 'hive': hive, 'samples': int(r['mass_n']),
+                'mass_first': _num(r['mass_first']), 'mass_last': _num(r['mass_last']),
+                'mass_min': _num(r['mass_min']), 'mass_max': _num(r['mass_max']),
+                'delta': _num(r['mass_last'] - r['mass_first']), 'gain': _num(gain[i]), 'jumps': int(jumps[i]),
+                'flow': bool(gain[i] >= flow_min),
+                't1_min': _num(r['t1_min'], 1), 't1_mean': _num(t_mean['t1'][i], 1), 't1_max': _num(r['t1_max'], 1),
+                't2_min': _num(r['t2_min'], 1), 't2_mean': _num(t_mean['t2'][i], 1), 't2_max': _num(r['t2_max'], 1),
+                'h1_mean': _num(t_mean['h1'][i], 1), 'h2_mean': _num(t_mean['h2'][i], 1),
+            })
+    out.sort(key=lambda d: (d['date'], d['hive']))
+    return out
+
+
+def flow_report(daily, flow_days=FLOW_DAYS):
+    """Ciągi kolejnych dób pożytku (brak danych z doby przerywa ciąg)."""
+    out = []
+    by_hive = {}
+    for d in daily:
+        by_hive.setdefault(d['hive'], []).append(d)
+    for hive, days in by_hive.items():
+        run = []
+        for d in days + [None]:
+            if d is not None and d['flow'] and (not run or _next_day(run[-1]['date']) == d['date']):
+                run.append(d)
+                continue
+            if len(run) >= flow_days:
+                out.append({'hive': hive, 'start': run[0]['date'], 'end': run[-1]['date'], 'days': len(run),
+                            'gain': _num(sum(r['gain'] for r in run)),
+                            'best_gain': _num(max(r['gain'] for r in run))})
+            run = [d] if d is not None and d['flow'] else []
+    out.sort(key=lambda f: (f['start'], f['hive']))
+    return out
+
+
+def _next_day(date):
+    return (datetime.date.fromisoformat(date) + datetime.timedelta(days=1)).isoformat()
+
+
+def hive_report(daily):
+    out = []
+    by_hive = {}
+    for d in daily:
+        by_hive.setdefault(d['hive'], []).append(d)
+    for hive, days in by_hive.items():
+        gains = [d for d in days if d['gain'] is not None]
+        best = max(gains, key=lambda d: d['gain'], default=None)
+        temps = {k: [d[k] for d in days if d[k] is not None] for k in ('t1_min', 't1_max', 't2_min', 't2_max')}
+        total = sum(d['gain'] for d in gains)
+        out.append({
+            'hive': hive, 'days': len(days), 'samples': sum(d['samples'] for d in days),
+            'gain': _num(total), 'gain_per_day': _num(total / len(gains)) if gains else None,
+            'best_day': best['date'] if best else None, 'best_gain': best['gain'] if best else None,
+            'flow_days': sum(d['flow'] for d in days), 'jumps': sum(d['jumps'] for d in days),
+            't1_min': min(temps['t1_min'], default=None), 't1_max': max(temps['t1_max'], default=None),
+            't2_min': min(temps['t2_min'], default=None), 't2_max': max(temps['t2_max'], default=None),
+        })
+    out.sort(key=lambda h: -(h['gain'] or 0))
+    for rank, h in enumerate(out, 1):
+        h['rank'] = rank
+    return out
+
+
+def analyze(log_dir, first=None, last=None, hives=None, workers=None, step_max=STEP_MAX,
+            flow_min=FLOW_MIN, flow_days=FLOW_DAYS):
+    """
+    Raporty dla dni first..last (datetime.date, None = bez ograniczenia);
+    workers=1 - bez puli procesów. Zwraca {'daily', 'flows', 'hives', 'files'}.
+    """
+    t0 = local_midnight(first.year, first.month, first.day) if first else None
+    t1 = local_midnight(last.year, last.month, last.day + 1) if last else None
+    dirs = find_hives(log_dir)
+    if hives:
+        missing = [h for h in hives if h not in dirs]
+        if missing:
+            raise ValueError(f"nie ma uli: {', '.join(missing)} (są: {', '.join(dirs)})")
+        dirs = {h: dirs[h] for h in hives}
+    day = lambda d: d.strftime('%Y%m%d') if d else None
+    tasks = [(hive, path, t0, t1, step_max)
+             for hive, directory in dirs.items() for path in files_in_range(directory, day(first), day(last))]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        results = list(map(scan_file, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            # kilka plików na paczkę - mniej przesyłania między procesami przy krótkich plikach
+            results = list(pool.map(scan_file, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    daily = daily_report(merge(results, step_max), flow_min)
+    return {'daily': daily, 'flows': flow_report(daily, flow_days), 'hives': hive_report(daily),
+            'files': len(tasks)}
+
+
+def write_csv(rows, out):
+    if not rows:
+        return
+    w = csv.DictWriter(out, fieldnames=list(rows[0]), lineterminator='\n')
+    w.writeheader()
+    w.writerows(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Analiza historii pomiarów: przyrosty, pożytki, temperatury, ule.")
+    ap.add_argument('log_dir', nargs='?', default='pasieka_logi')
+    ap.add_argument('--from', dest='first', type=datetime.date.fromisoformat, help='RRRR-MM-DD')
+    ap.add_argument('--to', dest='last', type=datetime.date.fromisoformat, help='RRRR-MM-DD (włącznie)')
+    ap.add_argument('--hive', action='append', help='tylko ten ul (można podać kilka razy)')
+    ap.add_argument('--report', choices=REPORTS, default='daily', help='raport dla CSV i wydruku')
+    ap.add_argument('--format', choices=('table', 'csv', 'json'), default='table')
+    ap.add_argument('-o', '--output', help='plik wynikowy (domyślnie standardowe wyjście)')
+    ap.add_argument('-j', '--workers', type=int, default=None, help='procesów (domyślnie wszystkie rdzenie)')
+    ap.add_argument('--step-max', type=float, default=STEP_MAX, help='kg; większa zmiana to skok, nie przyrost')
+    ap.add_argument('--flow-min', type=float, default=FLOW_MIN, help='kg/dobę przyrostu = doba pożytku')
+    ap.add_argument('--flow-days', type=int, default=FLOW_DAYS, help='najkrótszy pożytek w dobach')
+    args = ap.parse_args()
+
+    t = time.perf_counter()
+    try:
+        result = analyze(args.log_dir, args.first, args.last, args.hive, args.workers,
+                         args.step_max, args.flow_min, args.flow_days)
+    except ValueError as e:
+        sys.exit(str(e))
+    elapsed = time.perf_counter() - t
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump({k: result[k] for k in REPORTS}, out, indent=1)
+            out.write('\n')
+        elif args.format == 'csv':
+            write_csv(result[args.report], out)
+        else:
+            rows = result[args.report]
+            if rows:
+                cols = list(rows[0])
+                widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in cols]
+                out.write('  '.join(c.rjust(w) for c, w in zip(cols, widths)) + '\n')
+                for r in rows:
+                    out.write('  '.join(str(r[c]).rjust(w) for c, w in zip(cols, widths)) + '\n')
+    finally:
+        if args.output:
+            out.close()
+    print(f"{result['files']} plików, {len(result['daily'])} dób, {len(result['flows'])} pożytków "
+          f"w {elapsed:.2f} s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Rotacja logów i kompresja zamkniętych plików CSV.
+
+RotationPolicy decyduje, kiedy zamknąć bieżący plik (o lokalnej północy
+i/lub po max_bytes). Zamknięty plik NNN_YYYYMMDD.csv kompresuje compress()
+(w merge1 w osobnym procesie) do NNN_YYYYMMDD.csv.gz (albo .xz; .zst gdy
+biblioteka standardowa ma compression.zstd). Plik dzielimy na bloki po
+block_bytes (na granicy linii), każdy blok to osobny strumień - całość
+dalej rozpakuje zwykły gunzip/unxz, a indeks obok (.idx, JSON) pozwala
+czytać tylko bloki z potrzebnego zakresu:
+
+    [pierwszy ts, offset w CSV, długość w CSV, offset w archiwum, długość w archiwum]
+
+Offsety w CSV są te same co przed kompresją, więc punkty kontrolne z
+katalogu (catalog.json) działają bez zmian. Segmenty .seg zostają bez
+kompresji - to one są szybką ścieżką skanowania (np.memmap).
+
+    python3 -m pasieka.archive compress pasieka_logi/001_20250501.csv --codec xz
+    python3 -m pasieka.archive cat pasieka_logi/001_20250501.csv.gz | head
+"""
+
+import argparse
+import gzip
+import json
+import lzma
+import os
+import sys
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from .logwriter import marker_path, recover
+from .telemetry import parse_log_line
+
+try:                                # Python 3.14+
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+CODECS = {
+    'gz': (lambda data: gzip.compress(data, 6), gzip.decompress, gzip.open),
+    'xz': (lzma.compress, lzma.decompress, lzma.open),
+}
+if zstd is not None:
+    CODECS['zst'] = (zstd.compress, zstd.decompress, zstd.open)
+
+BLOCK_BYTES = 256 * 1024
+INDEX_SUFFIX = '.idx'
+
+
+@dataclass
+class RotationPolicy:
+    daily: bool = True          # nowy plik po lokalnej północy
+    max_bytes: int = None       # i/lub po przekroczeniu rozmiaru
+
+    def due(self, entry, size, ts):
+        """Czy zamknąć plik entry (catalog.LogEntry) o rozmiarze size przed pomiarem z ts."""
+        if self.daily and time.strftime('%Y%m%d', time.localtime(ts)) != entry.date:
+            return True
+        return self.max_bytes is not None and size >= self.max_bytes
+
+
+def locate(csv_path):
+    """(ścieżka, kodek) istniejącej wersji logu: CSV albo archiwum; (None, None) gdy brak."""
+    if os.path.exists(csv_path):
+        return csv_path, None
+    for codec in CODECS:
+        path = f'{csv_path}.{codec}'
+        if os.path.exists(path):
+            return path, codec
+    return None, None
+
+
+def codec_of(path):
+    ext = path.rsplit('.', 1)[-1]
+    return ext if ext in CODECS else None
+
+
+def compress(csv_path, codec='gz', block_bytes=BLOCK_BYTES):
+    """
+    Kompresuje zamknięty log blokami, zapisuje indeks i usuwa CSV.
+    Zwraca (ścieżka archiwum, bajty CSV, bajty archiwum). Do uruchamiania
+    w puli procesów - nie dotyka katalogu ani innych obiektów procesu głównego.
+    """
+    pack = CODECS[codec][0]
+    recover(csv_path)           # urwany koniec po zaniku zasilania nie trafia do archiwum
+    out_path = f'{csv_path}.{codec}'
+    blocks = []
+    raw_pos = comp_pos = 0
+    with open(csv_path, 'rb') as src, open(out_path + '.tmp', 'wb') as dst:
+        while True:
+            data = src.read(block_bytes)
+            if not data:
+                break
+            if not data.endswith(b'\n'):
+                data += src.readline()
+            first_ts = None
+            for line in data.split(b'\n', 64)[:64]:
+                sample = parse_log_line(line)
+                if sample is not None:
+                    first_ts = sample.ts
+                    break
+            packed = pack(data)
+            dst.write(packed)
+            blocks.append([first_ts, raw_pos, len(data), comp_pos, len(packed)])
+            raw_pos += len(data)
+            comp_pos += len(packed)
+        dst.flush()
+        os.fsync(dst.fileno())
+    with open(out_path + INDEX_SUFFIX + '.tmp', 'w') as f:
+        json.dump({'version': 1, 'codec': codec, 'blocks': blocks}, f)
+    # indeks przed archiwum: czytelnik szuka najpierw archiwum, a nieaktualny indeks bez niego jest pomijany
+    os.replace(out_path + INDEX_SUFFIX + '.tmp', out_path + INDEX_SUFFIX)
+    os.replace(out_path + '.tmp', out_path)
+    os.remove(csv_path)
+    if os.path.exists(marker_path(csv_path)):
+        os.remove(marker_path(csv_path))
+    return out_path, raw_pos, comp_pos
+
+
+def load_index(path):
+    try:
+        with open(path + INDEX_SUFFIX) as f:
+            return json.load(f)['blocks']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def open_log(path):
+    """Strumień bajtów logu (CSV albo archiwum - rozpakowywane w locie)."""
+    codec = codec_of(path)
+    return open(path, 'rb') if codec is None else CODECS[codec][2](path, 'rb')
+
+
+def read_span(path, start=0, end=None):
+    """
+    Bajty [start, end) logu w offsetach CSV (end=None - do końca). Z archiwum
+    z indeksem rozpakowujemy tylko bloki pokrywające zakres.
+    """
+    codec = codec_of(path)
+    blocks = load_index(path) if codec else None
+    if codec is None or blocks is None:
+        with open_log(path) as f:
+            f.seek(start)
+            return f.read() if end is None else f.read(end - start)
+    offsets = [b[1] for b in blocks]
+    lo = max(0, bisect_right(offsets, start) - 1)
+    hi = len(blocks) if end is None else bisect_right(offsets, end - 1)
+    if lo >= hi:
+        return b''
+    unpack = CODECS[codec][1]
+    parts = []
+    with open(path, 'rb') as f:
+        for _, _, _, comp_off, comp_len in blocks[lo:hi]:
+            f.seek(comp_off)
+            parts.append(unpack(f.read(comp_len)))
+    data = b''.join(parts)
+    base = blocks[lo][1]
+    return data[start - base:None if end is None else end - base]
+
+
+def iter_lines(path, t0=None):
+    """Linie logu strumieniowo; z t0 i indeksem zaczyna od bloku zawierającego t0."""
+    codec = codec_of(path)
+    blocks = load_index(path) if codec else None
+    if blocks and t0 is not None:
+        keys = [b[0] for b in blocks]
+        i = 0
+        for j, k in enumerate(keys):
+            if k is not None and k <= t0:
+                i = j
+        unpack = CODECS[codec][1]
+        with open(path, 'rb') as f:
+            for _, _, _, comp_off, comp_len in blocks[i:]:
+                f.seek(comp_off)
+                yield from unpack(f.read(comp_len)).splitlines(keepends=True)
+        return
+    with open_log(path) as f:
+        yield from f
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Kompresja i odczyt zarchiwizowanych logów.")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('compress', help='CSV -> archiwum z indeksem bloków')
+    p.add_argument('csv', nargs='+')
+    p.add_argument('--codec', choices=sorted(CODECS), default='gz')
+    p = sub.add_parser('cat', help='wypisz log (CSV albo archiwum)')
+    p.add_argument('path')
+    p.add_argument('--from', dest='t0', help="'RRRR-MM-DD GG:MM:SS' - pomiń wcześniejsze bloki")
+    args = ap.parse_args()
+    if args.cmd == 'compress':
+        for path in args.csv:
+            t = time.perf_counter()
+            out, raw, comp = compress(path, args.codec)
+            print(f"{out}: {raw} B -> {comp} B ({comp / max(raw, 1):.1%}, {time.perf_counter() - t:.2f} s)")
+    else:
+        t0 = time.mktime(time.strptime(args.t0, '%Y-%m-%d %H:%M:%S')) if args.t0 else None
+        out = sys.stdout.buffer
+        for line in iter_lines(args.path, t0):
+            out.write(line)
+
+
+if __name__ == '__main__':
+    main()
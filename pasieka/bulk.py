@@ -0,0 +1,115 @@
+"""
+Odbiór hurtowy z portu szeregowego (PI_logger.py --bulk).
+
+Zwykła pętla robi dla każdej linii readline() (pyserial czyta wtedy po
+jednym bajcie), decode(), strip(), strftime() i f-string. Tutaj:
+
+* read(in_waiting) - wszystko, co czeka w buforze, jednym odczytem,
+* take_lines() dzieli bajty w jednym bytearray (używanym ponownie) na
+  pełne linie; niepełna końcówka czeka na następny odczyt,
+* BatchClock - jeden odczyt zegara (monotonicznego) na partię; linia
+  dostaje czas partii cofnięty o czas transmisji bajtów, które przyszły
+  po niej, a napis z czasem jest liczony raz na sekundę,
+* linie zostają bajtami aż do parsera (telemetry.parse_frame działa na
+  bajtach); do logu idą jako bytes (LogWriter.write_lines),
+* Echo - podgląd na konsoli najwyżej raz na interval sekund.
+"""
+
+import time
+
+from .telemetry import TS_FORMAT
+
+REANCHOR = 60.0         # co tyle s czas ścienny jest odczytywany od nowa (np. po NTP)
+
+
+def take_lines(buf):
+    """
+    Pełne linie z bufora (bytearray, skracany w miejscu) bez końcówek
+    i pustych linii. Zwraca (linie, po): po[i] - ile bajtów bufora przyszło
+    po końcu linii i (do cofania znacznika czasu).
+    """
+    end = buf.rfind(b'\n')
+    if end < 0:
+        return [], []
+    total = len(buf)
+    lines, after = [], []
+    pos = 0
+    for part in bytes(buf[:end]).split(b'\n'):
+        pos += len(part) + 1
+        part = part.strip()
+        if part:
+            lines.append(part)
+            after.append(total - pos)
+    del buf[:end + 1]
+    return lines, after
+
+
+class BatchClock:
+    """
+    Znaczniki czasu dla partii linii. byte_rate - bajty/s łącza (115200 8N1
+    to 11520); None = wszystkie linie partii dostają ten sam czas.
+    """
+
+    def __init__(self, byte_rate=None, reanchor=REANCHOR):
+        self.byte_rate = byte_rate
+        self.reanchor = reanchor
+        self._mono = self._wall = None
+        self._second = None
+        self._prefix = b''
+
+    def now(self):
+        mono = time.monotonic()
+        if self._mono is None or mono - self._mono >= self.reanchor:
+            self._mono, self._wall = mono, time.time()
+        return self._wall + (mono - self._mono)
+
+    def stamps(self, after):
+        """Czasy linii partii (after z take_lines) przy jednym odczycie zegara."""
+        now = self.now()
+        if not self.byte_rate:
+            return [now] * len(after)
+        rate = self.byte_rate
+        return [now - n / rate for n in after]
+
+    def prefix(self, ts):
+        """b'YYYY-mm-dd HH:MM:SS;' - strftime tylko przy zmianie sekundy."""
+        second = int(ts)
+        if second != self._second:
+            self._second = second
+            self._prefix = time.strftime(TS_FORMAT, time.localtime(second)).encode() + b';'
+        return self._prefix
+
+    def format(self, lines, after):
+        """Linie partii jako gotowe linie logu (bytes, jak telemetry.format_log_line)."""
+        prefix = self.prefix
+        return [prefix(ts) + line + b'\n' for ts, line in zip(self.stamps(after), lines)]
+
+
+class Echo:
+    """Ostatnia linia na konsolę najwyżej raz na interval s (z liczbą pominiętych)."""
+
+    def __init__(self, interval=1.0, out=print):
+        self.interval = interval
+        self.out = out
+        self.skipped = 0
+        self._last = -interval
+
+    def __call__(self, lines):
+        if not lines:
+            return
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            self.skipped += len(lines)
+            return
+        self._last = now
+        more = f" (+{self.skipped + len(lines) - 1} linii)" if self.skipped + len(lines) > 1 else ''
+        self.skipped = 0
+        self.out(lines[-1].decode('utf-8', errors='replace') + more)
+
+
+def read_available(ser):
+    """Wszystko, co czeka w porcie; bez danych czeka najwyżej timeout portu na 1 bajt."""
+    data = ser.read(ser.in_waiting or 1)
+    if data and ser.in_waiting:
+        data += ser.read(ser.in_waiting)
+    return data
@@ -0,0 +1,312 @@
+"""
+Katalog plików logu w pasieka_logi (catalog.json + <log>.cp).
+
+catalog.json to mała głowa katalogu: następny numer sekwencji i dla
+każdego pliku NNN_YYYYMMDD.csv jeden wiersz (numer, data, czas pierwszego
+i ostatniego pomiaru, liczba pomiarów, rozmiar CSV). Co CHECKPOINT_ROWS
+pomiarów punkt kontrolny (ts, numer wiersza, offset bajtowy w CSV) jest
+dopisywany do pliku obok logu, <log>.cp (rekordy stałej długości,
+CHECKPOINT_DTYPE). Logger aktualizuje katalog na bieżąco (record()), więc:
+
+* następny numer sekwencji nie wymaga listowania katalogu przy starcie,
+* zapytanie o zakres czasu otwiera tylko pliki, które go pokrywają, i
+  zaczyna czytać od najbliższego punktu kontrolnego (seek w CSV; w
+  segmencie binarnym .seg wystarcza wyszukiwanie binarne po kolumnie ts).
+
+Koszt pracy nie rośnie z historią: record() dopisuje 24 B do .cp
+bieżącego logu, a głowa jest zapisywana tylko przy otwarciu i zamknięciu
+logu. Z io= (pasieka/pipeline.DiskWriter) oba zapisy robi wątek zapisu.
+Punkty kontrolne wczytujemy dopiero przy odczycie zakresu pliku.
+
+Wiersz bieżącego logu w głowie jest spóźniony, dlatego przy wczytaniu
+najnowszy plik jest odtwarzany z ostatniego punktu kontrolnego i ogona
+CSV (najwyżej checkpoint_rows linii), a przy odczycie traktowany jako
+otwarty (czytany do końca).
+
+Gdy catalog.json nie istnieje, budujemy go jednorazowo z plików (rebuild());
+katalog w starym formacie (punkty kontrolne w JSON) jest przepisywany.
+Zamknięte logi mogą być skompresowane (pasieka/archive.py) - wpis i
+offsety zostają te same, czytamy wtedy tylko potrzebne bloki archiwum.
+"""
+
+import datetime
+import json
+import os
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+
+import numpy as np
+
+from .archive import locate, open_log, read_span
+from .pipeline import write_all
+from .store import Segment, segment_path
+from .telemetry import SAMPLE_DTYPE, parse_log, parse_log_line
+
+CATALOG_NAME = 'catalog.json'
+CHECKPOINT_ROWS = 256
+CHECKPOINT_SUFFIX = '.cp'
+CHECKPOINT_DTYPE = np.dtype([('ts', '<f8'), ('row', '<i8'), ('offset', '<i8')])
+LOG_RE = re.compile(r'^(\d{3})_(\d{8})\.csv(?:\.(?:gz|xz|zst))?$')
+HEAD_FIELDS = ('seq', 'date', 'first_ts', 'last_ts', 'rows', 'size')
+
+
+def checkpoint_path(log_path):
+    return log_path + CHECKPOINT_SUFFIX
+
+
+def read_checkpoints(log_path):
+    """Punkty kontrolne z <log>.cp jako [[ts, wiersz, offset]]; urwany ostatni rekord jest pomijany."""
+    try:
+        with open(checkpoint_path(log_path), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % CHECKPOINT_DTYPE.itemsize
+    cps = np.frombuffer(data[:usable], dtype=CHECKPOINT_DTYPE)
+    return [[ts, int(row), int(offset)] for ts, row, offset in cps.tolist()]
+
+
+def pack_checkpoints(checkpoints):
+    return np.array([tuple(cp) for cp in checkpoints], dtype=CHECKPOINT_DTYPE).tobytes()
+
+
+@dataclass
+class LogEntry:
+    seq: int
+    date: str                   # YYYYMMDD z nazwy pliku
+    name: str                   # NNN_YYYYMMDD.csv
+    first_ts: float = None
+    last_ts: float = None
+    rows: int = 0               # liczba pomiarów (linii z ramką)
+    size: int = 0               # rozmiar CSV w bajtach po ostatnim zapisie
+    checkpoints: list = None    # [ts, wiersz, offset]; None = jeszcze nie wczytane z <log>.cp
+
+    def overlaps(self, t0, t1, open_end=False):
+        if self.first_ts is None:
+            return open_end
+        return (t1 is None or self.first_ts < t1) and (t0 is None or open_end or self.last_ts >= t0)
+
+    def span(self, t0=None, t1=None):
+        """
+        Zakres bajtów CSV pokrywający t0 <= ts < t1 według punktów kontrolnych:
+        (pierwszy wiersz, offset początku, offset końca albo None = do końca pliku).
+        """
+        checkpoints = self.checkpoints or []
+        keys = [cp[0] for cp in checkpoints]
+        i = bisect_right(keys, t0) - 1 if t0 is not None else -1
+        row, start = (checkpoints[i][1], checkpoints[i][2]) if i >= 0 else (0, 0)
+        j = bisect_right(keys, t1) if t1 is not None else len(keys)
+        end = checkpoints[j][2] if j < len(keys) else None
+        return row, start, end
+
+
+class Catalog:
+    def __init__(self, log_dir, checkpoint_rows=CHECKPOINT_ROWS, io=None):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, CATALOG_NAME)
+        self.checkpoint_rows = checkpoint_rows
+        self.io = io            # pasieka/pipeline.DiskWriter albo None (zapis od razu)
+        self.entries = {}       # nazwa pliku -> LogEntry
+        self.next_seq = 1
+        self._cp_fd = None      # <log>.cp bieżącego logu
+        os.makedirs(log_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            self.load()
+        else:
+            self.rebuild()
+
+    def load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get('version', 1) == 1:
+            # stary format: punkty kontrolne w JSON - przenosimy je do <log>.cp
+            self.entries = {e['name']: LogEntry(**e) for e in data['files']}
+            for entry in self.entries.values():
+                self._write_file(checkpoint_path(self._log_path(entry)), pack_checkpoints(entry.checkpoints))
+                entry.checkpoints = None
+            self.next_seq = max((e.seq for e in self.entries.values()), default=0) + 1
+            self._refresh_last()
+            self.save()
+            return
+        self.next_seq = data['next_seq']
+        for seq, date, first_ts, last_ts, rows, size in data['files']:
+            name = f"{seq:03d}_{date}.csv"
+            self.entries[name] = LogEntry(seq, date, name, first_ts, last_ts, rows, size)
+        self._refresh_last()
+
+    def save(self):
+        """Głowa katalogu; zapis atomowy - zanik zasilania zostawia starą albo nową, nigdy pół pliku."""
+        data = json.dumps({'version': 2, 'next_seq': self.next_seq, 'fields': HEAD_FIELDS,
+                           'files': [(e.seq, e.date, e.first_ts, e.last_ts, e.rows, e.size) for e in self.sorted()]})
+        if self.io:
+            self.io.put(('replace', self.path, data.encode()))
+        else:
+            self._write_file(self.path, data.encode())
+
+    @staticmethod
+    def _write_file(path, data):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def sorted(self):
+        return sorted(self.entries.values(), key=lambda e: e.seq)
+
+    def _log_path(self, entry):
+        return os.path.join(self.log_dir, entry.name)
+
+    def _refresh_last(self):
+        if self.entries:
+            self.refresh(self.sorted()[-1])
+
+    def refresh(self, entry):
+        """
+        Wiersz logu z ostatniego punktu kontrolnego i ogona CSV: najnowszy
+        przy starcie (głowa ma stan z otwarcia logu), a także zamknięty log
+        po nieudanym zapisie (Hive). Punkty kontrolne za końcem pliku
+        (partia nie trafiła na kartę) są odcinane, brakujące - dopisywane.
+        """
+        log_path = self._log_path(entry)
+        path, codec = locate(log_path)
+        if path is None:
+            return
+        stored = checkpoints = read_checkpoints(log_path)
+        if codec is None:
+            size = os.path.getsize(path)
+            checkpoints = [cp for cp in checkpoints if cp[2] < size]
+        # od ostatniego punktu kontrolnego; _add() dopisze go ponownie
+        entry.checkpoints = checkpoints[:-1]
+        if checkpoints:
+            entry.first_ts, entry.rows, offset = checkpoints[0][0], checkpoints[-1][1], checkpoints[-1][2]
+        else:
+            entry.first_ts, entry.rows, offset = None, 0, 0
+        for line in read_span(path, offset).splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break       # urwana linia - LogWriter.recover() i tak ją obetnie
+            sample = parse_log_line(line)
+            if sample is not None:
+                self._add(entry, sample.ts, offset)
+            offset += len(line)
+        entry.size = offset
+        if entry.checkpoints != stored:
+            data = pack_checkpoints(entry.checkpoints)
+            if self.io:
+                self.io.put(('replace', checkpoint_path(log_path), data))
+            else:
+                self._write_file(checkpoint_path(log_path), data)
+
+    def rebuild(self):
+        """Jednorazowe przejście po plikach CSV (migracja istniejących logów)."""
+        self.entries = {}
+        for fname in os.listdir(self.log_dir):
+            m = LOG_RE.match(fname)
+            if not m:
+                continue
+            name = f"{m.group(1)}_{m.group(2)}.csv"
+            if name in self.entries:
+                continue    # CSV i archiwum naraz (przerwana kompresja) - liczy się jeden wpis
+            entry = LogEntry(int(m.group(1)), m.group(2), name, checkpoints=[])
+            offset = 0
+            with open_log(locate(os.path.join(self.log_dir, name))[0]) as f:
+                for line in f:
+                    sample = parse_log_line(line)
+                    if sample is not None:
+                        self._add(entry, sample.ts, offset)
+                    offset += len(line)
+            entry.size = offset
+            self.entries[name] = entry
+            self._write_file(checkpoint_path(self._log_path(entry)), pack_checkpoints(entry.checkpoints))
+        self.next_seq = max((e.seq for e in self.entries.values()), default=0) + 1
+        self.save()
+
+    def next_log(self, date=None):
+        """Rejestruje nowy plik logu z kolejnym numerem; zwraca (ścieżka, LogEntry)."""
+        self._close_checkpoints()
+        seq = max(self.next_seq, max((e.seq for e in self.entries.values()), default=0) + 1)
+        date_str = (date or datetime.date.today()).strftime('%Y%m%d')
+        entry = LogEntry(seq, date_str, f"{seq:03d}_{date_str}.csv", checkpoints=[])
+        self.entries[entry.name] = entry
+        self.next_seq = seq + 1
+        path = self._log_path(entry)
+        self._cp_fd = os.open(checkpoint_path(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.save()
+        return path, entry
+
+    def _add(self, entry, ts, offset):
+        checkpoint = None
+        if entry.rows % self.checkpoint_rows == 0:
+            checkpoint = [ts, entry.rows, offset]
+            if entry.checkpoints is not None:
+                entry.checkpoints.append(checkpoint)
+        if entry.first_ts is None:
+            entry.first_ts = ts
+        entry.last_ts = ts
+        entry.rows += 1
+        return checkpoint
+
+    def record(self, entry, ts, offset, end):
+        """
+        Pomiar zapisany w CSV od bajtu offset do end. O(1); co checkpoint_rows
+        pomiarów 24 B punktu kontrolnego do <log>.cp, głowa bez zmian.
+        """
+        entry.size = end
+        checkpoint = self._add(entry, ts, offset)
+        if checkpoint is not None and self._cp_fd is not None:
+            data = pack_checkpoints([checkpoint])
+            if self.io:
+                self.io.put(('write', self._cp_fd, data))
+            else:
+                write_all(self._cp_fd, data)
+
+    def _close_checkpoints(self):
+        if self._cp_fd is None:
+            return
+        if self.io:
+            self.io.put(('close', self._cp_fd))
+        else:
+            os.close(self._cp_fd)
+        self._cp_fd = None
+
+    def close(self):
+        """Zamyka bieżący log w katalogu (rotacja, koniec pracy): głowa z jego końcowym wierszem."""
+        self._close_checkpoints()
+        self.save()
+
+    def checkpoints(self, entry):
+        """Punkty kontrolne pliku (wczytywane z <log>.cp przy pierwszym użyciu)."""
+        if entry.checkpoints is None:
+            entry.checkpoints = read_checkpoints(self._log_path(entry))
+        return entry.checkpoints
+
+    def files_for(self, t0=None, t1=None):
+        """Pliki, które mogą zawierać pomiary z t0 <= ts < t1."""
+        entries = self.sorted()
+        return [e for i, e in enumerate(entries) if e.overlaps(t0, t1, open_end=i == len(entries) - 1)]
+
+    def read_range(self, t0=None, t1=None):
+        """Pomiary z t0 <= ts < t1 jako tablica SAMPLE_DTYPE."""
+        parts = []
+        for entry in self.files_for(t0, t1):
+            csv_path = os.path.join(self.log_dir, entry.name)
+            seg = segment_path(csv_path)
+            if os.path.isdir(seg):
+                parts.append(Segment(seg).to_array(t0, t1))
+            else:
+                path = locate(csv_path)[0]
+                if path is not None:
+                    parts.append(self._read_csv(path, entry, t0, t1))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=SAMPLE_DTYPE)
+
+    def _read_csv(self, path, entry, t0, t1):
+        self.checkpoints(entry)
+        _, start, end = entry.span(t0, t1)
+        samples = parse_log(read_span(path, start, end))
+        ts = samples['ts']
+        keep = np.ones(len(samples), dtype=bool)
+        if t0 is not None:
+            keep &= ts >= t0
+        if t1 is not None:
+            keep &= ts < t1
+        return samples[keep]
@@ -0,0 +1,175 @@
+"""
+Komendy SMS odpowiadane ze stanu w pamięci i z agregatów (rollup), bez
+czytania logów. Odpowiedź mieści się w jednym SMS-ie GSM-7.
+
+    status                  ostatni pomiar
+    avg 24h                 średnie z okresu (m, h, d, w; np. 90m, 3d, 2w)
+    delta 7d                zmiana masy w okresie
+    min temp tonight        min/max wielkości w okresie (tonight, today albo czas)
+    max mass 3d
+    history mass 3d         kolejne średnie (godzinowe albo dobowe)
+    help
+
+Wielkości: mass (masa, waga), temp (T1 i T2), hum (H1 i H2), t1, t2, h1, h2.
+"""
+
+import math
+import re
+import time
+
+import numpy as np
+
+from . import gsm7
+from .rollup import RESOLUTIONS, bucket_bounds, local_midnight
+
+HELP = "Komendy: status, avg 24h, delta 7d, min temp tonight, max mass 3d, history mass 3d"
+UNKNOWN = "Nieznana komenda. " + HELP
+
+METRIC_NAMES = {
+    'mass': ('mass',), 'masa': ('mass',), 'waga': ('mass',),
+    'temp': ('t1', 't2'), 't': ('t1', 't2'), 'hum': ('h1', 'h2'), 'wilg': ('h1', 'h2'),
+    't1': ('t1',), 't2': ('t2',), 'h1': ('h1',), 'h2': ('h2',),
+}
+UNITS = {'mass': 'kg', 't1': 'C', 't2': 'C', 'h1': '%', 'h2': '%'}
+DIGITS = {'mass': 2, 't1': 1, 't2': 1, 'h1': 0, 'h2': 0}
+DURATION_RE = re.compile(r'^(\d+(?:\.\d+)?)([mhdw])$')
+UNIT_SECONDS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_duration(text):
+    """'24h' -> 86400.0; None gdy to nie jest czas."""
+    m = DURATION_RE.match(text)
+    return float(m.group(1)) * UNIT_SECONDS[m.group(2)] if m else None
+
+
+def period(text, now):
+    """Okres (t0, t1, etykieta) dla '24h', 'today'/'dzis', 'tonight'/'noc'."""
+    lt = time.localtime(now)
+    if text in ('today', 'dzis'):
+        return local_midnight(lt.tm_year, lt.tm_mon, lt.tm_mday), now, 'dzis'
+    if text in ('tonight', 'noc'):
+        # ostatnia rozpoczęta noc 22:00-06:00
+        day = lt.tm_mday if lt.tm_hour >= 22 else lt.tm_mday - 1
+        start = local_midnight(lt.tm_year, lt.tm_mon, day) + 22 * 3600
+        return start, min(now, start + 8 * 3600), 'noc'
+    seconds = parse_duration(text)
+    if seconds is None:
+        return None
+    return now - seconds, now, text
+
+
+def resolution_for(seconds):
+    if seconds <= 2 * 3600:
+        return 'minute'
+    if seconds <= 4 * 86400:
+        return 'hour'
+    return 'day'
+
+
+def fmt(value, metric):
+    if value is None or math.isnan(value):
+        return '-'
+    return f"{value:.{DIGITS[metric]}f}{UNITS[metric]}"
+
+
+class CommandHandler:
+    """
+    latest: funkcja zwracająca ostatni telemetry.Sample (albo None),
+    rollup: pasieka.rollup.Rollup aktualizowany przez logger.
+    """
+
+    def __init__(self, latest, rollup, clock=time.time):
+        self.latest = latest
+        self.rollup = rollup
+        self.clock = clock
+        self.last_elapsed = 0.0
+
+    def handle(self, text):
+        """Odpowiedź na treść SMS (zawsze jeden segment GSM-7); czas w last_elapsed."""
+        start = time.perf_counter()
+        try:
+            reply = self._dispatch(text.strip().lower().split())
+        except Exception as e:
+            reply = f"Blad: {e}"
+        reply = gsm7.fit(reply)
+        self.last_elapsed = time.perf_counter() - start
+        return reply
+
+    def _dispatch(self, words):
+        now = self.clock()
+        if not words or words[0] == 'help':
+            return HELP
+        cmd, args = words[0], words[1:]
+        if cmd == 'status' and not args:
+            return self.status()
+        if cmd in ('avg', 'srednia') and len(args) == 1:
+            return self.avg(args[0], now)
+        if cmd == 'delta' and len(args) == 1:
+            return self.delta(args[0], now)
+        if cmd in ('min', 'max') and len(args) == 2:
+            return self.extreme(cmd, args[0], args[1], now)
+        if cmd in ('history', 'historia') and len(args) == 2:
+            return self.history(args[0], args[1], now)
+        return UNKNOWN
+
+    def _rows(self, text, now):
+        p = period(text, now)
+        if p is None:
+            raise ValueError(f"zly okres '{text}'")
+        t0, t1, label = p
+        name = resolution_for(t1 - t0)
+        start = bucket_bounds(t0, RESOLUTIONS[name])[0]
+        return self.rollup.table(name, start, t1), label, name
+
+    def status(self):
+        s = self.latest()
+        if s is None:
+            return 'Brak danych'
+        return (f"{fmt(s.mass, 'mass')} T1 {fmt(s.t1, 't1')} H1 {fmt(s.h1, 'h1')} "
+                f"T2 {fmt(s.t2, 't2')} H2 {fmt(s.h2, 'h2')} ({time.strftime('%d.%m %H:%M', time.localtime(s.ts))})")
+
+    def avg(self, text, now):
+        rows, label, _ = self._rows(text, now)
+        parts = []
+        for m in UNITS:
+            n = rows[f'{m}_n'].sum()
+            parts.append(f"{m} {fmt(rows[f'{m}_sum'].sum() / n if n else math.nan, m)}")
+        return f"Srednia {label}: " + " ".join(parts)
+
+    def delta(self, text, now):
+        rows, label, _ = self._rows(text, now)
+        ok = rows['mass_n'] > 0
+        if not ok.any():
+            return f"Brak danych z {label}"
+        first = float(rows['mass_first'][ok][0])
+        last = float(rows['mass_last'][ok][-1])
+        return f"Zmiana masy {label}: {last - first:+.2f}kg ({first:.2f} -> {last:.2f})"
+
+    def extreme(self, which, metric, text, now):
+        metrics = METRIC_NAMES.get(metric)
+        if metrics is None:
+            return UNKNOWN
+        rows, label, _ = self._rows(text, now)
+        reduce = np.nanmin if which == 'min' else np.nanmax
+        parts = []
+        for m in metrics:
+            col = rows[f'{m}_{which}']
+            value = float(reduce(col)) if len(col) and not np.isnan(col).all() else math.nan
+            parts.append(f"{m} {fmt(value, m)}")
+        return f"{which} {label}: " + " ".join(parts)
+
+    def history(self, metric, text, now):
+        metrics = METRIC_NAMES.get(metric)
+        if metrics is None:
+            return UNKNOWN
+        m = metrics[0]
+        rows, label, name = self._rows(text, now)
+        n = rows[f'{m}_n']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(n > 0, rows[f'{m}_sum'] / n, np.nan)
+        head = f"{m} {label} ({name[0]}): "
+        values = [fmt(v, m).rstrip(UNITS[m]) for v in means.tolist()]
+        # najnowsze wartości są najważniejsze - przy braku miejsca ucinamy najstarsze
+        while values and gsm7.septets(head + " ".join(values)) > gsm7.SINGLE_SEGMENT:
+            values.pop(0)
+        return head + " ".join(values)
@@ -0,0 +1,223 @@
+"""
+Wykrywanie zdarzeń w strumieniu pomiarów: przewrócenie/kradzież ula,
+rójka, zmiana trendu masy i rozjazd czujników DHT1/DHT2.
+
+Detector.update() robi stałą pracę na pomiar i trzyma kilka liczb stanu:
+
+* tip        - masa spadła o >= tip_drop kg między kolejnymi pomiarami
+               albo waga pokazuje prawie zero (ul zdjęty/przewrócony),
+* swarm      - jednorazowy spadek o swarm_min..swarm_max kg (rójka),
+* mass_shift - dwustronny CUSUM odchyłek masy od średniej EWMA,
+* temp_divergence - |T1 - T2| > temp_diff (zgłaszane raz, do powrotu).
+
+Alarm pojawia się przy tym samym pomiarze, który go wywołał. Po tip,
+swarm i mass_shift linia bazowa (EWMA) startuje od bieżącej masy.
+
+replay() odtwarza te same reguły wektorowo na tablicy historycznej, do
+strojenia progów:
+
+    python3 -m pasieka.detect pasieka_logi --tip-drop 4 --swarm-min 1
+"""
+
+import argparse
+import math
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from .catalog import Catalog
+from .telemetry import format_timestamp
+
+
+@dataclass
+class DetectorConfig:
+    alpha: float = 0.05         # waga nowego pomiaru w EWMA masy
+    cusum_k: float = 0.05       # kg, dryf tolerowany przez CUSUM
+    cusum_h: float = 1.5        # kg, próg alarmu CUSUM
+    tip_drop: float = 5.0       # kg spadku między pomiarami = przewrócenie/kradzież
+    empty_mass: float = 2.0     # kg, poniżej tego na wadze nie ma ula
+    swarm_min: float = 0.8      # kg, zakres skokowego spadku uznawanego za rójkę
+    swarm_max: float = 4.0
+    temp_diff: float = 8.0      # °C różnicy między DHT1 i DHT2
+
+
+@dataclass
+class Alert:
+    kind: str       # 'tip', 'swarm', 'mass_shift', 'temp_divergence'
+    ts: float
+    value: float    # spadek masy, wartość CUSUM albo różnica temperatur
+    message: str
+
+
+MESSAGES = {
+    'tip': "ALARM: ul przewrocony lub zdjety z wagi ({:.1f} kg)",
+    'swarm': "Mozliwa rojka: spadek masy o {:.2f} kg",
+    'mass_shift': "Zmiana trendu masy (CUSUM {:+.2f} kg)",
+    'temp_divergence': "Rozbieznosc DHT1/DHT2: {:.1f} C",
+}
+
+
+def make_alert(kind, ts, value):
+    return Alert(kind, ts, value, MESSAGES[kind].format(value))
+
+
+class Detector:
+    def __init__(self, config=None):
+        self.config = config or DetectorConfig()
+        self.ewma = None
+        self.prev = None
+        self.s_pos = 0.0
+        self.s_neg = 0.0
+        self.tipped = False
+        self.diverged = False
+
+    def _rebase(self, mass):
+        self.ewma = mass
+        self.s_pos = self.s_neg = 0.0
+
+    def update(self, sample):
+        """Przetwarza telemetry.Sample, zwraca listę alarmów (zwykle pustą)."""
+        cfg = self.config
+        alerts = []
+        m = sample.mass
+        if m == m:      # pomijamy NaN
+            if m <= cfg.empty_mass:
+                if not self.tipped:
+                    alerts.append(make_alert('tip', sample.ts, m))
+                self.tipped = True
+                self._rebase(m)
+            elif self.prev is None:
+                self.tipped = False
+                self._rebase(m)
+            else:
+                self.tipped = False
+                drop = self.prev - m
+                if drop >= cfg.tip_drop:
+                    alerts.append(make_alert('tip', sample.ts, m))
+                    self._rebase(m)
+                elif cfg.swarm_min <= drop <= cfg.swarm_max:
+                    alerts.append(make_alert('swarm', sample.ts, drop))
+                    self._rebase(m)
+                else:
+                    r = m - self.ewma
+                    self.s_pos = max(0.0, self.s_pos + r - cfg.cusum_k)
+                    self.s_neg = max(0.0, self.s_neg - r - cfg.cusum_k)
+                    if self.s_pos > cfg.cusum_h or self.s_neg > cfg.cusum_h:
+                        value = self.s_pos if self.s_pos > cfg.cusum_h else -self.s_neg
+                        alerts.append(make_alert('mass_shift', sample.ts, value))
+                        self._rebase(m)
+                    else:
+                        self.ewma += cfg.alpha * r
+            self.prev = m
+        diff = abs(sample.t1 - sample.t2)
+        diverged = diff > cfg.temp_diff     # False dla NaN
+        if diverged and not self.diverged:
+            alerts.append(make_alert('temp_divergence', sample.ts, diff))
+        self.diverged = diverged
+        return alerts
+
+
+# --- tryb offline ---
+
+def ewma(x, alpha, y0):
+    """y[i] = y[i-1] + alpha * (x[i] - y[i-1]), y[-1] = y0; wektorowo w kawałkach."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty_like(x)
+    beta = 1.0 - alpha
+    # kawałki na tyle krótkie, żeby beta**-n nie zjadło precyzji
+    step = max(1, int(math.log(1e6) / -math.log(beta))) if 0 < beta < 1 else len(x) or 1
+    for lo in range(0, len(x), step):
+        chunk = x[lo:lo + step]
+        p = beta ** np.arange(1, len(chunk) + 1)
+        out[lo:lo + step] = p * (y0 + np.cumsum(alpha * chunk / p))
+        y0 = out[lo + len(chunk) - 1]
+    return out
+
+
+def _lindley(y, s0=0.0):
+    """S[i] = max(0, S[i-1] + y[i]), S[-1] = s0."""
+    c = np.cumsum(y)
+    return c - np.minimum(-s0, np.minimum.accumulate(c))
+
+
+def replay(samples, config=None):
+    """Alarmy dla tablicy SAMPLE_DTYPE - te same reguły co Detector, wektorowo."""
+    cfg = config or DetectorConfig()
+    ts = samples['ts']
+    mass = samples['mass'].astype(np.float64)
+    alerts = []
+
+    valid = ~np.isnan(mass)
+    idx = np.flatnonzero(valid)
+    m = mass[idx]
+    empty = m <= cfg.empty_mass
+    drop = np.r_[np.nan, m[:-1] - m[1:]]
+    after_first = np.arange(len(m)) > 0
+    tip_step = ~empty & after_first & (drop >= cfg.tip_drop)
+    swarm = ~empty & after_first & ~tip_step & (drop >= cfg.swarm_min) & (drop <= cfg.swarm_max)
+    tip_empty = empty & ~np.r_[False, empty[:-1]]
+    for i in np.flatnonzero(tip_empty | tip_step):
+        alerts.append(make_alert('tip', ts[idx[i]], m[i]))
+    for i in np.flatnonzero(swarm):
+        alerts.append(make_alert('swarm', ts[idx[i]], drop[i]))
+
+    # CUSUM między punktami, w których linia bazowa startuje od nowa
+    rebase = empty | tip_step | swarm | ~after_first
+    points = np.flatnonzero(rebase)
+    bounds = np.r_[points, len(m)]
+    for b, nxt in zip(bounds[:-1], bounds[1:]):
+        start = b
+        while start + 1 < nxt:
+            # okno rośnie, dopóki nie ma alarmu; stan EWMA/CUSUM przechodzi między oknami
+            pos, y0, s_pos0, s_neg0, window = start + 1, m[start], 0.0, 0.0, 1024
+            hit_at = None
+            while pos < nxt:
+                x = m[pos:min(nxt, pos + window)]
+                e = ewma(x, cfg.alpha, y0)
+                r = x - np.r_[y0, e[:-1]]
+                s_pos = _lindley(r - cfg.cusum_k, s_pos0)
+                s_neg = _lindley(-r - cfg.cusum_k, s_neg0)
+                hit = np.flatnonzero((s_pos > cfg.cusum_h) | (s_neg > cfg.cusum_h))
+                if len(hit):
+                    j = hit[0]
+                    hit_at = pos + j
+                    value = s_pos[j] if s_pos[j] > cfg.cusum_h else -s_neg[j]
+                    break
+                y0, s_pos0, s_neg0 = e[-1], s_pos[-1], s_neg[-1]
+                pos += len(x)
+                window *= 2
+            if hit_at is None:
+                break
+            alerts.append(make_alert('mass_shift', ts[idx[hit_at]], value))
+            start = hit_at
+
+    with np.errstate(invalid='ignore'):
+        diff = np.abs(samples['t1'] - samples['t2'])
+        div = diff > cfg.temp_diff
+    for i in np.flatnonzero(div & ~np.r_[False, div[:-1]]):
+        alerts.append(make_alert('temp_divergence', ts[i], float(diff[i])))
+
+    alerts.sort(key=lambda a: a.ts)
+    return alerts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Odtwarza detektor na historycznych logach (strojenie progów).")
+    ap.add_argument('log_dir', nargs='?', default='pasieka_logi')
+    for f in fields(DetectorConfig):
+        ap.add_argument('--' + f.name.replace('_', '-'), type=float, default=f.default)
+    ap.add_argument('-v', '--verbose', action='store_true', help='wypisz każdy alarm')
+    args = ap.parse_args()
+    cfg = DetectorConfig(**{f.name: getattr(args, f.name) for f in fields(DetectorConfig)})
+    samples = Catalog(args.log_dir).read_range()
+    alerts = replay(samples, cfg)
+    counts = {}
+    for a in alerts:
+        counts[a.kind] = counts.get(a.kind, 0) + 1
+        if args.verbose:
+            print(f"{format_timestamp(a.ts)}  {a.message}")
+    print(f"{len(samples)} pomiarów, alarmy: " + (", ".join(f"{k}={v}" for k, v in counts.items()) or "brak"))
+
+
+if __name__ == '__main__':
+    main()
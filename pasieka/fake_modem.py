@@ -0,0 +1,474 @@
+"""
+Udawany modem SIM868 na pseudoterminalu (pty), do pomiarów bez karty SIM.
+
+    modem = FakeModem(latency=0.05, jitter=0.02, seed=1)
+    modem.start()
+    ser = serial.Serial(modem.port, 115200)
+    ...
+    modem.stop()
+
+Obsługuje komendy używane w skryptach: AT, ATE0, AT+CMGF, AT+CSCS,
+AT+CPMS, AT+CNMI, AT+CSMP, AT+CMGL, AT+CMGR, AT+CMGD (z delflag), AT+CMGS;
+wszystkie w trybie tekstowym i PDU (AT+CMGF=0: SMS-DELIVER z gsm7.deliver_pdu);
+pozostałe AT... odpowiadają OK. Odczyt ustawień (AT+CMGF?, AT+CNMI?,
+AT+CSCS?, AT+CSMP?) i komendy łączone średnikiem (AT+CMGF?;+CNMI?) - jedna
+odpowiedź z jednym kodem końcowym, jak w SIM868.
+
+GPRS i HTTP: AT+SAPBR (kontekst), AT+HTTPINIT/HTTPPARA/HTTPDATA/HTTPACTION/
+HTTPREAD/HTTPTERM. AT+HTTPACTION naprawdę wysyła żądanie (urllib) pod
+adres z AT+HTTPPARA="URL", np. do lokalnego serwera z pasieka/uplink.py,
+i odpowiada URC +HTTPACTION: <metoda>,<status>,<długość>.
+
+Scenariusze:
+
+* deliver_sms() / burst() - SMS z sieci (URC +CMT albo +CMTI, zależnie
+  od AT+CNMI); przy pełnej skrzynce (capacity) SMS zapisywany na SIM jest
+  odrzucany i liczony w rejected,
+* fill_inbox() - skrzynka SIM pełna wiadomości od startu,
+* add_long_sms() - wiadomość wieloczęściowa w skrzynce (części z UDH,
+  widoczne jako całość tylko w trybie PDU), także z brakującymi częściami,
+* fail() - następne komendy z danym prefiksem dostają podany błąd albo
+  nie dostają odpowiedzi (response=None, timeout po stronie skryptu),
+* error_rate - losowy odsetek komend kończonych błędem,
+* gprs=False - brak zasięgu GPRS: AT+SAPBR=1,1 kończy się błędem,
+* bearer_delay - zestawianie kontekstu GPRS trwa tyle sekund: OK na
+  AT+SAPBR=1,1 przychodzi po tym czasie, a AT+SAPBR=2,1 podaje stan 0,
+* ready_after - modem dopiero się uruchamia: przez tyle sekund od start()
+  nie odpowiada na nic,
+* latency + jitter - opóźnienie każdej odpowiedzi; losowość z ziarnem
+  seed, więc przebieg jest powtarzalny.
+
+sent zawiera wysłane SMS-y (numer, treść), sent_times ich czasy
+(time.monotonic()) - do liczenia opóźnienia odpowiedzi; uploads -
+żądania HTTP (adres, status, liczba bajtów treści).
+"""
+
+import os
+import random
+import re
+import select
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from . import gsm7
+
+CMGS_RE = re.compile(r'^AT\+CMGS="([^"]*)"$')
+CMGS_PDU_RE = re.compile(r'^AT\+CMGS=(\d+)$')
+CMGF_RE = re.compile(r'^AT\+CMGF=(\d)')
+CMGD_RE = re.compile(r'^AT\+CMGD=(\d+)(?:,(\d))?')
+CMGL_RE = re.compile(r'^AT\+CMGL(?:=(?:"([^"]*)"|(\d)))?')
+CMGR_RE = re.compile(r'^AT\+CMGR=(\d+)')
+CNMI_RE = re.compile(r'^AT\+CNMI=(\d+),(\d+)')
+CSCS_RE = re.compile(r'^AT\+CSCS=("[^"]*")')
+CSMP_RE = re.compile(r'^AT\+CSMP=([\d,]+)')
+CPMS_RE = re.compile(r'^AT\+CPMS(\?|=)')
+SAPBR_RE = re.compile(r'^AT\+SAPBR=(\d),\d')
+HTTPPARA_RE = re.compile(r'^AT\+HTTPPARA="([^"]*)",(?:"([^"]*)"|(\d+))$', re.I)
+HTTPDATA_RE = re.compile(r'^AT\+HTTPDATA=(\d+),(\d+)')
+HTTPACTION_RE = re.compile(r'^AT\+HTTPACTION=(\d)')
+HTTP_METHODS = {0: 'GET', 1: 'POST', 2: 'HEAD'}
+
+STATUS_CODES = {'REC UNREAD': 0, 'REC READ': 1, 'STO UNSENT': 2, 'STO SENT': 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# AT+CMGD=<idx>,<delflag>: statusy usuwane przy danym delflag (0 = tylko idx)
+DELFLAG = {
+    1: ('REC READ',),
+    2: ('REC READ', 'STO SENT'),
+    3: ('REC READ', 'STO SENT', 'STO UNSENT'),
+    4: ('REC READ', 'REC UNREAD', 'STO SENT', 'STO UNSENT'),
+}
+
+
+class FakeModem:
+    def __init__(self, latency=0.0, jitter=0.0, capacity=30, error_rate=0.0, seed=None, ready_after=0.0,
+                 gprs=True, bearer_delay=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.capacity = capacity        # miejsca w pamięci SIM ("SM")
+        self.error_rate = error_rate
+        self.ready_after = ready_after
+        self.gprs = gprs
+        self.bearer_delay = bearer_delay
+        self.rng = random.Random(seed)
+        self.echo = True
+        self.inbox = {}         # index -> (status, sender, date, text, łączenie albo None)
+        self.sent = []          # (number, text)
+        self.sent_times = []
+        self.rejected = 0       # SMS-y niezapisane, bo skrzynka pełna
+        self.commands = 0
+        self._faults = []       # [prefiks, odpowiedź albo None, ile razy]
+        self._ref = 0
+        self._sms_to = None     # numer po AT+CMGS, czekamy na treść
+        self.cnmi = '0,0,0,0,0'
+        self.cnmi_mt = 0        # drugi parametr AT+CNMI: 1 -> +CMTI, 2 -> +CMT
+        self.pdu_mode = False   # AT+CMGF=0; wysłane części trafiają do sent jako ('PDU', hex)
+        self.cscs = '"IRA"'
+        self.csmp = '17,167,0,0'
+        self.bearer = False     # AT+SAPBR=1,1 otworzył kontekst GPRS
+        self.connecting = False  # AT+SAPBR=1,1 w toku (bearer_delay)
+        self.http = None        # parametry sesji AT+HTTPINIT (HTTPPARA) albo None
+        self.http_data = b''
+        self.http_response = (0, b'')
+        self.uploads = []       # (adres, status, bajty treści)
+        self._data_left = 0     # bajty AT+HTTPDATA jeszcze do odebrania
+        self._ready_at = 0.0
+        self._collect = None    # linie odpowiedzi zbierane przy komendzie łączonej
+        self._master, self._slave = os.openpty()
+        self.port = os.ttyname(self._slave)
+        self._running = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._ready_at = time.monotonic() + self.ready_after
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(1)
+        os.close(self._master)
+        os.close(self._slave)
+
+    # --- scenariusze ---
+
+    def add_sms(self, sender, text, status='REC UNREAD', date='25/05/01,12:00:00+08', concat=None):
+        """Zapisuje SMS (albo część, concat=(ref, części, numer)) w skrzynce; None, gdy skrzynka pełna."""
+        with self._lock:
+            if len(self.inbox) >= self.capacity:
+                self.rejected += 1
+                return None
+            idx = next(i for i in range(1, self.capacity + 1) if i not in self.inbox)
+            self.inbox[idx] = (status, sender, date, text, concat)
+            return idx
+
+    def add_long_sms(self, sender, text, ref=1, missing=(), date='25/05/01,12:00:00+08'):
+        """Wiadomość wieloczęściowa w skrzynce (bez części o numerach z missing); zwraca indeksy."""
+        parts = gsm7.split(gsm7.to_gsm7(text))
+        return [self.add_sms(sender, part, date=date, concat=(ref, len(parts), seq))
+                for seq, part in enumerate(parts, 1) if seq not in missing]
+
+    def fill_inbox(self, n=None, sender='+48600000000', text='sms {}'):
+        """Wypełnia skrzynkę (domyślnie do pełna); zwraca liczbę dodanych."""
+        n = self.capacity - len(self.inbox) if n is None else n
+        return sum(self.add_sms(sender, text.format(i)) is not None for i in range(n))
+
+    def deliver_sms(self, sender, text, date='25/05/01,12:00:00+08'):
+        """SMS z sieci: +CMT z treścią, albo zapis do skrzynki i +CMTI."""
+        if self.cnmi_mt == 2:
+            if self.pdu_mode:
+                pdu, length = gsm7.deliver_pdu(sender, text, date)
+                self._write(f'\r\n+CMT: ,{length}\r\n{pdu}\r\n'.encode())
+            else:
+                self._write(f'\r\n+CMT: "{sender}","","{date}"\r\n{text}\r\n'.encode())
+            return None
+        idx = self.add_sms(sender, text, date=date)
+        if idx is not None and self.cnmi_mt == 1:
+            self._write(f'\r\n+CMTI: "SM",{idx}\r\n'.encode())
+        return idx
+
+    def burst(self, n, sender, text='status', interval=0.0):
+        """n SMS-ów z sieci jeden po drugim; zwraca czasy dostarczenia (time.monotonic())."""
+        times = []
+        for i in range(n):
+            times.append(time.monotonic())
+            self.deliver_sms(sender, text.format(i))
+            if interval:
+                time.sleep(interval)
+        return times
+
+    def fail(self, prefix, response='+CMS ERROR: 500', times=1):
+        """
+        Kolejne times komend zaczynających się od prefix dostaje response
+        (None = brak odpowiedzi). Prefiks '<PAYLOAD>' to treść SMS po AT+CMGS.
+        """
+        self._faults.append([prefix.upper(), response, times])
+
+    # --- obsługa portu ---
+
+    def _delay(self):
+        d = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if d:
+            time.sleep(d)
+
+    def _write(self, data):
+        os.write(self._master, data)
+
+    def _reply(self, *lines):
+        if self._collect is not None:
+            self._collect.extend(lines)
+            return
+        self._delay()
+        self._write(b''.join(b'\r\n' + l.encode() + b'\r\n' for l in lines))
+
+    def _run(self):
+        buf = bytearray()
+        while self._running:
+            r, _, _ = select.select([self._master], [], [], 0.1)
+            if not r:
+                continue
+            try:
+                buf += os.read(self._master, 4096)
+            except OSError:
+                break
+            self._consume(buf)
+
+    def _consume(self, buf):
+        while True:
+            if self._data_left:
+                if not buf:
+                    return
+                chunk = bytes(buf[:self._data_left])
+                del buf[:len(chunk)]
+                self.http_data += chunk
+                self._data_left -= len(chunk)
+                if not self._data_left:
+                    self._reply('OK')
+                continue
+            if self._sms_to is not None:
+                end = buf.find(b'\x1a')
+                esc = buf.find(b'\x1b')
+                if esc >= 0 and (end < 0 or esc < end):
+                    del buf[:esc + 1]
+                    self._sms_to = None
+                    continue
+                if end < 0:
+                    return
+                text = bytes(buf[:end]).decode(errors='ignore')
+                del buf[:end + 1]
+                if self._injected('<PAYLOAD>'):
+                    self._sms_to = None
+                    continue
+                self.sent.append((self._sms_to, text))
+                self.sent_times.append(time.monotonic())
+                self._sms_to = None
+                self._ref = (self._ref + 1) & 0xFF
+                self._reply(f'+CMGS: {self._ref}', 'OK')
+                continue
+            cr = buf.find(b'\r')
+            if cr < 0:
+                return
+            # ESC/Ctrl+Z poza zachętą (np. anulowanie po błędzie) modem ignoruje
+            cmd = bytes(buf[:cr]).decode(errors='ignore').strip().strip('\x1b\x1a')
+            del buf[:cr + 1]
+            if cmd:
+                self._handle(cmd)
+
+    def _injected(self, up):
+        """Błąd z fail() albo z error_rate; True, gdy komenda została już obsłużona."""
+        for f in self._faults:
+            if up.startswith(f[0]):
+                f[2] -= 1
+                if f[2] <= 0:
+                    self._faults.remove(f)
+                if f[1] is not None:
+                    self._reply(f[1])
+                return True
+        if self.error_rate and up != 'ATE0' and self.rng.random() < self.error_rate:
+            sms = up.startswith(('AT+CMG', 'AT+CPMS', '<PAYLOAD>'))
+            self._reply('+CMS ERROR: 500' if sms else 'ERROR')
+            return True
+        return False
+
+    def _handle(self, cmd):
+        if time.monotonic() < self._ready_at:
+            return          # jeszcze się uruchamia
+        self.commands += 1
+        if self.echo:
+            self._write(cmd.encode() + b'\r')
+        if ';' in cmd and not cmd.upper().startswith(('AT+CMGS', 'AT+HTTPPARA')):
+            self._chain(cmd.split(';'))
+        else:
+            self._execute(cmd)
+
+    def _chain(self, parts):
+        """AT+X;+Y;... - odpowiedzi po kolei, jeden kod końcowy; pierwszy błąd przerywa."""
+        out = []
+        try:
+            for part in parts:
+                self._collect = []
+                self._execute(part if part.upper().startswith('AT') else 'AT' + part)
+                if not self._collect:
+                    return      # brak odpowiedzi (fail() z response=None)
+                *lines, final = self._collect
+                out += lines
+                if final != 'OK':
+                    out.append(final)
+                    break
+            else:
+                out.append('OK')
+        finally:
+            self._collect = None
+        self._reply(*out)
+
+    def _execute(self, cmd):
+        up = cmd.upper()
+        if self._injected(up):
+            return
+        if up == 'ATE0':
+            self.echo = False
+            self._reply('OK')
+        elif m := CMGL_RE.match(up):
+            if self.pdu_mode:
+                code = int(m.group(2) or 0)
+                want = 'ALL' if code == 4 else STATUS_NAMES.get(code)
+            else:
+                want = m.group(1) or 'REC UNREAD'
+            lines = []
+            with self._lock:
+                for idx, (status, sender, date, text, concat) in sorted(self.inbox.items()):
+                    if want != 'ALL' and status != want:
+                        continue
+                    if self.pdu_mode:
+                        pdu, length = gsm7.deliver_pdu(sender, text, date, concat)
+                        lines += [f'+CMGL: {idx},{STATUS_CODES[status]},,{length}', pdu]
+                    else:
+                        lines += [f'+CMGL: {idx},"{status}","{sender}","","{date}"', text]
+                    if status == 'REC UNREAD':
+                        self.inbox[idx] = ('REC READ', sender, date, text, concat)
+            self._reply(*lines, 'OK')
+        elif m := CMGR_RE.match(up):
+            with self._lock:
+                msg = self.inbox.get(int(m.group(1)))
+                if msg is not None:
+                    status, sender, date, text, concat = msg
+                    self.inbox[int(m.group(1))] = ('REC READ', sender, date, text, concat)
+            if msg is None:
+                self._reply('+CMS ERROR: 321')
+            elif self.pdu_mode:
+                pdu, length = gsm7.deliver_pdu(sender, text, date, concat)
+                self._reply(f'+CMGR: {STATUS_CODES[status]},,{length}', pdu, 'OK')
+            else:
+                self._reply(f'+CMGR: "{status}","{sender}","","{date}"', text, 'OK')
+        elif up == 'AT+CMGF?':
+            self._reply(f'+CMGF: {0 if self.pdu_mode else 1}', 'OK')
+        elif up == 'AT+CNMI?':
+            self._reply(f'+CNMI: {self.cnmi}', 'OK')
+        elif up == 'AT+CSCS?':
+            self._reply(f'+CSCS: {self.cscs}', 'OK')
+        elif up == 'AT+CSMP?':
+            self._reply(f'+CSMP: {self.csmp}', 'OK')
+        elif m := CNMI_RE.match(up):
+            self.cnmi = up.partition('=')[2]
+            self.cnmi_mt = int(m.group(2))
+            self._reply('OK')
+        elif m := CSCS_RE.match(up):
+            self.cscs = m.group(1)
+            self._reply('OK')
+        elif m := CSMP_RE.match(up):
+            self.csmp = m.group(1)
+            self._reply('OK')
+        elif m := CMGD_RE.match(up):
+            flag = int(m.group(2) or 0)
+            with self._lock:
+                if flag == 0:
+                    self.inbox.pop(int(m.group(1)), None)
+                else:
+                    for idx in [i for i, msg in self.inbox.items() if msg[0] in DELFLAG.get(flag, ())]:
+                        del self.inbox[idx]
+            self._reply('OK')
+        elif m := CPMS_RE.match(up):
+            used = len(self.inbox)
+            if m.group(1) == '?':
+                self._reply(f'+CPMS: "SM",{used},{self.capacity},"SM",{used},{self.capacity},'
+                            f'"SM",{used},{self.capacity}', 'OK')
+            else:
+                self._reply(f'+CPMS: {used},{self.capacity},{used},{self.capacity},{used},{self.capacity}', 'OK')
+        elif m := CMGF_RE.match(up):
+            self.pdu_mode = m.group(1) == '0'
+            self._reply('OK')
+        elif (m := CMGS_RE.match(cmd)) or (self.pdu_mode and CMGS_PDU_RE.match(up)):
+            self._sms_to = m.group(1) if m else 'PDU'
+            self._delay()
+            self._write(b'\r\n> ')
+        elif up.startswith(('AT+SAPBR', 'AT+HTTP')):
+            self._gprs_command(cmd, up)
+        elif up.startswith('AT'):
+            self._reply('OK')
+        else:
+            self._reply('ERROR')
+
+    # --- GPRS i HTTP ---
+
+    def _bearer_ready(self):
+        with self._lock:
+            self.connecting = False
+            self.bearer = True
+            if self._running:
+                self._write(b'\r\nOK\r\n')
+
+    def _gprs_command(self, cmd, up):
+        if m := SAPBR_RE.match(up):
+            op = int(m.group(1))
+            if op == 2:
+                state, ip = (1, '10.64.0.2') if self.bearer else (0 if self.connecting else 3, '0.0.0.0')
+                self._reply(f'+SAPBR: 1,{state},"{ip}"', 'OK')
+            elif op == 1:
+                # SIM868 odrzuca ponowne otwarcie otwartego kontekstu
+                ok = self.gprs and not self.bearer and not self.connecting
+                if ok and self.bearer_delay:
+                    self.connecting = True
+                    threading.Timer(self.bearer_delay, self._bearer_ready).start()
+                    return
+                self.bearer = self.bearer or ok
+                self._reply('OK' if ok else 'ERROR')
+            elif op == 0:
+                self._reply('OK' if self.bearer else 'ERROR')
+                self.bearer = False
+            else:
+                self._reply('OK')       # AT+SAPBR=3,1,"CONTYPE"/"APN",...
+        elif up == 'AT+HTTPINIT':
+            ok = self.http is None
+            self.http = self.http if not ok else {}
+            self._reply('OK' if ok else 'ERROR')
+        elif up == 'AT+HTTPTERM':
+            ok = self.http is not None
+            self.http = None
+            self._reply('OK' if ok else 'ERROR')
+        elif self.http is None:
+            self._reply('ERROR')
+        elif m := HTTPPARA_RE.match(cmd):
+            self.http[m.group(1).upper()] = m.group(2) if m.group(2) is not None else m.group(3)
+            self._reply('OK')
+        elif m := HTTPDATA_RE.match(up):
+            self.http_data = b''
+            self._data_left = int(m.group(1))
+            self._reply('DOWNLOAD')
+            if not self._data_left:
+                self._reply('OK')
+        elif m := HTTPACTION_RE.match(up):
+            self._reply('OK')
+            # wynik przychodzi później jako URC, modem w tym czasie przyjmuje komendy
+            threading.Thread(target=self._http_action, args=(int(m.group(1)),), daemon=True).start()
+        elif up == 'AT+HTTPREAD':
+            status, body = self.http_response
+            self._reply(f'+HTTPREAD: {len(body)}', *([body.decode(errors='replace')] if body else []), 'OK')
+        else:
+            self._reply('ERROR')
+
+    def _http_action(self, method):
+        url = self.http.get('URL', '') if self.http is not None else ''
+        body = self.http_data if method == 1 else None
+        if not self.bearer:
+            status, data = 601, b''         # brak kontekstu GPRS
+        else:
+            req = urllib.request.Request(url, body, method=HTTP_METHODS.get(method, 'GET'))
+            if body is not None:
+                req.add_header('Content-Type', self.http.get('CONTENT', 'text/plain'))
+            try:
+                with urllib.request.urlopen(req, timeout=30) as r:
+                    status, data = r.status, r.read()
+            except urllib.error.HTTPError as e:
+                status, data = e.code, e.read()
+            except (urllib.error.URLError, OSError, ValueError):
+                status, data = 603, b''     # serwer nieosiągalny (603 = błąd DNS/sieci w SIM868)
+        self.http_response = status, data
+        self.uploads.append((url, status, len(body or b'')))
+        self._delay()
+        self._write(f'\r\n+HTTPACTION: {method},{status},{len(data)}\r\n'.encode())
@@ -0,0 +1,242 @@
+"""
+Binarna ramka pomiaru (nadajnik MAIN.ino -> RH_ASK -> odbiornik -> Pi).
+
+Wersja 1, 20 bajtów, little-endian (jak struct na AVR):
+
+    0  magic    u1   0xBE
+    1  version  u1   1
+    2  hive     u1   numer ula
+    3  flags    u1   FLAG_BOOT = pierwsza ramka po starcie nadajnika
+    4  seq      u2   numer kolejny (zawija się po 65535)
+    6  mass     i4   [g]
+    10 t1, h1, t2, h2  i2  [0.1 °C] / [0.1 %]
+    18 crc      u2   CRC-16/CCITT-FALSE bajtów 0..17
+
+Brak odczytu (DHT zwrócił nan) to najmniejsza wartość typu (NAN_I2,
+NAN_I4). Ramka mieści się trzy razy w pakiecie RH_ASK (60 B), zamiast
+~40 znaków tekstu na jeden pomiar.
+
+Odbiornik przekazuje pakiet jako linię "B:<hex>" (jedna albo kilka ramek),
+więc łącze szeregowe i logi zostają liniowe. decode() dekoduje cały
+bufor naraz (NumPy: dtype FRAME_DTYPE, CRC liczone kolumnami bajtów dla
+wszystkich ramek jednocześnie), także bufor z przesunięciem albo śmieciami
+- ramki są szukane po magic i wersji. Pojedynczy pakiet (kilka ramek)
+dekoduje unpack() przez struct, bez narzutu NumPy. Stare ramki tekstowe
+dalej działają (parse_line()).
+
+SequenceTracker wykrywa per ul luki (zgubione ramki) i duplikaty (np.
+dwa odbiorniki słyszą ten sam ul); sequence_report() to samo dla całej
+tablicy ramek.
+
+    python3 -m pasieka.frame nagranie.cap      # luki i duplikaty w nagraniu (pasieka/replay.py)
+"""
+
+import binascii
+import math
+import re
+import struct
+
+import numpy as np
+
+from .telemetry import SAMPLE_DTYPE, Sample, parse_frame, parse_hive
+
+MAGIC = 0xBE
+VERSION = 1
+FLAG_BOOT = 0x01
+NAN_I2 = -0x8000
+NAN_I4 = -0x80000000
+MASS_SCALE = 1000       # kg -> g
+SCALE = 10              # °C, % -> dziesiąte części
+
+HEADER = struct.Struct('<BBBBHihhhh')
+FRAME_SIZE = HEADER.size + 2
+FRAME_DTYPE = np.dtype([('magic', 'u1'), ('version', 'u1'), ('hive', 'u1'), ('flags', 'u1'),
+                        ('seq', '<u2'), ('mass', '<i4'), ('t1', '<i2'), ('h1', '<i2'),
+                        ('t2', '<i2'), ('h2', '<i2'), ('crc', '<u2')])
+assert FRAME_DTYPE.itemsize == FRAME_SIZE
+BINARY_RE = re.compile(rb'\bB:([0-9A-Fa-f]+)')
+
+# tablica CRC-16/CCITT-FALSE (poly 0x1021) dla liczenia wektorowego
+_CRC_TABLE = np.array([binascii.crc_hqx(bytes([b]), 0) for b in range(256)], dtype=np.uint16)
+
+
+def crc16(data):
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def _scaled(value, scale, nan):
+    return nan if value is None or math.isnan(value) else int(round(value * scale))
+
+
+def encode(hive, seq, mass, t1, h1, t2, h2, flags=0):
+    """Pomiar -> 20 bajtów ramki."""
+    head = HEADER.pack(MAGIC, VERSION, hive, flags, seq & 0xFFFF, _scaled(mass, MASS_SCALE, NAN_I4),
+                       *(_scaled(v, SCALE, NAN_I2) for v in (t1, h1, t2, h2)))
+    return head + struct.pack('<H', crc16(head))
+
+
+def encode_line(frames):
+    """Ramki (bytes) -> linia odbiornika b'B:<hex>'."""
+    return b'B:' + binascii.hexlify(b''.join(frames)).upper()
+
+
+def _crc_many(rows):
+    """CRC wierszy tablicy uint8 (n x HEADER.size), wszystkie naraz."""
+    crc = np.full(len(rows), 0xFFFF, dtype=np.uint16)
+    for col in rows.T:
+        crc = (crc << 8) ^ _CRC_TABLE[(crc >> 8) ^ col]
+    return crc
+
+
+def decode(buf):
+    """
+    Bufor bajtów -> (ramki FRAME_DTYPE z poprawnym CRC, liczba odrzuconych
+    kandydatów). Ramki nie muszą zaczynać się od początku bufora.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    if len(data) < FRAME_SIZE:
+        return np.empty(0, dtype=FRAME_DTYPE), 0
+    # kandydaci: magic i wersja na kolejnych bajtach, z miejscem na całą ramkę
+    starts = np.flatnonzero((data[:-FRAME_SIZE + 1] == MAGIC) & (data[1:len(data) - FRAME_SIZE + 2] == VERSION))
+    rows = data[starts[:, None] + np.arange(FRAME_SIZE)]
+    ok = _crc_many(rows[:, :HEADER.size]) == rows[:, HEADER.size:].copy().view('<u2')[:, 0]
+    starts, rows = starts[ok], rows[ok]
+    # przypadkowe 0xBE 0x01 wewnątrz poprawnej ramki nie tworzy drugiej
+    keep = np.ones(len(starts), dtype=bool)
+    end = -1
+    for i, s in enumerate(starts.tolist()):
+        if s < end:
+            keep[i] = False
+        else:
+            end = s + FRAME_SIZE
+    frames = rows[keep].copy().view(FRAME_DTYPE)[:, 0]
+    return frames, int((~ok).sum())
+
+
+def to_samples(frames, ts):
+    """Ramki -> tablica SAMPLE_DTYPE (ts: czas wspólny albo tablica czasów)."""
+    out = np.empty(len(frames), dtype=SAMPLE_DTYPE)
+    out['ts'] = ts
+    out['mass'] = np.where(frames['mass'] == NAN_I4, np.nan, frames['mass'] / MASS_SCALE)
+    for name in ('t1', 'h1', 't2', 'h2'):
+        out[name] = np.where(frames[name] == NAN_I2, np.nan, frames[name] / SCALE)
+    return out
+
+
+def format_text(hive, seq, sample):
+    """Ramka jako linia tekstu do logu (parse_frame/parse_hive i LOG_RE ją czytają)."""
+    return (f"UL:{hive} #{seq} M:{sample.mass:.3f}kg T1:{sample.t1:.1f}C H1:{sample.h1:.1f}% "
+            f"T2:{sample.t2:.1f}C H2:{sample.h2:.1f}%")
+
+
+def unpack(data):
+    """
+    Poprawne ramki z krótkiego bufora (jeden pakiet radiowy) jako krotki
+    HEADER, bez NumPy - dla kilku ramek decode() kosztuje więcej, niż
+    oszczędza. Zwraca (ramki, liczba odrzuconych kandydatów).
+    """
+    out, rejected = [], 0
+    pos = data.find(b'\xbe\x01')
+    while 0 <= pos <= len(data) - FRAME_SIZE:
+        end = pos + HEADER.size
+        if crc16(data[pos:end]) == data[end] | data[end + 1] << 8:
+            out.append(HEADER.unpack_from(data, pos))
+            pos = data.find(b'\xbe\x01', end + 2)
+        else:
+            rejected += 1
+            pos = data.find(b'\xbe\x01', pos + 1)
+    return out, rejected
+
+
+def _value(raw, nan, scale):
+    return math.nan if raw == nan else raw / scale
+
+
+def parse_line(line, ts):
+    """
+    Linia z odbiornika -> [(ul, seq, flags, Sample)]. Ramki binarne "B:<hex>"
+    (ul i seq z ramki), w przeciwnym razie tekst: [(ul z linii albo None,
+    None, 0, Sample)] albo [] bez ramki pomiaru. None - linia binarna
+    bez ani jednej poprawnej ramki (uszkodzona).
+    """
+    m = BINARY_RE.search(line)
+    if m is None:
+        sample = parse_frame(line, ts)
+        return [] if sample is None else [(parse_hive(line), None, 0, sample)]
+    try:
+        frames, _ = unpack(binascii.unhexlify(m.group(1)))
+    except binascii.Error:
+        return None     # nieparzysta liczba cyfr - urwana linia
+    if not frames:
+        return None
+    return [(str(hive), seq, flags,
+             Sample(ts, _value(mass, NAN_I4, MASS_SCALE), _value(t1, NAN_I2, SCALE), _value(h1, NAN_I2, SCALE),
+                    _value(t2, NAN_I2, SCALE), _value(h2, NAN_I2, SCALE)))
+            for _, _, hive, flags, seq, mass, t1, h1, t2, h2 in frames]
+
+
+class SequenceTracker:
+    """Numery kolejne per ul: check() -> ('ok' | 'gap' | 'duplicate' | 'restart', zgubione)."""
+
+    def __init__(self):
+        self.last = {}
+
+    def check(self, hive, seq, flags=0):
+        last = self.last.get(hive)
+        if flags & FLAG_BOOT or last is None:
+            self.last[hive] = seq
+            return ('restart' if last is not None else 'ok'), 0
+        diff = (seq - last) & 0xFFFF
+        if diff == 0 or diff >= 0x8000:
+            return 'duplicate', 0       # ta sama albo starsza (spóźniona) ramka
+        self.last[hive] = seq
+        return ('ok', 0) if diff == 1 else ('gap', diff - 1)
+
+
+def sequence_report(frames):
+    """
+    Podsumowanie luk i duplikatów w tablicy ramek (np. z nagrania), tak
+    jak liczy je SequenceTracker: {ul: {'frames', 'missing', 'duplicates', 'restarts'}}.
+    """
+    tracker = SequenceTracker()
+    out = {}
+    for hive, flags, seq in zip(frames['hive'].tolist(), frames['flags'].tolist(), frames['seq'].tolist()):
+        counts = out.setdefault(str(hive), {'frames': 0, 'missing': 0, 'duplicates': 0, 'restarts': 0})
+        status, missing = tracker.check(str(hive), seq, flags)
+        counts['frames'] += 1
+        counts['missing'] += missing
+        if status == 'duplicate':
+            counts['duplicates'] += 1
+        elif status == 'restart':
+            counts['restarts'] += 1
+    return out
+
+
+def main():
+    import argparse
+    from .replay import read_capture
+
+    ap = argparse.ArgumentParser(description="Luki i duplikaty ramek binarnych w nagraniu (pasieka/replay.py).")
+    ap.add_argument('capture')
+    args = ap.parse_args()
+
+    data = b''.join(data for _, data in read_capture(args.capture))
+    chunks, corrupt = [], 0
+    for line in data.splitlines():
+        if m := BINARY_RE.search(line):
+            try:
+                frames, rejected = decode(binascii.unhexlify(m.group(1)))
+            except binascii.Error:
+                frames, rejected = (), 1
+            corrupt += rejected or not len(frames)
+            if len(frames):
+                chunks.append(frames)
+    frames = np.concatenate(chunks) if chunks else np.empty(0, dtype=FRAME_DTYPE)
+    print(f"{len(frames)} ramek, {corrupt} uszkodzonych")
+    for hive, c in sorted(sequence_report(frames).items(), key=lambda kv: int(kv[0])):
+        print(f"ul {hive}: {c['frames']} ramek, zgubione {c['missing']}, "
+              f"duplikaty {c['duplicates']}, restarty {c['restarts']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+Alfabet GSM 03.38 (7-bit): długość wiadomości w septetach i zamiana
+znaków spoza alfabetu (polskie litery, °) na najbliższe odpowiedniki,
+żeby odpowiedź mieściła się w jednym SMS-ie (160 znaków GSM-7).
+
+Dla długich wiadomości: podział na części z nagłówkiem UDH (łączenie
+w telefonie) i kodowanie SMS-SUBMIT w trybie PDU (submit_pdus()).
+"""
+
+# Tablica podstawowa w kolejności kodów 0x00..0x7F; 0x1B (ESC) jako '\x1b'
+TABLE = (
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+CODES = {c: i for i, c in enumerate(TABLE) if c != '\x1b'}
+EXT_CODES = {'\f': 0x0A, '^': 0x14, '{': 0x28, '}': 0x29, '\\': 0x2F,
+             '[': 0x3C, '~': 0x3D, ']': 0x3E, '|': 0x40, '€': 0x65}
+BASIC = set(CODES)
+EXTENDED = set(EXT_CODES)     # zajmują 2 septety (ESC + znak)
+
+SINGLE_SEGMENT = 160    # septetów w jednym SMS
+MULTI_SEGMENT = 153     # septetów w części wiadomości wieloczęściowej (7 na nagłówek UDH)
+
+TRANSLIT = str.maketrans({
+    'ą': 'a', 'ć': 'c', 'ę': 'e', 'ł': 'l', 'ń': 'n', 'ó': 'o', 'ś': 's', 'ź': 'z', 'ż': 'z',
+    'Ą': 'A', 'Ć': 'C', 'Ę': 'E', 'Ł': 'L', 'Ń': 'N', 'Ó': 'O', 'Ś': 'S', 'Ź': 'Z', 'Ż': 'Z',
+    '°': '', '\t': ' ', '–': '-', '—': '-', '„': '"', '”': '"', '’': "'",
+})
+
+
+def is_gsm7(text):
+    return all(c in BASIC or c in EXTENDED for c in text)
+
+
+def septets(text):
+    """Długość tekstu w septetach GSM-7 (znaki rozszerzone liczą się podwójnie)."""
+    return sum(2 if c in EXTENDED else 1 for c in text)
+
+
+def to_gsm7(text):
+    """Transliteracja do GSM-7; nieznane znaki zamieniane na '?'."""
+    text = text.translate(TRANSLIT)
+    return ''.join(c if c in BASIC or c in EXTENDED else '?' for c in text)
+
+
+def fit(text, limit=SINGLE_SEGMENT):
+    """Tekst GSM-7 przycięty do limit septetów (z '..' na końcu, gdy przycięty)."""
+    text = to_gsm7(text)
+    if septets(text) <= limit:
+        return text
+    out, used = [], 0
+    for c in text:
+        n = 2 if c in EXTENDED else 1
+        if used + n > limit - 2:
+            break
+        out.append(c)
+        used += n
+    return ''.join(out) + '..'
+
+
+def encode(text):
+    """Tekst GSM-7 -> lista septetów (znaki rozszerzone jako ESC + kod)."""
+    out = []
+    for c in text:
+        if c in EXT_CODES:
+            out += [0x1B, EXT_CODES[c]]
+        else:
+            out.append(CODES.get(c, CODES['?']))
+    return out
+
+
+def split(text, limit=MULTI_SEGMENT):
+    """Dzieli tekst na części po limit septetów, nie rozcinając znaków rozszerzonych."""
+    parts, cur, used = [], [], 0
+    for c in text:
+        n = 2 if c in EXTENDED else 1
+        if used + n > limit:
+            parts.append(''.join(cur))
+            cur, used = [], 0
+        cur.append(c)
+        used += n
+    parts.append(''.join(cur))
+    return parts
+
+
+def pack(septets, fill=0):
+    """Pakuje septety w oktety (LSB first), z fill bitami wyrównania na początku."""
+    value, bits = 0, fill
+    for s in septets:
+        value |= s << bits
+        bits += 7
+    return value.to_bytes((bits + 7) // 8, 'little')
+
+
+def encode_address(number):
+    """Numer telefonu -> pole TP-DA (długość, typ, cyfry w półoktetach)."""
+    digits = number.lstrip('+')
+    kind = 0x91 if number.startswith('+') else 0x81
+    padded = digits + ('F' if len(digits) % 2 else '')
+    swapped = ''.join(padded[i + 1] + padded[i] for i in range(0, len(padded), 2))
+    return bytes([len(digits), kind]) + bytes.fromhex(swapped)
+
+
+def submit_pdus(number, text, ref):
+    """
+    SMS-SUBMIT dla każdej części tekstu: lista (pdu_hex, długość_TPDU) do
+    AT+CMGS=<długość> w trybie PDU. Jedna część - bez UDH; więcej - UDH
+    łączenia wiadomości z 8-bitowym numerem ref.
+    """
+    text = to_gsm7(text)
+    parts = [text] if septets(text) <= SINGLE_SEGMENT else split(text)
+    out = []
+    for seq, part in enumerate(parts, 1):
+        sept = encode(part)
+        # 0x01 = SMS-SUBMIT, 0x20 = TP-SRR: raport doręczenia (+CDS) także dla
+        # wysyłek w trybie PDU - AT+CSMP działa tylko w trybie tekstowym
+        if len(parts) == 1:
+            first, udh, fill = 0x21, b'', 0
+        else:
+            # 0x40 = TP-UDHI; UDH: IEI 00 (łączenie, ref 8-bit), 3 bajty danych
+            first, udh, fill = 0x61, bytes([5, 0, 3, ref & 0xFF, len(parts), seq]), 1
+        udl = len(sept) + (7 if udh else 0)    # UDH: 6 oktetów + 1 bit wypełnienia = 7 septetów
+        tpdu = (bytes([first, 0x00]) + encode_address(number)
+                + bytes([0x00, 0x00, udl]) + udh + pack(sept, fill))
+        out.append(('00' + tpdu.hex().upper(), len(tpdu)))
+    return out
+
+
+# --- odbiór: SMS-DELIVER w trybie PDU (AT+CMGF=0, AT+CMGL=4) ---
+
+EXT_DECODE = {code: c for c, code in EXT_CODES.items()}
+IEI_CONCAT_8, IEI_CONCAT_16 = 0x00, 0x08
+
+
+def unpack(data, count, fill=0):
+    """Odwrotność pack(): count septetów z oktetów, po fill bitach wyrównania."""
+    value = int.from_bytes(data, 'little') >> fill
+    return [(value >> (7 * i)) & 0x7F for i in range(count)]
+
+
+def decode(septets):
+    """Septety GSM-7 -> tekst (ESC + kod = znak rozszerzony)."""
+    out = []
+    esc = False
+    for s in septets:
+        if esc:
+            out.append(EXT_DECODE.get(s, ' '))
+            esc = False
+        elif s == 0x1B:
+            esc = True
+        else:
+            out.append(TABLE[s])
+    return ''.join(out)
+
+
+def decode_address(data, pos):
+    """Pole adresu (TP-OA) od bajtu pos -> (numer, pozycja za polem)."""
+    digits, kind = data[pos], data[pos + 1]
+    size = (digits + 1) // 2
+    raw = data[pos + 2:pos + 2 + size]
+    if kind & 0x70 == 0x50:         # alfanumeryczny nadawca (np. nazwa operatora)
+        number = decode(unpack(raw, digits * 4 // 7))
+    else:
+        nibbles = ''.join(f'{b & 0x0F:X}{b >> 4:X}' for b in raw)[:digits]
+        number = ('+' if kind == 0x91 else '') + nibbles
+    return number, pos + 2 + size
+
+
+def _swap(octets):
+    return ''.join(f'{b & 0x0F}{b >> 4}' for b in octets)
+
+
+def decode_timestamp(octets):
+    """TP-SCTS (7 półoktetów zamienionych) -> 'RR/MM/DD,GG:MM:SS+SS' jak w trybie tekstowym."""
+    digits = _swap(octets[:6])
+    # strefa w kwadransach: dziesiątki w młodszym półoktecie (bit 3 = znak), jedności w starszym
+    tz = (octets[6] & 0x07) * 10 + (octets[6] >> 4)
+    sign = '-' if octets[6] & 0x08 else '+'
+    return (f"{digits[0:2]}/{digits[2:4]}/{digits[4:6]},{digits[6:8]}:{digits[8:10]}:{digits[10:12]}"
+            f"{sign}{tz:02d}")
+
+
+def encode_timestamp(text):
+    """Odwrotność decode_timestamp() (do udawanego modemu)."""
+    digits = text[0:2] + text[3:5] + text[6:8] + text[9:11] + text[12:14] + text[15:17]
+    tz = int(text[18:20])
+    tz_octet = (tz % 10) << 4 | tz // 10 | (0x08 if text[17] == '-' else 0)
+    return bytes(int(digits[i + 1] + digits[i], 16) for i in range(0, 12, 2)) + bytes([tz_octet])
+
+
+def parse_deliver(pdu_hex):
+    """
+    SMS-DELIVER z AT+CMGL/AT+CMGR w trybie PDU -> (nadawca, data, tekst,
+    łączenie). łączenie to (ref, liczba części, numer części) z UDH albo
+    None dla zwykłego SMS-a. Treść GSM-7, UCS-2 albo 8-bit (jako latin-1).
+    """
+    data = bytes.fromhex(pdu_hex)
+    pos = 1 + data[0]               # pomijamy adres SMSC
+    first = data[pos]
+    sender, pos = decode_address(data, pos + 1)
+    dcs = data[pos + 1]
+    date = decode_timestamp(data[pos + 2:pos + 9])
+    udl = data[pos + 9]
+    ud = data[pos + 10:]
+    concat = None
+    udh_len = 0
+    if first & 0x40:                # TP-UDHI
+        udh_len = ud[0] + 1
+        i = 1
+        while i < udh_len:
+            iei, size = ud[i], ud[i + 1]
+            value = ud[i + 2:i + 2 + size]
+            if iei == IEI_CONCAT_8 and size == 3:
+                concat = (value[0], value[1], value[2])
+            elif iei == IEI_CONCAT_16 and size == 4:
+                concat = (value[0] << 8 | value[1], value[2], value[3])
+            i += 2 + size
+    alphabet = dcs >> 2 & 0x03 if dcs & 0xC0 == 0 else (1 if dcs & 0xF4 == 0xF4 else 0)
+    if alphabet == 2:               # UCS-2
+        text = ud[udh_len:udl].decode('utf-16-be', errors='replace')
+    elif alphabet == 1:             # dane 8-bit
+        text = ud[udh_len:udl].decode('latin-1')
+    else:
+        fill = (7 - udh_len * 8 % 7) % 7
+        skip = (udh_len * 8 + fill) // 7
+        text = decode(unpack(ud[udh_len:], udl - skip, fill))
+    return sender, date, text, concat
+
+
+def deliver_pdu(sender, text, date, concat=None):
+    """SMS-DELIVER GSM-7 (dla udawanego modemu): (pdu_hex z pustym SMSC, długość TPDU)."""
+    sept = encode(to_gsm7(text))
+    if concat is None:
+        first, udh, fill = 0x04, b'', 0
+    else:
+        first, udh, fill = 0x44, bytes([5, IEI_CONCAT_8, 3, *concat]), 1
+    udl = len(sept) + (7 if udh else 0)
+    tpdu = (bytes([first]) + encode_address(sender) + bytes([0x00, 0x00]) + encode_timestamp(date)
+            + bytes([udl]) + udh + pack(sept, fill))
+    return '00' + tpdu.hex().upper(), len(tpdu)
@@ -0,0 +1,164 @@
+"""
+Skrzynka SIM: parsowanie odpowiedzi AT+CMGL / AT+CMGR linia po linii
+(w miarę napływu bajtów, bez czekania na całą odpowiedź) i składanie
+wiadomości wieloczęściowych.
+
+Obsługiwane oba tryby modemu:
+
+    tekstowy (AT+CMGF=1)   +CMGL: 3,"REC UNREAD","+48600...","","25/05/01,12:00:00+08"
+                           treść (także w kilku liniach)
+    PDU (AT+CMGF=0)        +CMGL: 3,0,,36
+                           0004 0B91... (SMS-DELIVER, gsm7.parse_deliver)
+
+Części SMS-a wieloczęściowego widać tylko w trybie PDU (nagłówek UDH z
+numerem ref), dlatego przegląd skrzynki w merge1 czyta ją jako PDU
+(AsyncATEngine.command_pdu) i na koniec usuwa obsłużone wiadomości
+jedną komendą AT+CMGD=1,<delflag> zamiast AT+CMGD=<idx> dla każdej.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from . import gsm7
+from .modem import is_final
+
+# data jest opcjonalna - wiadomości zapisane (STO UNSENT/SENT) jej nie mają
+CMGL_TEXT_RE = re.compile(r'^\+CMGL:\s*(\d+),"([^"]*)","([^"]*)"(?:,[^,]*(?:,"([^"]*)")?)?')
+CMGR_TEXT_RE = re.compile(r'^\+CMGR:\s*"([^"]*)","([^"]*)"(?:,[^,]*(?:,"([^"]*)")?)?')
+CMGL_PDU_RE = re.compile(r'^\+CMGL:\s*(\d+),(\d),[^,]*,(\d+)$')
+CMGR_PDU_RE = re.compile(r'^\+CMGR:\s*(\d),[^,]*,(\d+)$')
+
+# <stat> w trybie PDU -> nazwa z trybu tekstowego
+STATUS = {0: 'REC UNREAD', 1: 'REC READ', 2: 'STO UNSENT', 3: 'STO SENT', 4: 'ALL'}
+# AT+CMGD=<idx>,<delflag>: 1 = wszystkie przeczytane, 2 = + wysłane, 3 = + niewysłane, 4 = wszystkie
+DEL_READ = 1
+
+
+@dataclass
+class Record:
+    """Jeden wpis w pamięci SIM (przy wiadomości wieloczęściowej - jedna część)."""
+    index: int
+    status: str
+    sender: str = ''
+    date: str = ''
+    text: str = ''
+    concat: tuple = None        # (ref, liczba części, numer części) z UDH
+
+
+@dataclass
+class Message:
+    """Wiadomość złożona z jednego albo kilku wpisów."""
+    sender: str
+    date: str
+    text: str
+    indices: list = field(default_factory=list)
+    parts: int = 1
+    complete: bool = True       # False: brakuje części (jeszcze nie doszły)
+    ref: int = None             # numer wiadomości wieloczęściowej z UDH
+
+
+class ListingParser:
+    """
+    Parser odpowiedzi AT+CMGL/AT+CMGR: feed() dla każdej linii (np. jako
+    on_line= w AsyncATEngine.command), potem close() zwraca wpisy.
+    Kod końcowy (OK/ERROR) kończy ostatni wpis, jeśli się pojawi.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._cur = None
+        self._body = []
+        self._pdu = False
+
+    def feed(self, line):
+        if line.startswith('+CMG') and self._header(line):
+            return
+        if is_final(line):
+            self._finish()
+        elif self._cur is not None:
+            if self._pdu:
+                self._decode(line)
+            else:
+                self._body.append(line)
+
+    def _header(self, line):
+        if m := CMGL_TEXT_RE.match(line):
+            self._start(Record(int(m.group(1)), m.group(2), m.group(3), m.group(4) or ''), pdu=False)
+        elif m := CMGL_PDU_RE.match(line):
+            self._start(Record(int(m.group(1)), STATUS.get(int(m.group(2)), m.group(2))), pdu=True)
+        elif m := CMGR_TEXT_RE.match(line):
+            self._start(Record(0, m.group(1), m.group(2), m.group(3) or ''), pdu=False)
+        elif m := CMGR_PDU_RE.match(line):
+            self._start(Record(0, STATUS.get(int(m.group(1)), m.group(1))), pdu=True)
+        else:
+            return False
+        return True
+
+    def _start(self, record, pdu):
+        self._finish()
+        self._cur, self._pdu = record, pdu
+
+    def _decode(self, line):
+        rec = self._cur
+        try:
+            rec.sender, rec.date, rec.text, rec.concat = gsm7.parse_deliver(line.strip())
+        except (ValueError, IndexError):
+            rec.text = line     # nie SMS-DELIVER (np. raport doręczenia) - zostaje surowy PDU
+        self._finish()
+
+    def _finish(self):
+        if self._cur is None:
+            return
+        if not self._pdu:
+            self._cur.text = '\n'.join(self._body).strip()
+        self.records.append(self._cur)
+        self._cur, self._body = None, []
+
+    def close(self):
+        self._finish()
+        return self.records
+
+
+def parse_listing(lines):
+    parser = ListingParser()
+    for line in lines:
+        parser.feed(line)
+    return parser.close()
+
+
+def assemble(records):
+    """Wpisy -> wiadomości; części z tym samym (nadawca, ref, liczba części) są łączone po numerze."""
+    out = []
+    groups = {}                 # (nadawca, ref, liczba części) -> (Message, {numer: Record})
+    for rec in records:
+        if rec.concat is None:
+            out.append(Message(rec.sender, rec.date, rec.text, [rec.index]))
+            continue
+        ref, total, seq = rec.concat
+        key = (rec.sender, ref, total)
+        if key not in groups:
+            groups[key] = Message(rec.sender, rec.date, '', parts=total, ref=ref), {}
+            out.append(groups[key][0])
+        msg, parts = groups[key]
+        parts.setdefault(seq, rec)
+        msg.indices.append(rec.index)
+    for msg, parts in groups.values():
+        msg.text = ''.join(parts[s].text for s in sorted(parts))
+        msg.date = parts[min(parts)].date
+        msg.complete = len(parts) == msg.parts
+    return out
+
+
+def parse_cmgl(lines):
+    """Wiadomości z odpowiedzi AT+CMGL jako słowniki (jak dawne merge1.parse_cmgl), bez składania części."""
+    return [{'index': r.index, 'status': r.status, 'sender': r.sender, 'date': r.date, 'text': r.text}
+            for r in parse_listing(lines)]
+
+
+def parse_cmgr(lines):
+    """Wiadomość z odpowiedzi AT+CMGR (słownik) albo None."""
+    records = parse_listing(lines)
+    if not records:
+        return None
+    r = records[0]
+    return {'status': r.status, 'sender': r.sender, 'date': r.date, 'text': r.text}
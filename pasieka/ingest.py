@@ -0,0 +1,463 @@
+"""
+Odbiór telemetrii z wielu portów szeregowych i wielu uli.
+
+Źródła podajemy ścieżką albo wzorcem (np. '/dev/ttyACM*'). Każdy port to
+osobne zadanie w tej samej pętli asyncio (pasieka/aio.py: deskryptor w
+loop.add_reader), bez wątków - kilkadziesiąt odbiorników na Pi to
+kilkadziesiąt deskryptorów. Wzorce są sprawdzane co rescan sekund:
+nowo podłączony odbiornik zostaje otwarty, utracony - otwarty ponownie,
+gdy wróci.
+
+Każda linia staje się Reading (źródło, ul, czas, tekst, pomiar). Ul to
+identyfikator z ramki (telemetry.parse_hive) albo domyślny dla portu.
+Numer z ramki przechodzi przez frame_hives ({numer: ul}): domyślnie
+nadajnik z HIVE_ID = 1 (MAIN.ino) to ul domyślny, więc jeden ul z fabrycznym
+szkicem pisze tam, gdzie dotąd, a komendy SMS go widzą.
+Ramki binarne "B:<hex>" (pasieka/frame.py) niosą numer ula i numer
+kolejny: zgubione ramki i duplikaty (np. z dwóch odbiorników) są liczone
+per ul, duplikat nie trafia do logu, a do logu idzie ramka jako tekst
+(frame.format_text), czytelny dla pozostałych narzędzi.
+Każdy ul ma własny katalog w układzie pasieka_logi (CSV + .seg +
+catalog.json + rollup/), więc narzędzia z pasieka/*.py działają na nim
+bez zmian; ul domyślny (DEFAULT_HIVE) pisze wprost do katalogu logów,
+jak przy jednym ulu, a pozostałe do <katalog>/ul_<id>/.
+
+Z capture_dir surowe bajty każdego portu są nagrywane do
+<capture_dir>/<nazwa portu>.cap (pasieka/replay.py), do późniejszego
+odtwarzania bez sprzętu.
+"""
+
+import asyncio
+import datetime
+import glob
+import os
+import time
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import numpy as np
+import serial
+
+from .aio import LineReader, open_serial
+from .archive import RotationPolicy, locate
+from .catalog import Catalog
+from .detect import Detector
+from .frame import SequenceTracker, format_text, parse_line
+from .logwriter import LogWriter
+from .metrics import METRICS
+from .replay import CaptureWriter
+from .ring import CAPACITY, SampleRing
+from .rollup import DAY, Rollup, bucket_bounds
+from .store import SegmentWriter, segment_path
+from .telemetry import SAMPLE_DTYPE, Sample, format_log_line
+
+DEFAULT_HIVE = 'main'
+FRAME_HIVES = {'1': DEFAULT_HIVE}   # numer ula z ramki -> ul; HIVE_ID = 1 w MAIN.ino
+
+
+class Reading(NamedTuple):
+    source: str             # port, z którego przyszła linia
+    hive: str
+    ts: float
+    raw: str
+    sample: Sample = None   # None, gdy linia nie jest ramką pomiaru
+
+
+@dataclass
+class SourceStats:
+    port: str
+    lines: int = 0
+    frames: int = 0
+    other: int = 0          # linie bez ramki (komunikaty odbiornika, śmieci)
+    corrupt: int = 0        # linie binarne bez poprawnej ramki (CRC), wliczone w other
+    bytes: int = 0
+    errors: int = 0         # nieudane otwarcia i utraty portu
+    connects: int = 0
+    first_ts: float = None
+    last_ts: float = None
+    last_error: str = None
+
+    def rate(self):
+        """Linie na sekundę od pierwszej odebranej linii."""
+        if self.first_ts is None or self.last_ts == self.first_ts:
+            return 0.0
+        return (self.lines - 1) / (self.last_ts - self.first_ts)
+
+
+def hive_dir(log_dir, hive):
+    return log_dir if hive == DEFAULT_HIVE else os.path.join(log_dir, f'ul_{hive}')
+
+
+def expand_sources(patterns):
+    """Ścieżki portów z listy ścieżek/wzorców; ścieżki bez znaków wzorca zostają nawet bez urządzenia."""
+    ports = []
+    for p in patterns:
+        found = sorted(glob.glob(p)) if glob.has_magic(p) else [p]
+        ports += [f for f in found if f not in ports]
+    return ports
+
+
+class Hive:
+    """
+    Jeden ul: log CSV partiami, segment kolumnowy, agregaty, detektor
+    zdarzeń i bufor ostatnich pomiarów (recent, pasieka/ring.py).
+    """
+
+    def __init__(self, hive_id, directory, policy='interval', rotation=None, on_rotate=None,
+                 recent=CAPACITY, io=None):
+        self.id = hive_id
+        self.directory = directory
+        self.policy = policy
+        self.rotation = rotation or RotationPolicy()
+        self.on_rotate = on_rotate      # on_rotate(ścieżka zamkniętego CSV)
+        self.disk = io                  # pasieka/pipeline.DiskWriter: zapis na kartę w osobnym wątku
+        # błędy zapisu wracają do ula (DiskClient), żeby dropped i katalog zgadzały się z kartą
+        self.io = io.client(self._disk_failed) if io else None
+        self.catalog = Catalog(directory, io=self.io)
+        self.rollup = Rollup(os.path.join(directory, 'rollup'), io=self.io)
+        self.detector = Detector()
+        self.recent = SampleRing(recent)
+        self.last_line = None   # tylko do komunikatu o zapisanej partii
+        self.counts = {'written': 0, 'dropped': 0, 'missing': 0, 'duplicates': 0}
+        self.last_error = None
+        self.disk_error = None  # ostatni błąd wątku zapisu
+        self.log_path = self.entry = None
+        self.logfile = self.store = None
+        self._log_io = None     # DiskClient bieżącego logu: nieudana partia to zgubione linie
+        self._broken = False    # zapis nie trafił na kartę - następna linia idzie do nowego pliku
+        self._restore_rollup()
+
+    def _restore_rollup(self):
+        # po zaniku zasilania otwarte przedziały (i wiersze sprzed partii) były tylko w pamięci:
+        # liczymy je od nowa z ogona logu, najwyżej od początku doby ostatniego pomiaru
+        entries = [e for e in self.catalog.sorted() if e.last_ts is not None]
+        if not entries:
+            return
+        t0 = max(min(self.rollup.covered.values()), bucket_bounds(entries[-1].last_ts, DAY)[0])
+        samples = self.catalog.read_range(t0)
+        if len(samples):
+            self.rollup.restore(samples)
+            print(f"[{self.id}] Agregaty odtworzone z logu: {len(samples)} pomiarów")
+
+    @property
+    def last_sample(self):
+        return self.recent.latest()
+
+    def closed_logs(self):
+        """Nieskompresowane logi z poprzednich uruchomień (do archiwizacji)."""
+        paths = [os.path.join(self.directory, e.name) for e in self.catalog.sorted() if e is not self.entry]
+        return [p for p in paths if locate(p)[1] is None and os.path.exists(p)]
+
+    def _open(self, ts):
+        self.log_path, self.entry = self.catalog.next_log(datetime.date.fromtimestamp(ts))
+        print(f"[{self.id}] Logi będą zapisywane w: {self.log_path}")
+        entry = self.entry
+        self._log_io = self.disk.client(lambda op, exc: self._log_failed(entry, op, exc)) if self.disk else None
+        self.logfile = LogWriter(self.log_path, self.policy, on_flush=self._report_flush, io=self._log_io)
+        self.store = SegmentWriter(segment_path(self.log_path), io=self.io)
+        self._broken = False
+
+    def _close_files(self, refresh=True):
+        if self.logfile is not None:
+            self.logfile.close()
+            self.store.close()
+            self.logfile = self.store = None
+        self.catalog.close()
+        if self._log_io is not None:
+            if self._broken and refresh:
+                # po zamknięciu pliku: wiersz katalogu od nowa z tego, co jest na karcie
+                # (przy końcu pracy robi to start - najnowszy log jest odświeżany zawsze)
+                self._log_io.notify(self.entry.name)
+            self._log_io.release()
+            self._log_io = None
+
+    def _log_failed(self, entry, op, exc):
+        if exc is None:
+            # ('notify', nazwa) z _close_files: wszystko przed nim już wykonane
+            self.catalog.refresh(entry)
+            self.catalog.save()
+            return
+        if op[0] == 'write':
+            self.counts['dropped'] += op[2].count(b'\n')
+        self._report_error(exc)
+        if entry is self.entry:
+            self._broken = True
+
+    def _disk_failed(self, op, exc):
+        self._broken = True
+        self._report_error(exc)
+
+    def _report_error(self, exc):
+        if self.disk_error != str(exc):
+            print(f"[{self.id}] Błąd zapisu na kartę: {exc}")
+        self.disk_error = str(exc)
+
+    def _report_flush(self, lines, size):
+        print(f"[{self.id}] Zapisano partię: {lines} linii, {size} B (ostatnia: {self.last_line})")
+
+    def write(self, reading):
+        """Zapisuje linię; zwraca alarmy detektora (zwykle pustą listę)."""
+        ts = reading.ts
+        if self.logfile is None:
+            self._open(ts)
+        elif self._broken or self.rotation.due(self.entry, self.logfile.size, ts):
+            # zamknięty plik idzie do kompresji, dalej piszemy do nowego (po błędzie zapisu też:
+            # offsety w katalogu liczone dalej w uszkodzonym pliku nie zgadzałyby się z kartą)
+            path = self.log_path
+            self._close_files()
+            if self.on_rotate:
+                self.on_rotate(path)
+            self._open(ts)
+        self.last_line = reading.raw
+        # każda linia dostaje znacznik czasu Pi, jak w PI_logger.py
+        offset, end = self.logfile.write(format_log_line(ts, reading.raw))
+        self.counts['written'] += 1
+        sample = reading.sample
+        if sample is None:
+            return []
+        self.recent.append(sample)
+        self.store.append(sample)
+        self.rollup.add(sample)
+        self.catalog.record(self.entry, ts, offset, end)
+        return self.detector.update(sample)
+
+    def flush(self):
+        """Wołane w bezczynności - niech partia nie czeka w nieskończoność."""
+        if self.logfile is not None:
+            self.logfile.maybe_flush()
+        self.rollup.maybe_flush()
+
+    def close(self):
+        self._close_files(refresh=False)
+        self.rollup.close()
+        if self.io is not None:
+            self.io.release()
+
+
+class Ingest:
+    """
+    sources: ścieżki/wzorce portów; hives: {port: domyślny ul}; frame_hives:
+    {numer z ramki: ul}, numery spoza słownika są ulem same; line_queue
+    i line_policy - limit kolejki linii każdego portu (aio.LineReader);
+    pozostałe argumenty nazwane trafiają do Hive (policy, rotation, io).
+    """
+
+    def __init__(self, log_dir, sources, baudrate=115200, hives=None, frame_hives=None, rescan=5.0,
+                 report_interval=600.0, capture_dir=None, line_queue=0, line_policy='drop-oldest',
+                 **hive_options):
+        self.log_dir = log_dir
+        self.patterns = list(sources)
+        self.baudrate = baudrate
+        self.default_hives = dict(hives or {})
+        self.frame_hives = dict(FRAME_HIVES if frame_hives is None else frame_hives)
+        self.rescan = rescan
+        self.report_interval = report_interval
+        self.capture_dir = capture_dir
+        self.line_queue = line_queue
+        self.line_policy = line_policy
+        self.hive_options = hive_options
+        self.hives = {}
+        self.stats = {}             # port -> SourceStats
+        self.on_alert = None        # on_alert(ul, detect.Alert)
+        self.on_rotate = None       # on_rotate(ścieżka zamkniętego CSV)
+        self.on_reading = None      # on_reading(Reading), dla każdej linii
+        self.on_sample = None       # on_sample(ul, Sample) po zapisaniu pomiaru (np. uplink.Uplink.add)
+        self._tasks = {}
+        self._open_ports = {}       # port -> (SerialTransport, LineReader), do metryk
+        self._sampled = False       # był już zapisany pomiar (etap startu first_sample)
+        self._disk_pressure = False  # kolejka zapisu na kartę pełna - porty wstrzymane
+        self.sequences = SequenceTracker()  # numery ramek binarnych per nadajnik (numer z ramki)
+
+    def hive(self, hive_id):
+        h = self.hives.get(hive_id)
+        if h is None:
+            h = self.hives[hive_id] = Hive(hive_id, hive_dir(self.log_dir, hive_id),
+                                           on_rotate=self._rotated, **self.hive_options)
+            for path in h.closed_logs():
+                self._rotated(path)
+        return h
+
+    def _rotated(self, path):
+        if self.on_rotate:
+            self.on_rotate(path)
+
+    def latest(self, hive_id=DEFAULT_HIVE):
+        h = self.hives.get(hive_id)
+        return h.recent.latest() if h else None
+
+    def recent(self, hive_id=DEFAULT_HIVE, n=None):
+        """Kopia n ostatnich pomiarów ula (tablica SAMPLE_DTYPE, od najstarszego)."""
+        h = self.hives.get(hive_id)
+        return h.recent.snapshot(n) if h else np.empty(0, dtype=SAMPLE_DTYPE)
+
+    def _on_disk_pressure(self, pressure):
+        # karta nie nadąża: porty czekają (bajty w buforze jądra), zamiast blokować pętlę
+        self._disk_pressure = pressure
+        for transport, _ in self._open_ports.values():
+            if pressure:
+                transport.pause_reading('disk')
+            else:
+                transport.resume_reading('disk')
+        if pressure:
+            print("Kolejka zapisu na kartę pełna - odczyt portów wstrzymany")
+
+    async def run(self):
+        """Pilnuje portów (wzorce sprawdzane co rescan s) do anulowania; potem zamyka ule."""
+        last_report = time.monotonic()
+        io = self.hive_options.get('io')
+        if io is not None:
+            io.queue.add_listener(self._on_disk_pressure)
+        try:
+            while True:
+                for port in expand_sources(self.patterns):
+                    task = self._tasks.get(port)
+                    if task is None or task.done():
+                        self._tasks[port] = asyncio.create_task(self._read(port))
+                for h in self.hives.values():
+                    h.flush()
+                if time.monotonic() - last_report >= self.report_interval:
+                    last_report = time.monotonic()
+                    for line in self.report():
+                        print(line)
+                await asyncio.sleep(self.rescan)
+        finally:
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            for h in self.hives.values():
+                h.close()
+            if io is not None:
+                io.queue.remove_listener(self._on_disk_pressure)
+            for line in self.report():
+                print(line)
+
+    async def _read(self, port):
+        stats = self.stats.setdefault(port, SourceStats(port))
+        reader = LineReader(self.line_queue, self.line_policy)
+        capture = None
+        if self.capture_dir:
+            os.makedirs(self.capture_dir, exist_ok=True)
+            name = port.replace('://', '_').replace(':', '_').strip('/').replace('/', '_')
+            capture = CaptureWriter(os.path.join(self.capture_dir, f'{name}.cap'))
+        try:
+            transport = await open_serial(port, self.baudrate, reader, capture)
+        except serial.SerialException as e:
+            if capture:
+                capture.close()
+            if stats.last_error != str(e):
+                print(f"Błąd otwarcia portu {port}: {e}, ponowna próba za {self.rescan:.0f} s")
+            stats.errors += 1
+            stats.last_error = str(e)
+            return
+        stats.connects += 1
+        stats.last_error = None
+        print(f"Otwarto port {port}")
+        default = self.default_hives.get(port, DEFAULT_HIVE)
+        self._open_ports[port] = transport, reader
+        if self._disk_pressure:
+            transport.pause_reading('disk')
+        try:
+            while (line := await reader.readline()) is not None:
+                self._route(stats, default, line, time.time())
+        finally:
+            del self._open_ports[port]
+            transport.close()
+            if capture:
+                capture.close()
+        exc = await transport.closed
+        if exc is not None:
+            stats.errors += 1
+            stats.last_error = str(exc)
+        print(f"Utracono port {port}: {exc}")
+
+    def _route(self, stats, default, line, ts):
+        if stats.first_ts is None:
+            stats.first_ts = ts
+        stats.last_ts = ts
+        stats.lines += 1
+        stats.bytes += len(line)
+        parsed = parse_line(line, ts)
+        if not parsed:
+            # linia bez pomiaru (albo uszkodzona binarna) też trafia do logu, jak dotąd
+            if parsed is None:
+                stats.corrupt += 1
+            stats.other += 1
+            self._deliver(Reading(stats.port, default, ts, line.decode('utf-8', errors='replace')))
+            return
+        stats.frames += len(parsed)
+        for frame_id, seq, flags, sample in parsed:
+            hive_id = self.frame_hives.get(frame_id, frame_id) if frame_id else default
+            if seq is None:
+                self._deliver(Reading(stats.port, hive_id, ts,
+                                      line.decode('utf-8', errors='replace'), sample))
+                continue
+            # ramka binarna: numer kolejny mówi o zgubionych i powtórzonych ramkach
+            hive = self.hive(hive_id)
+            status, missing = self.sequences.check(frame_id, seq, flags)
+            if status == 'duplicate':
+                hive.counts['duplicates'] += 1
+                continue
+            hive.counts['missing'] += missing
+            if status == 'restart':
+                print(f"[{hive_id}] Restart nadajnika (ramka #{seq})")
+            self._deliver(Reading(stats.port, hive_id, ts, format_text(frame_id, seq, sample), sample))
+
+    def _deliver(self, reading):
+        if self.on_reading:
+            self.on_reading(reading)
+        hive = self.hive(reading.hive)
+        try:
+            alerts = hive.write(reading)
+        except OSError as e:
+            # pełna albo zepsuta karta: linia przepada, odbiór trwa dalej
+            hive.counts['dropped'] += 1
+            if hive.last_error != str(e):
+                print(f"[{hive.id}] Błąd zapisu logu: {e}")
+            hive.last_error = str(e)
+            return
+        hive.last_error = None
+        if reading.sample is not None and self.on_sample:
+            self.on_sample(reading.hive, reading.sample)
+        if reading.sample is not None and not self._sampled:
+            self._sampled = True
+            elapsed = METRICS.mark('first_sample')
+            if elapsed is not None:
+                print(f"Pierwszy pomiar zapisany po {elapsed:.2f} s od startu")
+        for alert in alerts:
+            if self.on_alert:
+                self.on_alert(reading.hive, alert)
+
+    def metrics(self):
+        """Liczniki źródeł i uli dla pasieka/metrics.py (kolektor - wołany tylko przy odczycie)."""
+        out = {}
+        for s in self.stats.values():
+            label = f'{{port="{s.port}"}}'
+            out[f'lines_received_total{label}'] = s.lines
+            out[f'lines_parsed_total{label}'] = s.frames
+            out[f'lines_rejected_total{label}'] = s.other
+            out[f'frames_corrupt_total{label}'] = s.corrupt
+            out[f'serial_bytes_total{label}'] = s.bytes
+            out[f'serial_errors_total{label}'] = s.errors
+            out[f'serial_connected{label}'] = int(s.port in self._open_ports)
+        for port, (transport, reader) in self._open_ports.items():
+            label = f'{{port="{port}"}}'
+            out[f'serial_read_peak_bytes{label}'] = transport.read_peak
+            out[f'line_queue_depth{label}'] = reader.lines.qsize()
+            out[f'line_queue_peak{label}'] = reader.peak
+            out[f'line_queue_dropped_total{label}'] = reader.dropped
+        for h in self.hives.values():
+            label = f'{{hive="{h.id}"}}'
+            out[f'lines_written_total{label}'] = h.counts['written']
+            out[f'lines_dropped_total{label}'] = h.counts['dropped']
+            out[f'frames_missing_total{label}'] = h.counts['missing']
+            out[f'frames_duplicate_total{label}'] = h.counts['duplicates']
+            if h.logfile is not None:
+                out[f'log_pending_lines{label}'] = h.logfile.pending()
+                out[f'log_unsynced_bytes{label}'] = h.logfile.size - h.logfile.synced
+        return out
+
+    def report(self):
+        """Liczniki źródeł jako linie tekstu."""
+        return [f"{s.port}: {s.lines} linii ({s.rate():.2f}/s, {s.bytes} B), ramki {s.frames}, "
+                f"inne {s.other} (uszkodzone {s.corrupt}), błędy {s.errors}, połączenia {s.connects}"
+                for s in self.stats.values()]
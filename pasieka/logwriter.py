@@ -0,0 +1,203 @@
+"""
+Zapis logu CSV partiami (group commit) zamiast buffering=1.
+
+Linie czekają w pamięci i trafiają do pliku jednym write() co
+batch_lines linii, batch_bytes bajtów albo flush_interval sekund.
+Trwałość (fsync) według polityki:
+
+    none         - tylko write(); dane w cache systemu, fsync przy close()
+    interval     - fsync najwyżej co fsync_interval sekund
+    every-batch  - fsync po każdej partii (zanik zasilania = najwyżej jedna partia)
+
+Po każdym fsync w pliku <log>.commit zapisujemy długość logu, która na
+pewno jest na karcie. Przy otwarciu (recover()) wszystko za tą długością
+jest sprawdzane: zostają tylko pełne linie przed pierwszym bajtem zerowym
+(karta SD po zaniku zasilania potrafi zostawić zera albo urwaną linię).
+
+Ostatnie linie (także jeszcze niezapisane) są w tail(), więc czytelnicy
+w tym samym procesie widzą najnowszy pomiar bez czekania na partię.
+
+Z io= (pasieka/pipeline.DiskWriter) write, fsync i zapis znacznika
+wykonuje wątek zapisu, w tej samej kolejności; wołający nie czeka na kartę.
+"""
+
+import collections
+import os
+import time
+
+from .metrics import METRICS
+from .pipeline import write_all
+
+POLICIES = ('none', 'interval', 'every-batch')
+MARKER_SUFFIX = '.commit'
+RECOVERY_SCAN = 1 << 20     # bez znacznika sprawdzamy tylko ostatni 1 MiB
+
+
+def marker_path(path):
+    return path + MARKER_SUFFIX
+
+
+def read_marker(path):
+    """(zatwierdzona długość, liczba linii) z <log>.commit; (0, 0) gdy brak."""
+    try:
+        with open(marker_path(path), 'rb') as f:
+            size, lines = f.read().split()[:2]
+        return int(size), int(lines)
+    except (OSError, ValueError):
+        return 0, 0
+
+
+def recover(path):
+    """
+    Obcina uszkodzony ogon logu po zaniku zasilania: za zatwierdzoną
+    długością zostają pełne linie przed pierwszym zerem. Zwraca liczbę
+    usuniętych bajtów.
+    """
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    committed = min(read_marker(path)[0], size)
+    start = committed or max(0, size - RECOVERY_SCAN)
+    if start >= size:
+        return 0
+    with open(path, 'r+b') as f:
+        f.seek(start)
+        rest = f.read()
+        zero = rest.find(b'\0')
+        if zero >= 0:
+            rest = rest[:zero]
+        keep = rest.rfind(b'\n') + 1
+        if start + keep == size:
+            return 0
+        f.truncate(start + keep)
+        os.fsync(f.fileno())
+    return size - start - keep
+
+
+class LogWriter:
+    """
+    Dopisuje linie tekstu do logu partiami. write() zwraca (offset, koniec)
+    linii w pliku - te same wartości co przy zapisie od razu, więc katalog
+    (catalog.record) może je zapamiętać, zanim partia trafi na dysk.
+    """
+
+    def __init__(self, path, policy='interval', batch_lines=64, batch_bytes=16384,
+                 flush_interval=5.0, fsync_interval=30.0, tail=64, on_flush=None, io=None):
+        if policy not in POLICIES:
+            raise ValueError(f"nieznana polityka fsync: {policy} (dostępne: {', '.join(POLICIES)})")
+        self.path = path
+        self.policy = policy
+        self.batch_lines = batch_lines
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.on_flush = on_flush            # on_flush(linie, bajty) po każdej partii
+        self.io = io                        # DiskWriter albo None (zapis od razu)
+        self.recovered = recover(path)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._marker = os.open(marker_path(path), os.O_WRONLY | os.O_CREAT, 0o644)
+        self.size = os.fstat(self._fd).st_size     # długość logu razem z buforem
+        self.synced, self.lines = read_marker(path)     # stan z ostatniego fsync
+        self._batch = []
+        self._batch_size = 0
+        self._tail = collections.deque(maxlen=tail)
+        self._last_flush = self._last_sync = time.monotonic()
+        self.counts = {'batches': 0, 'fsyncs': 0}
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        offset = self.size
+        self.size += len(data)
+        self._batch.append(data)
+        self._batch_size += len(data)
+        self._tail.append(text)
+        if len(self._batch) >= self.batch_lines or self._batch_size >= self.batch_bytes:
+            self.flush()
+        else:
+            self.maybe_flush()
+        return offset, self.size
+
+    def write_lines(self, lines):
+        """Jak write() dla wielu gotowych linii naraz (bytes zakończone '\\n', np. z pasieka/bulk.py)."""
+        offset = self.size
+        size = sum(map(len, lines))
+        self.size += size
+        self._batch.extend(lines)
+        self._batch_size += size
+        self._tail.extend(lines[-self._tail.maxlen:])
+        if len(self._batch) >= self.batch_lines or self._batch_size >= self.batch_bytes:
+            self.flush()
+        else:
+            self.maybe_flush()
+        return offset, self.size
+
+    def maybe_flush(self):
+        """Zapisuje partię, jeśli czeka dłużej niż flush_interval (wołać też w bezczynności)."""
+        if self._batch and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self, sync=None):
+        """Zapisuje bufor jednym write(); fsync według polityki (albo gdy sync=True)."""
+        now = time.monotonic()
+        self._last_flush = now
+        if self._batch:
+            lines, size = len(self._batch), self._batch_size
+            if self.io:
+                self.io.put(('write', self._fd, b''.join(self._batch)))
+            else:
+                write_all(self._fd, b''.join(self._batch))
+                METRICS.observe('log_flush_seconds', time.monotonic() - now)
+            self._batch.clear()
+            self._batch_size = 0
+            self.lines += lines
+            self.counts['batches'] += 1
+            if self.on_flush:
+                self.on_flush(lines, size)
+        if sync is None:
+            sync = (self.policy == 'every-batch'
+                    or self.policy == 'interval' and now - self._last_sync >= self.fsync_interval)
+        if sync and self.synced != self.size:
+            self._sync(now)
+
+    def _sync(self, now):
+        # stała długość rekordu: jeden zapis w miejscu, bez tworzenia pliku od nowa
+        record = f"{self.size:016d} {self.lines:012d}\n".encode()
+        if self.io:
+            # synced = zlecone; wątek zapisu wykona je po partiach wstawionych wcześniej
+            for op in (('fsync', self._fd), ('pwrite', self._marker, record, 0), ('fsync', self._marker)):
+                self.io.put(op)
+        else:
+            os.fsync(self._fd)
+            write_all(self._marker, record, 0)
+            os.fsync(self._marker)
+            METRICS.observe('log_fsync_seconds', time.monotonic() - now)
+        self.synced = self.size
+        self._last_sync = now
+        self.counts['fsyncs'] += 1
+
+    def tail(self, n=None):
+        """Ostatnie linie (najnowsza na końcu), łącznie z niezapisanymi."""
+        lines = list(self._tail)
+        lines = lines if n is None else lines[-n:]
+        # write_lines() trzyma bajty - dekodujemy dopiero przy odczycie
+        return [l.decode('utf-8', errors='replace') if isinstance(l, bytes) else l for l in lines]
+
+    def pending(self):
+        return len(self._batch)
+
+    def close(self):
+        if self._fd is None:
+            return
+        self.flush(sync=True)
+        for fd in (self._fd, self._marker):
+            if self.io:
+                self.io.put(('close', fd))
+            else:
+                os.close(fd)
+        self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,207 @@
+"""
+Liczniki, histogramy opóźnień i głębokości kolejek demona (merge1.py).
+
+Dwa rodzaje danych:
+
+* histogramy (observe()) - czas komendy AT, opóźnienie SMS, czas zapisu
+  partii logu i fsync; zapisywane na bieżąco, stałe kubełki, więc koszt
+  to jedno bisect na pomiar,
+* kolektory (add_collector()) - funkcje zwracające {nazwa: wartość} z
+  liczników, które moduły i tak prowadzą (SourceStats, Outbox.counts,
+  maksima buforów); wołane dopiero przy odczycie, więc gorąca ścieżka
+  odbioru linii nic nie płaci.
+
+Nazwy jak w Prometheusie: 'lines_received_total{port="/dev/ttyACM0"}';
+końcówka _total oznacza licznik, pozostałe wartości z kolektorów to
+bieżące poziomy (gauge).
+
+Etapy startu (mark()) - sekundy od start() do pierwszego wystąpienia
+etapu, np. pierwszy zapisany pomiar albo gotowość modemu do SMS.
+
+Odczyt:
+
+    curl http://127.0.0.1:9108/metrics        # format tekstowy Prometheusa
+    curl http://127.0.0.1:9108/metrics.json
+
+oraz migawka JSON zapisywana co interval sekund (run_snapshots()).
+"""
+
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+
+PREFIX = 'pasieka_'
+# górne granice kubełków [s]; ostatni kubełek (+Inf) jest dodawany
+BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+          1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def split_name(name):
+    """'x{a="b"}' -> ('x', 'a="b"'); bez etykiet -> ('x', '')."""
+    base, _, labels = name.partition('{')
+    return base, labels.rstrip('}')
+
+
+def with_label(name, label):
+    base, labels = split_name(name)
+    return f"{base}{{{labels + ',' if labels else ''}{label}}}"
+
+
+class Histogram:
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Przybliżony kwantyl: górna granica kubełka (max dla ostatniego)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'max': self.max,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99)}
+
+
+class Metrics:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.started = clock()
+        self.histograms = {}
+        self.marks = {}         # etap startu -> sekundy od start()
+        self._collectors = []
+
+    def start(self):
+        """Początek odliczania etapów startu (np. na początku main())."""
+        self.started = self.clock()
+        self.marks = {}
+
+    def mark(self, stage):
+        """Zapamiętuje pierwsze osiągnięcie etapu; zwraca sekundy od start() (None, gdy już był)."""
+        if stage in self.marks:
+            return None
+        self.marks[stage] = elapsed = self.clock() - self.started
+        return elapsed
+
+    def observe(self, name, value):
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = Histogram()
+        h.observe(value)
+
+    def add_collector(self, fn):
+        """fn() -> {nazwa: liczba}, wołane przy każdym odczycie."""
+        self._collectors.append(fn)
+
+    def remove_collector(self, fn):
+        if fn in self._collectors:
+            self._collectors.remove(fn)
+
+    def collect(self):
+        values = {}
+        for fn in self._collectors:
+            try:
+                values.update(fn())
+            except Exception as e:      # zepsuty kolektor nie może wyłączyć reszty
+                values[with_label('collector_errors_total', f'error="{type(e).__name__}"')] = 1
+        return values
+
+    def snapshot(self):
+        now = self.clock()
+        return {'ts': now, 'uptime': now - self.started, 'values': self.collect(), 'startup': dict(self.marks),
+                'histograms': {name: h.as_dict() for name, h in self.histograms.items()}}
+
+    def render(self):
+        """Format tekstowy Prometheusa."""
+        out = []
+        typed = set()
+        for name, value in sorted(self.collect().items()):
+            base, _ = split_name(name)
+            if base not in typed:
+                typed.add(base)
+                out.append(f"# TYPE {PREFIX}{base} {'counter' if base.endswith('_total') else 'gauge'}")
+            out.append(f"{PREFIX}{name} {value}")
+        for name, h in sorted(self.histograms.items()):
+            base, labels = split_name(name)
+            if base not in typed:
+                typed.add(base)
+                out.append(f"# TYPE {PREFIX}{base} histogram")
+            seen = 0
+            for bound, n in zip([*h.bounds, '+Inf'], h.buckets):
+                seen += n
+                out.append(f'{PREFIX}{base}_bucket{{{labels + "," if labels else ""}le="{bound}"}} {seen}')
+            suffix = '{' + labels + '}' if labels else ''
+            out.append(f"{PREFIX}{base}_sum{suffix} {h.sum}")
+            out.append(f"{PREFIX}{base}_count{suffix} {h.count}")
+        if self.marks:
+            out.append(f"# TYPE {PREFIX}startup_seconds gauge")
+            for stage, seconds in self.marks.items():
+                out.append(f'{PREFIX}startup_seconds{{stage="{stage}"}} {seconds:.3f}')
+        out.append(f"{PREFIX}uptime_seconds {self.clock() - self.started:.0f}")
+        return '\n'.join(out) + '\n'
+
+    def write_snapshot(self, path):
+        # zapis atomowy, jak catalog.json: czytelnik widzi starą albo nową migawkę
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+
+    async def run_snapshots(self, path, interval=60.0):
+        """Zadanie zapisujące migawkę co interval s (i przy anulowaniu)."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                self.write_snapshot(path)
+        finally:
+            self.write_snapshot(path)
+
+    async def serve(self, host='127.0.0.1', port=9108):
+        """Zadanie z serwerem HTTP: GET /metrics (tekst) i /metrics.json; działa do anulowania."""
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                pass        # nagłówki pomijamy
+            parts = request.decode('latin-1').split()
+            path = parts[1] if len(parts) > 1 else '/'
+            if path in ('/', '/metrics'):
+                status, ctype, body = '200 OK', 'text/plain; version=0.0.4', self.render()
+            elif path == '/metrics.json':
+                status, ctype, body = '200 OK', 'application/json', json.dumps(self.snapshot(), sort_keys=True)
+            else:
+                status, ctype, body = '404 Not Found', 'text/plain', 'nie ma takiej strony\n'
+            data = body.encode()
+            writer.write(f"HTTP/1.0 {status}\r\nContent-Type: {ctype}\r\n"
+                         f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+# wspólny rejestr procesu; moduły zapisują do niego histogramy, merge1 go udostępnia
+METRICS = Metrics()
@@ -0,0 +1,429 @@
+"""
+Silnik komend AT dla modemu SIM868.
+
+Zamiast stałego time.sleep() po każdej komendzie czytamy odpowiedź aż do
+kodu końcowego (OK, ERROR, +CME ERROR, +CMS ERROR albo zachęty '> ' przy
+AT+CMGS). Każda komenda ma własny termin, więc szybki modem kosztuje tyle,
+ile faktycznie odpowiada, a wolna odpowiedź nie ginie po upływie sleepa.
+
+Silnik jest jedynym czytelnikiem portu: komunikaty niezamówione (URC:
++CMTI, +CMT, RING, +CPIN, +HTTPACTION) oddziela od odpowiedzi na
+komendy i kolejkuje, a poll() przekazuje je zarejestrowanym handlerom.
+
+AsyncATEngine robi to samo w pętli asyncio: jest protokołem portu
+(pasieka.aio), więc odczyt nigdy nie blokuje, a handlery URC to korutyny.
+"""
+
+import asyncio
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from . import gsm7
+from .metrics import METRICS
+
+CTRL_Z = b'\x1a'
+ESC = b'\x1b'
+
+# Kody końcowe kończące odpowiedź na komendę
+FINAL_CODES = ('OK', 'ERROR')
+FINAL_PREFIXES = ('+CME ERROR', '+CMS ERROR')
+PROMPT = '>'
+
+# Komunikaty niezamówione, które rozpoznajemy; +CMT ma dodatkowo linię z treścią
+URC_PREFIXES = ('+CMTI', '+CMT', '+CDS', 'RING', '+CPIN', '+HTTPACTION')
+URC_WITH_BODY = ('+CMT',)
+
+CMGS_RE = re.compile(r'^\+CMGS:\s*(\d+)')
+CMT_RE = re.compile(r'^"(?P<sender>[^"]*)",\s*"[^"]*",\s*"(?P<date>[^"]*)"')
+CMTI_RE = re.compile(r'^"(?P<mem>[^"]*)",\s*(?P<index>\d+)')
+
+
+def is_final(line):
+    """Czy linia kończy odpowiedź modemu."""
+    return line in FINAL_CODES or line.startswith(FINAL_PREFIXES)
+
+
+def urc_name(line):
+    """Nazwa URC ('+CMTI', 'RING', ...) albo None dla zwykłej linii."""
+    name = line.split(':', 1)[0]
+    return name if name in URC_PREFIXES else None
+
+
+def response_prefix(cmd):
+    """'AT+CPIN?' -> '+CPIN': linie z tym prefiksem to odpowiedź, nie URC."""
+    m = re.match(r'^AT(\+[A-Z]+)', cmd.upper())
+    return m.group(1) if m else None
+
+
+def take_line(buf, prompt=False):
+    """Wyjmuje z bufora następną niepustą linię (albo zachętę '> ') lub zwraca None."""
+    while True:
+        nl = buf.find(b'\n')
+        if nl < 0:
+            if prompt and buf.strip().startswith(b'>'):
+                buf.clear()
+                return PROMPT
+            return None
+        raw = bytes(buf[:nl]).strip()
+        del buf[:nl + 1]
+        if raw:
+            return raw.decode(errors='ignore')
+
+
+def split_urc(line):
+    """'+CMTI: "SM",3' -> URC('+CMTI', '"SM",3')."""
+    value = line.split(':', 1)[1].strip() if ':' in line else ''
+    return URC(urc_name(line), value)
+
+
+@dataclass
+class URC:
+    """Komunikat niezamówiony z modemu."""
+    name: str           # '+CMT', '+CMTI', 'RING', '+CPIN'
+    value: str = ''     # wszystko po ': '
+    body: str = ''      # treść SMS dla +CMT
+
+
+def parse_cmt(urc):
+    """
+    +CMT: "<nadawca>","","<data>" -> (nadawca, data, treść). W trybie PDU
+    (+CMT: ,<długość>, np. w trakcie przeglądu skrzynki) treść to SMS-DELIVER.
+    """
+    m = CMT_RE.match(urc.value)
+    if not m:
+        try:
+            sender, date, text, _ = gsm7.parse_deliver(urc.body)
+            return sender, date, text
+        except (ValueError, IndexError, TypeError):
+            return None, None, urc.body
+    return m.group('sender'), m.group('date'), urc.body
+
+
+def parse_cds(urc):
+    """+CDS: <fo>,<mr>,... (raport doręczenia w trybie tekstowym) -> (mr, status)."""
+    parts = urc.value.split(',')
+    try:
+        return int(parts[1]), int(parts[-1])
+    except (IndexError, ValueError):
+        return None, None
+
+
+def cmgs_ref(resp):
+    """Numer referencyjny z odpowiedzi '+CMGS: <mr>' albo None."""
+    for line in resp.lines:
+        m = CMGS_RE.match(line)
+        if m:
+            return int(m.group(1))
+    return None
+
+
+def parse_cmti(urc):
+    """+CMTI: "SM",<idx> -> indeks wiadomości w pamięci modemu."""
+    m = CMTI_RE.match(urc.value)
+    return int(m.group('index')) if m else None
+
+
+@dataclass
+class ATResponse:
+    """Odpowiedź na jedną komendę AT."""
+    command: str
+    lines: list = field(default_factory=list)   # linie pośrednie (bez echa i kodu końcowego)
+    final: str = None                           # OK / ERROR / +CME ERROR: .. / '>' / None
+    elapsed: float = 0.0                        # czas od wysłania do kodu końcowego [s]
+
+    @property
+    def ok(self):
+        return self.final == 'OK'
+
+    @property
+    def prompt(self):
+        return self.final == PROMPT
+
+    @property
+    def timed_out(self):
+        return self.final is None
+
+    def observe(self):
+        """Czas odpowiedzi do histogramu at_command_seconds (pasieka/metrics.py)."""
+        result = 'timeout' if self.final is None else 'ok' if self.ok or self.prompt else 'error'
+        METRICS.observe(f'at_command_seconds{{result="{result}"}}', self.elapsed)
+
+
+class ATEngine:
+    """
+    Wysyła komendy AT i czyta odpowiedzi do kodu końcowego.
+
+    Silnik przejmuje port: ustawia krótki timeout odczytu (poll), a własny
+    bufor dzieli bajty na linie, więc zachęta '> ' bez znaku nowej linii
+    też jest rozpoznawana.
+    """
+
+    def __init__(self, ser, default_timeout=2.0, poll=0.05):
+        self.ser = ser
+        self.default_timeout = default_timeout
+        self.ser.timeout = poll
+        self._buf = bytearray()
+        self._urcs = deque()
+        self._handlers = {}
+
+    def on(self, name, handler):
+        """Rejestruje handler(urc) dla URC o podanej nazwie (np. '+CMT')."""
+        self._handlers.setdefault(name, []).append(handler)
+
+    def _queue_urc(self, line, deadline):
+        urc = split_urc(line)
+        if urc.name in URC_WITH_BODY:
+            urc.body = self.read_line(max(deadline, time.monotonic() + 1.0)) or ''
+        self._urcs.append(urc)
+
+    def read_line(self, deadline, prompt=False):
+        """Czyta następną linię z portu; None, gdy minie termin (time.monotonic())."""
+        while True:
+            line = take_line(self._buf, prompt)
+            if line is not None:
+                return line
+            if time.monotonic() >= deadline:
+                return None
+            self._buf += self.ser.read(self.ser.in_waiting or 1)
+
+    def _collect(self, resp, start, timeout, prompt, echo=None):
+        deadline = start + timeout
+        own = response_prefix(resp.command)
+        while True:
+            line = self.read_line(deadline, prompt)
+            if line is None:
+                break
+            if line == echo:
+                continue    # echo komendy, dopóki nie wyłączono go przez ATE0
+            name = urc_name(line)
+            if name and name != own:
+                self._queue_urc(line, deadline)
+                continue
+            if line == PROMPT or is_final(line):
+                resp.final = line
+                break
+            resp.lines.append(line)
+        resp.elapsed = time.monotonic() - start
+        resp.observe()
+        return resp
+
+    def command(self, cmd, timeout=None, prompt=False):
+        """
+        Wysyła komendę i zwraca ATResponse.
+        prompt=True: zakończ także na zachęcie '> ' (AT+CMGS).
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        start = time.monotonic()
+        self.ser.write((cmd + '\r').encode())
+        return self._collect(ATResponse(cmd), start, timeout, prompt, echo=cmd)
+
+    def payload(self, data, timeout=60.0):
+        """Wysyła treść po zachęcie '> ' zakończoną Ctrl+Z i czeka na +CMGS / OK."""
+        start = time.monotonic()
+        self.ser.write(data + CTRL_Z)
+        return self._collect(ATResponse('<payload>'), start, timeout, False)
+
+    def cancel_payload(self):
+        """Anuluje rozpoczęte AT+CMGS (ESC zamiast Ctrl+Z)."""
+        self.ser.write(ESC)
+
+    def send_sms(self, number, text, timeout=60.0):
+        """Wysyła SMS w trybie tekstowym; zwraca odpowiedź z linią +CMGS: <ref>."""
+        resp = self.command(f'AT+CMGS="{number}"', timeout=5, prompt=True)
+        if not resp.prompt:
+            self.cancel_payload()
+            return resp
+        return self.payload(text.encode(), timeout)
+
+    def poll(self, timeout=1.0):
+        """
+        Czeka do timeout sekund na URC i wywołuje handlery.
+        Handlery mogą wysyłać komendy - URC z ich odpowiedzi trafią do kolejki.
+        """
+        deadline = time.monotonic() + timeout
+        while not self._urcs:
+            line = self.read_line(deadline)
+            if line is None:
+                break
+            if urc_name(line):
+                self._queue_urc(line, deadline)
+        handled = 0
+        while self._urcs:
+            urc = self._urcs.popleft()
+            for handler in self._handlers.get(urc.name, ()):
+                handler(urc)
+            handled += 1
+        return handled
+
+
+class AsyncATEngine:
+    """
+    ATEngine dla asyncio. Jest protokołem portu:
+
+        modem = AsyncATEngine()
+        transport = await open_serial(MODEM_PORT, 115200, modem)
+        resp = await modem.command('AT')
+
+    Komendy są serializowane blokadą; URC trafiają do kolejki, którą
+    dispatch() rozdaje handlerom (korutynom) zarejestrowanym przez on().
+    """
+
+    def __init__(self, default_timeout=2.0):
+        self.default_timeout = default_timeout
+        self.transport = None
+        self.urcs = asyncio.Queue()
+        self._handlers = {}
+        self._buf = bytearray()
+        self._lock = asyncio.Lock()
+        self._resp = None       # odpowiedź w trakcie zbierania
+        self._done = None       # future ustawiany kodem końcowym
+        self._own = None
+        self._echo = None
+        self._prompt = False
+        self._ready = None      # linia kończąca komendę zamiast kodu końcowego ('DOWNLOAD')
+        self._on_line = None    # on_line(linia) dla linii odpowiedzi w miarę ich napływu
+        self._body_for = None   # URC (+CMT) czekający na linię z treścią
+
+    def on(self, name, handler):
+        """Rejestruje korutynę handler(urc) dla URC o podanej nazwie."""
+        self._handlers.setdefault(name, []).append(handler)
+
+    # --- protokół ---
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self._buf += data
+        while True:
+            line = take_line(self._buf, self._prompt and self._resp is not None)
+            if line is None:
+                return
+            self._line_received(line)
+
+    def connection_lost(self, exc):
+        if self._done is not None and not self._done.done():
+            self._done.set_result(None)
+
+    def _line_received(self, line):
+        if self._body_for is not None:
+            urc, self._body_for = self._body_for, None
+            urc.body = line
+            self.urcs.put_nowait(urc)
+            return
+        resp = self._resp
+        if resp is not None and self._done.done():
+            resp = None     # odpowiedź zakończona, a linie z tego samego odczytu to już URC
+        if resp is not None and line == self._echo:
+            return
+        name = urc_name(line)
+        if name and (resp is None or name != self._own):
+            urc = split_urc(line)
+            if name in URC_WITH_BODY:
+                self._body_for = urc
+            else:
+                self.urcs.put_nowait(urc)
+            return
+        if resp is None:
+            return      # linia bez komendy (np. "Call Ready" po starcie modemu)
+        if line == PROMPT or is_final(line) or line == self._ready:
+            resp.final = line
+            self._done.set_result(line)
+        else:
+            resp.lines.append(line)
+            if self._on_line is not None:
+                self._on_line(line)
+
+    # --- komendy ---
+
+    async def _exchange(self, resp, data, timeout, prompt, echo=None, on_line=None, ready=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        self._resp, self._own, self._echo, self._prompt = resp, response_prefix(resp.command), echo, prompt
+        self._on_line, self._ready = on_line, ready
+        self._done = asyncio.get_running_loop().create_future()
+        start = time.monotonic()
+        try:
+            self.transport.write(data)
+            await asyncio.wait_for(asyncio.shield(self._done), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._resp = self._on_line = self._ready = None
+            resp.elapsed = time.monotonic() - start
+            resp.observe()
+        return resp
+
+    async def _command(self, cmd, timeout=None, prompt=False, on_line=None, ready=None):
+        return await self._exchange(ATResponse(cmd), (cmd + '\r').encode(), timeout, prompt, cmd, on_line, ready)
+
+    async def _submit(self, cmd, payload, timeout):
+        resp = await self._command(cmd, 5, prompt=True)
+        if not resp.prompt:
+            self.transport.write(ESC)
+            return resp
+        return await self._exchange(ATResponse('<payload>'), payload + CTRL_Z, timeout, False)
+
+    async def command(self, cmd, timeout=None, prompt=False, on_line=None):
+        """
+        Wysyła komendę i zwraca ATResponse (jak ATEngine.command). on_line(linia)
+        dostaje linie odpowiedzi od razu po odebraniu (np. inbox.ListingParser.feed).
+        """
+        async with self._lock:
+            return await self._command(cmd, timeout, prompt, on_line)
+
+    async def command_pdu(self, cmd, timeout=None, on_line=None):
+        """Komenda w trybie PDU (AT+CMGF=0, np. AT+CMGL=4) z powrotem do trybu tekstowego."""
+        async with self._lock:
+            await self._command('AT+CMGF=0')
+            try:
+                return await self._command(cmd, timeout, on_line=on_line)
+            finally:
+                await self._command('AT+CMGF=1')
+
+    async def send_sms(self, number, text, timeout=60.0):
+        """Wysyła SMS; blokada obejmuje zachętę i treść, żeby nic się nie wcięło."""
+        async with self._lock:
+            return await self._submit(f'AT+CMGS="{number}"', text.encode(), timeout)
+
+    async def send_data(self, cmd, data, timeout=10.0, ready='DOWNLOAD'):
+        """
+        Komenda przyjmująca surowe bajty (AT+HTTPDATA=<długość>,<ms>): po
+        linii ready wysyła data bez Ctrl+Z i czeka na OK. Bez ready zwraca
+        odpowiedź na samą komendę.
+        """
+        async with self._lock:
+            resp = await self._command(cmd, 5, ready=ready)
+            if resp.final != ready:
+                return resp
+            return await self._exchange(ATResponse('<data>'), data, timeout, False)
+
+    async def send_pdus(self, pdus, timeout=60.0):
+        """
+        Wysyła części [(pdu_hex, długość_TPDU)] w trybie PDU (AT+CMGF=0) i
+        wraca do trybu tekstowego. Zwraca odpowiedzi, po jednej na wysłaną
+        część; przerywa na pierwszym błędzie.
+        """
+        async with self._lock:
+            out = []
+            await self._command('AT+CMGF=0')
+            try:
+                for pdu, length in pdus:
+                    resp = await self._submit(f'AT+CMGS={length}', pdu.encode(), timeout)
+                    out.append(resp)
+                    if not resp.ok:
+                        break
+            finally:
+                await self._command('AT+CMGF=1')
+            return out
+
+    async def dispatch(self):
+        """Rozdaje URC handlerom, aż zadanie zostanie anulowane."""
+        while True:
+            urc = await self.urcs.get()
+            for handler in self._handlers.get(urc.name, ()):
+                try:
+                    await handler(urc)
+                except Exception as e:
+                    print(f"Błąd obsługi {urc.name}: {e}")
@@ -0,0 +1,200 @@
+"""
+Kolejka SMS-ów wychodzących: logger i obsługa komend tylko wrzucają
+wiadomość (submit() nie czeka na modem), a osobne zadanie run() wysyła.
+
+* priorytet - alarmy przed odpowiedziami na komendy, te przed resztą,
+* łączenie - wiadomości z tym samym kluczem (np. 'alert:tip') czekające
+  w kolejce zastępuje najnowsza treść, a klucz wysłany w ostatnich
+  coalesce_window sekundach jest pomijany (burza alarmów = jeden SMS),
+* limit na odbiorcę - wiadro żetonów (burst wiadomości, potem rate/s),
+* długie teksty - wiele części z nagłówkiem UDH w trybie PDU (tryb
+  tekstowy AT+CMGS nie pozwala dołączyć UDH),
+* numer referencyjny z '+CMGS: <mr>' zapamiętany; raport doręczenia
+  (+CDS) oznacza wiadomość jako doręczoną,
+* błąd wysyłki - ponowienie z wykładniczym odstępem do max_attempts prób.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from . import gsm7
+from .metrics import METRICS
+from .modem import cmgs_ref, parse_cds
+
+PRIORITY_ALARM = 0
+PRIORITY_REPLY = 1
+PRIORITY_INFO = 2
+PRIORITY_NAMES = {PRIORITY_ALARM: 'alarm', PRIORITY_REPLY: 'reply', PRIORITY_INFO: 'info'}
+
+
+@dataclass
+class Message:
+    number: str
+    text: str
+    priority: int = PRIORITY_REPLY
+    key: str = None             # klucz łączenia duplikatów
+    created: float = 0.0
+    attempts: int = 0
+    not_before: float = 0.0     # najwcześniejsza kolejna próba (po błędzie)
+    state: str = 'queued'       # queued, sent, delivered, failed
+    refs: list = field(default_factory=list)        # <mr> każdej części
+    delivered: set = field(default_factory=set)
+
+
+class RateLimiter:
+    """Wiadro żetonów na odbiorcę: burst wiadomości od razu, potem rate na sekundę."""
+
+    def __init__(self, rate=1 / 30, burst=3, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._buckets = {}      # numer -> [żetony, czas aktualizacji]
+
+    def _refill(self, number):
+        now = self.clock()
+        b = self._buckets.setdefault(number, [self.burst, now])
+        b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+        b[1] = now
+        return b
+
+    def wait_time(self, number):
+        """Sekundy do dostępnego żetonu (0 = można wysyłać)."""
+        tokens = self._refill(number)[0]
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, number):
+        self._refill(number)[0] -= 1
+
+
+class Outbox:
+    """modem: AsyncATEngine (można podmienić po ponownym połączeniu - attach())."""
+
+    def __init__(self, modem=None, limiter=None, max_attempts=4, retry_delay=15.0,
+                 coalesce_window=600.0, clock=time.monotonic):
+        self.modem = modem
+        self.limiter = limiter or RateLimiter(clock=clock)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.coalesce_window = coalesce_window
+        self.clock = clock
+        self.pending = []
+        self.by_ref = {}        # <mr> -> Message, do raportów doręczenia
+        self._recent = {}       # klucz -> czas ostatniej wysyłki
+        self._ref = 0           # numer łączenia części (UDH)
+        self._wakeup = asyncio.Event()
+        self.counts = {'sent': 0, 'failed': 0, 'retried': 0, 'coalesced': 0, 'suppressed': 0, 'delivered': 0}
+
+    def attach(self, modem):
+        self.modem = modem
+        self._wakeup.set()
+
+    def submit(self, number, text, priority=PRIORITY_REPLY, key=None):
+        """Dodaje wiadomość do kolejki; zwraca Message albo None, gdy połączona/pominięta."""
+        now = self.clock()
+        if key is not None:
+            for msg in self.pending:
+                if msg.key == key and msg.number == number:
+                    msg.text = text
+                    msg.priority = min(msg.priority, priority)
+                    self.counts['coalesced'] += 1
+                    return None
+            last = self._recent.get((number, key))
+            if last is not None and now - last < self.coalesce_window:
+                self.counts['suppressed'] += 1
+                return None
+        msg = Message(number, text, priority, key, created=now)
+        self.pending.append(msg)
+        self._wakeup.set()
+        return msg
+
+    def _next(self):
+        """(wiadomość gotowa do wysłania albo None, sekundy do najbliższej gotowej)."""
+        now = self.clock()
+        best, wait = None, None
+        for msg in self.pending:
+            delay = max(msg.not_before - now, self.limiter.wait_time(msg.number))
+            if delay <= 0:
+                if best is None or (msg.priority, msg.created) < (best.priority, best.created):
+                    best = msg
+            elif wait is None or delay < wait:
+                wait = delay
+        return best, wait
+
+    async def run(self):
+        """Zadanie wysyłające; działa do anulowania."""
+        while True:
+            msg, wait = self._next() if self.modem is not None else (None, None)
+            if msg is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.pending.remove(msg)
+            self.limiter.take(msg.number)
+            await self._send(msg)
+
+    async def _send(self, msg):
+        msg.attempts += 1
+        text = gsm7.to_gsm7(msg.text)
+        try:
+            if gsm7.septets(text) <= gsm7.SINGLE_SEGMENT:
+                # tryb tekstowy z CSCS="GSM": bezpiecznie tylko znaki ASCII
+                responses = [await self.modem.send_sms(msg.number, text.encode('ascii', 'replace').decode())]
+                parts = 1
+            else:
+                self._ref = (self._ref + 1) & 0xFF
+                pdus = gsm7.submit_pdus(msg.number, text, self._ref)
+                responses = await self.modem.send_pdus(pdus)
+                parts = len(pdus)
+        except Exception as e:
+            print(f"Błąd wysyłania SMS do {msg.number}: {e}")
+            responses, parts = [], 1
+        refs = [cmgs_ref(r) for r in responses]
+        if len(responses) == parts and all(r.ok for r in responses) and None not in refs:
+            msg.state, msg.refs = 'sent', refs
+            for ref in refs:
+                self.by_ref[ref] = msg
+            if msg.key is not None:
+                self._recent[(msg.number, msg.key)] = self.clock()
+            self.counts['sent'] += 1
+            # od submit() do potwierdzenia +CMGS, razem z czekaniem w kolejce i ponowieniami
+            METRICS.observe(f'sms_latency_seconds{{priority="{PRIORITY_NAMES.get(msg.priority, msg.priority)}"}}',
+                            self.clock() - msg.created)
+            print(f"SMS do {msg.number} wysłany ({parts} cz., ref {refs}, próba {msg.attempts})")
+            return True
+        final = responses[-1].final if responses else 'brak odpowiedzi'
+        if msg.attempts < self.max_attempts:
+            msg.not_before = self.clock() + self.retry_delay * 2 ** (msg.attempts - 1)
+            self.pending.append(msg)
+            self.counts['retried'] += 1
+            print(f"SMS do {msg.number} nie wysłany ({final}), ponowienie za "
+                  f"{msg.not_before - self.clock():.0f} s")
+        else:
+            msg.state = 'failed'
+            self.counts['failed'] += 1
+            print(f"SMS do {msg.number} porzucony po {msg.attempts} próbach ({final})")
+        return False
+
+    def metrics(self):
+        """Liczniki i głębokość kolejki dla pasieka/metrics.py."""
+        out = {f'sms_{name}_total': n for name, n in self.counts.items()}
+        out['sms_queue_depth'] = len(self.pending)
+        out['sms_awaiting_report'] = len(self.by_ref)
+        return out
+
+    async def on_cds(self, urc):
+        """Handler URC +CDS (raport doręczenia, AT+CNMI=...,1 i AT+CSMP=49,...)."""
+        ref, status = parse_cds(urc)
+        msg = self.by_ref.pop(ref, None)
+        if msg is None:
+            return
+        if status == 0:
+            msg.delivered.add(ref)
+            if msg.delivered >= set(msg.refs):
+                msg.state = 'delivered'
+                self.counts['delivered'] += 1
+        else:
+            print(f"Raport doręczenia SMS do {msg.number}: status {status}")
@@ -0,0 +1,369 @@
+"""
+Ograniczone kolejki między etapami odbioru:
+
+    port (LineReader) -> parser (Ingest._route) -> zapis na kartę (DiskWriter)
+                                                -> subskrybenci (Stage, np. konsola)
+
+Pętla asyncio czyta porty i parsuje; zapis na kartę SD (write, fsync)
+i wolne wyjście (print do zapchanego stdout) robią wątki etapów, więc
+wolna karta nie zatrzymuje odczytu portu, a bajty nie giną w 4 KB
+buforze jądra. Każda kolejka ma stałą pojemność (tablica alokowana raz)
+i politykę na wypadek, gdy etap nie nadąża:
+
+    block        - wstawiający czeka na miejsce (pamięć stała, opóźnienie rośnie)
+    drop-oldest  - najstarszy element wypada i jest liczony w dropped
+    spill        - nadmiar trafia do pliku spill_path (np. /dev/shm), do
+                   spill_limit bajtów; potem jak block. Kolejność zostaje.
+
+Wątek pętli asyncio nigdy nie czeka (stanęłoby czytanie portów i SMS-y):
+gdy block musiałby czekać, element trafia za kolejkę (overflow, liczony),
+a słuchacze (add_listener, np. Ingest) dostają sygnał i wstrzymują
+czytanie portów, aż kolejka opróżni się do połowy. Nadmiar to więc tylko
+to, co było już w drodze. Czekają tylko wstawiający z innych wątków.
+
+Głębokość, maksimum i liczniki kolejek są w metrics() (pasieka/metrics.py).
+"""
+
+import asyncio
+import collections
+import errno
+import itertools
+import os
+import pickle
+import threading
+import time
+
+from .metrics import METRICS
+
+POLICIES = ('block', 'drop-oldest', 'spill')
+SPILL_LIMIT = 32 << 20
+CLOSED = object()       # get() po close() i opróżnieniu kolejki
+
+
+def in_event_loop():
+    """Czy wołający to wątek z działającą pętlą asyncio."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class BoundedQueue:
+    """Kolejka FIFO o stałej pojemności, bezpieczna dla wątków."""
+
+    def __init__(self, capacity, policy='block', spill_path=None, spill_limit=SPILL_LIMIT):
+        if policy not in POLICIES:
+            raise ValueError(f"nieznana polityka kolejki: {policy} (dostępne: {', '.join(POLICIES)})")
+        if policy == 'spill' and not spill_path:
+            raise ValueError("polityka spill wymaga spill_path")
+        self.capacity = capacity
+        self.policy = policy
+        self.spill_path = spill_path
+        self.spill_limit = spill_limit
+        self.peak = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.overflowed = 0     # wstawione ponad pojemność z wątku pętli (zamiast czekania)
+        self.pressure = False   # słuchacze mają wstrzymać producentów
+        self._listeners = []    # (pętla, callback(pressure))
+        self._items = [None] * capacity
+        self._head = 0          # indeks najstarszego elementu
+        self._count = 0
+        self._spill_w = self._spill_r = None
+        self._spill_count = 0
+        self._over = collections.deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._count + self._spill_count + len(self._over)
+
+    def add_listener(self, callback, loop=None):
+        """callback(pressure) w wątku pętli loop (domyślnie bieżącej) przy zmianie pressure."""
+        self._listeners.append((loop or asyncio.get_running_loop(), callback))
+
+    def remove_listener(self, callback):
+        self._listeners = [(l, c) for l, c in self._listeners if c != callback]
+
+    def _set_pressure(self, pressure):
+        self.pressure = pressure
+        for loop, callback in self._listeners:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(callback, pressure)
+
+    def put(self, item):
+        nowait = in_event_loop()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ValueError("kolejka zamknięta")
+                # po rozlaniu (i przepełnieniu) nowe elementy idą na koniec, aż się opróżni - kolejność FIFO
+                if self._over:
+                    if nowait:
+                        self._over.append(item)
+                        self.overflowed += 1
+                        break
+                    self._cond.wait()
+                    continue
+                if not self._spill_count and self._count < self.capacity:
+                    self._push(item)
+                    break
+                if self.policy == 'drop-oldest':
+                    self._pop()
+                    self.dropped += 1
+                    self._push(item)
+                    break
+                if self.policy == 'spill' and self._spill_bytes() < self.spill_limit:
+                    self._spill(item)
+                    break
+                if nowait:
+                    self._over.append(item)
+                    self.overflowed += 1
+                    if not self.pressure:
+                        self._set_pressure(True)
+                    break
+                self._cond.wait()
+            if len(self) > self.peak:
+                self.peak = len(self)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Najstarszy element; None po timeout, CLOSED po close() i opróżnieniu."""
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not len(self):
+                if self._closed:
+                    return CLOSED
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return None
+                self._cond.wait(left)
+            if self._count:
+                item = self._pop()
+            elif self._spill_count:
+                item = self._unspill()
+            else:
+                item = self._over.popleft()
+            if self.pressure and len(self) <= self.capacity // 2:
+                self._set_pressure(False)
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _push(self, item):
+        self._items[(self._head + self._count) % self.capacity] = item
+        self._count += 1
+
+    def _pop(self):
+        item = self._items[self._head]
+        self._items[self._head] = None
+        self._head = (self._head + 1) % self.capacity
+        self._count -= 1
+        return item
+
+    def _spill_bytes(self):
+        return self._spill_w.tell() if self._spill_w else 0
+
+    def _spill(self, item):
+        if self._spill_w is None:
+            self._spill_w = open(self.spill_path, 'wb')
+            self._spill_r = open(self.spill_path, 'rb')
+        pickle.dump(item, self._spill_w, pickle.HIGHEST_PROTOCOL)
+        self._spill_w.flush()
+        self._spill_count += 1
+        self.spilled += 1
+
+    def _unspill(self):
+        item = pickle.load(self._spill_r)
+        self._spill_count -= 1
+        if not self._spill_count:
+            # plik opróżniony - od początku, żeby nie rósł bez końca
+            self._spill_w.seek(0)
+            self._spill_w.truncate()
+            self._spill_r.seek(0)
+        return item
+
+    def remove_spill(self):
+        if self._spill_w is not None:
+            self._spill_w.close()
+            self._spill_r.close()
+            self._spill_w = self._spill_r = None
+            os.remove(self.spill_path)
+
+
+class Stage:
+    """
+    Etap z własnym wątkiem: fn(element) dla każdego elementu kolejki,
+    po kolei. Wyjątek fn jest liczony i wypisywany raz (ten sam błąd nie
+    zasypuje konsoli), etap działa dalej.
+    """
+
+    def __init__(self, name, fn, capacity=1024, policy='block', spill_path=None, spill_limit=SPILL_LIMIT):
+        self.name = name
+        self.fn = fn
+        self.queue = BoundedQueue(capacity, policy, spill_path, spill_limit)
+        self.processed = 0
+        self.errors = 0
+        self.last_error = None
+        self.submitted = 0
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f'stage-{name}', daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        self.queue.put(item)
+        with self._idle:
+            self.submitted += 1
+
+    def _run(self):
+        while (item := self.queue.get()) is not CLOSED:
+            try:
+                self.fn(item)
+            except Exception as e:
+                self.errors += 1
+                if self.last_error != str(e):
+                    print(f"Etap {self.name}: {e}")
+                self.last_error = str(e)
+            with self._idle:
+                self.processed += 1
+                self._idle.notify_all()
+
+    def drain(self, timeout=None):
+        """Czeka, aż wszystko wstawione do tej pory zostanie obsłużone (albo wypadnie); False po timeout."""
+        with self._idle:
+            target = self.submitted
+            return self._idle.wait_for(lambda: self.processed + self.queue.dropped >= target, timeout)
+
+    def close(self, timeout=None):
+        """Obsługuje resztę kolejki i kończy wątek."""
+        self.queue.close()
+        self._thread.join(timeout)
+        self.queue.remove_spill()
+
+    def metrics(self):
+        label = f'{{stage="{self.name}"}}'
+        q = self.queue
+        return {f'queue_depth{label}': len(q), f'queue_peak{label}': q.peak,
+                f'queue_capacity{label}': q.capacity, f'queue_dropped_total{label}': q.dropped,
+                f'queue_spilled_total{label}': q.spilled, f'queue_overflow_total{label}': q.overflowed,
+                f'queue_pressure{label}': int(q.pressure), f'stage_errors_total{label}': self.errors}
+
+
+def write_all(fd, data, offset=None):
+    """
+    os.write (albo os.pwrite od offset) do skutku: krótki zapis, np. na
+    prawie pełnej karcie, dopisuje resztę; zapis 0 B to OSError(ENOSPC).
+    Rekordy stałej długości (.seg, .cp) nie mogą się rozjechać.
+    """
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view) if offset is None else os.pwrite(fd, view, offset)
+        if n <= 0:
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+        view = view[n:]
+        if offset is not None:
+            offset += n
+
+
+def apply(op):
+    """Wykonuje jedną operację DiskWriter od razu (bez io= albo w wątku zapisu)."""
+    kind, fd = op[0], op[1]
+    if kind == 'write':
+        write_all(fd, op[2])
+    elif kind == 'pwrite':
+        write_all(fd, op[2], op[3])
+    elif kind == 'fsync':
+        os.fsync(fd)
+    elif kind == 'close':
+        os.close(fd)
+    elif kind == 'replace':
+        # fd to tu ścieżka
+        with open(fd + '.tmp', 'wb') as f:
+            f.write(op[2])
+        os.replace(fd + '.tmp', fd)
+    elif kind == 'rename':
+        os.replace(fd, op[2])
+    elif kind == 'remove':
+        os.remove(fd)
+    else:
+        raise ValueError(f"nieznana operacja zapisu: {kind}")
+
+
+class DiskWriter(Stage):
+    """
+    Etap zapisu na kartę. Elementy to operacje na deskryptorach:
+
+        ('write', fd, bytes)   ('pwrite', fd, bytes, offset)   ('fsync', fd)   ('close', fd)
+        ('replace', ścieżka, bytes)   - cały mały plik atomowo (tmp + rename), np. catalog.json
+        ('rename', ścieżka, nowa)   ('remove', ścieżka)   - np. wycinanie kolejki uplink
+
+    wykonywane w kolejności wstawienia (LogWriter, SegmentWriter, Catalog
+    i uplink.Spool z io=). Bez drop-oldest: wypadnięta partia rozjechałaby
+    offsety w katalogu.
+
+    client(on_error) daje widok kolejki dla jednego właściciela (np. ula):
+    błąd jego operacji wraca do niego w pętli asyncio, a notify() - gdy
+    wszystko wstawione wcześniej jest już wykonane.
+    """
+
+    def __init__(self, capacity=256, policy='block', spill_path=None, spill_limit=SPILL_LIMIT):
+        if policy == 'drop-oldest':
+            raise ValueError("zapis na kartę nie może gubić partii (block albo spill)")
+        self._owners = {}       # numer klienta -> (pętla, on_error)
+        self._tokens = itertools.count(1)
+        super().__init__('disk', self._apply, capacity, policy, spill_path, spill_limit)
+
+    def client(self, on_error):
+        """DiskClient z on_error(op, wyjątek) wołanym w bieżącej pętli asyncio."""
+        token = next(self._tokens)
+        self._owners[token] = (asyncio.get_running_loop(), on_error)
+        return DiskClient(self, token)
+
+    def _apply(self, op):
+        owner = None
+        if op[0] == 'owned':
+            owner, op = self._owners.get(op[1]), op[2]
+        kind = op[0]
+        if kind == 'release':
+            self._owners.pop(op[1], None)
+            return
+        if kind == 'notify':
+            if owner:
+                owner[0].call_soon_threadsafe(owner[1], op, None)
+            return
+        start = time.monotonic()
+        try:
+            apply(op)
+        except Exception as e:
+            if owner:
+                owner[0].call_soon_threadsafe(owner[1], op, e)
+            raise
+        METRICS.observe(f'disk_seconds{{op="{kind}"}}', time.monotonic() - start)
+
+
+class DiskClient:
+    """
+    Kolejka DiskWriter jednego właściciela: put(op) jak DiskWriter.put, a
+    nieudana operacja trafia do on_error(op, wyjątek). notify(dane) woła
+    on_error(('notify', dane), None) po wykonaniu wcześniejszych operacji.
+    """
+
+    def __init__(self, disk, token):
+        self.disk = disk
+        self.token = token
+        self.queue = disk.queue
+
+    def put(self, op):
+        self.disk.put(('owned', self.token, op))
+
+    def notify(self, data):
+        self.put(('notify', data))
+
+    def release(self):
+        """Po operacjach wstawionych do tej pory klient znika (bez dalszych powiadomień)."""
+        self.disk.put(('release', self.token))
@@ -0,0 +1,266 @@
+"""
+Nagrywanie i odtwarzanie ruchu z portów szeregowych, do testów i pomiarów
+bez Arduino i modemu.
+
+Plik nagrania (.cap): nagłówek MAGIC, potem rekordy
+
+    <d czas uniksowy> <B kierunek> <I długość> <bajty>
+
+(little-endian; kierunek RX = odebrane z portu, TX = wysłane do portu).
+Nagrywa capture() (osobny proces na wolnym porcie), SerialTransport z
+capture= (podsłuch portu używanego przez merge1) albo from_log(), które
+zamienia istniejące logi CSV na nagranie ramek z oryginalnymi czasami.
+
+Player odtwarza bajty RX w tempie 1x, Nx albo bez czekania (speed=0):
+
+* 'pty'            - pseudoterminal, Player.port to ścieżka do otwarcia,
+* 'socket://h:p'   - serwer TCP, klient otwiera socket://h:p przez pyserial,
+* 'loop://'        - port pyserial w tym samym procesie (Player.serial;
+                     bez deskryptora, więc nie dla pętli asyncio).
+
+    python3 -m pasieka.replay capture /dev/ttyACM0 ul.cap
+    python3 -m pasieka.replay from-log pasieka_logi/*.csv* sezon.cap
+    python3 -m pasieka.replay play sezon.cap --speed max --to socket://127.0.0.1:7777
+"""
+
+import argparse
+import os
+import select
+import socket
+import struct
+import threading
+import time
+import tty
+
+import serial
+
+from .archive import open_log
+from .telemetry import parse_log_line
+
+MAGIC = b'PASIEKA-CAP1\n'
+RECORD = struct.Struct('<dBI')
+RX, TX = 0, 1
+
+
+class CaptureWriter:
+    def __init__(self, path):
+        self._f = open(path, 'ab')
+        if self._f.tell() == 0:
+            self._f.write(MAGIC)
+        self.records = 0
+
+    def write(self, ts, data, direction=RX):
+        self._f.write(RECORD.pack(ts, direction, len(data)) + data)
+        self.records += 1
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_capture(path, direction=RX):
+    """Rekordy (czas, bajty) nagrania w kolejności zapisu; direction=None - oba kierunki."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: to nie jest plik nagrania")
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return      # urwany ostatni rekord (przerwane nagrywanie) pomijamy
+            ts, d, n = RECORD.unpack(head)
+            data = f.read(n)
+            if len(data) < n:
+                return
+            if direction is None or d == direction:
+                yield ts, data
+
+
+def capture(port, baudrate, out_path, duration=None):
+    """Nagrywa bajty z portu do pliku (do Ctrl+C albo przez duration s). Zwraca liczbę rekordów."""
+    ser = serial.serial_for_url(port, baudrate, timeout=0.5)
+    end = None if duration is None else time.monotonic() + duration
+    with CaptureWriter(out_path) as w:
+        try:
+            while end is None or time.monotonic() < end:
+                data = ser.read(ser.in_waiting or 1)
+                if data:
+                    w.write(time.time(), data)
+                    w.flush()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            ser.close()
+        return w.records
+
+
+def from_log(log_paths, out_path, line_end=b'\r\n'):
+    """Logi CSV (także skompresowane) -> nagranie ramek z czasami z logu. Zwraca liczbę rekordów."""
+    with CaptureWriter(out_path) as w:
+        for path in log_paths:
+            with open_log(path) as f:
+                for line in f:
+                    sample = parse_log_line(line)
+                    if sample is not None:
+                        w.write(sample.ts, line.partition(b';')[2].rstrip(b'\r\n') + line_end)
+        return w.records
+
+
+class Player:
+    """
+    Odtwarza rekordy [(czas, bajty)] w osobnym wątku (jak FakeModem).
+    speed: 1.0 = czas rzeczywisty, 60 = minuta na sekundę, 0 = bez czekania.
+    """
+
+    def __init__(self, records, speed=1.0, target='pty', delay=0.0, repeat=1):
+        self.records = records
+        self.speed = speed
+        self.target = target
+        self.delay = delay
+        self.repeat = repeat
+        self.sent_bytes = 0
+        self.sent_records = 0
+        self.done = threading.Event()
+        self.serial = None
+        self._running = False
+        self._thread = None
+        self._close = []
+        if target == 'pty':
+            master, slave = os.openpty()
+            tty.setraw(slave)       # bez echa i zamiany \r -> \n, zanim czytelnik ustawi port
+            self._write = lambda data: os.write(master, data)
+            self._close += [lambda: os.close(master), lambda: os.close(slave)]
+            self.port = os.ttyname(slave)
+        elif target.startswith('socket://'):
+            host, _, port = target[len('socket://'):].rpartition(':')
+            self._server = socket.create_server((host or '127.0.0.1', int(port)))
+            self._close.append(self._server.close)
+            self._write = None      # ustawiane po połączeniu klienta
+            self.port = f'socket://{host or "127.0.0.1"}:{self._server.getsockname()[1]}'
+        elif target == 'loop://':
+            self.serial = serial.serial_for_url('loop://', timeout=0)
+            self._write = self.serial.write
+            self.port = 'loop://'
+        else:
+            raise ValueError(f"nieznany cel odtwarzania: {target}")
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(1)
+        for close in self._close:
+            close()
+
+    def _accept(self):
+        while self._running:
+            ready, _, _ = select.select([self._server], [], [], 0.1)
+            if ready:
+                conn, _ = self._server.accept()
+                self._close.append(conn.close)
+                self._write = conn.sendall
+                return True
+        return False
+
+    def _run(self):
+        try:
+            delay = self.delay
+            if self._write is None:
+                if not self._accept():
+                    return
+                # pyserial po połączeniu czyści bufor wejściowy (reset_input_buffer) - dajmy mu chwilę
+                delay = max(delay, 0.2)
+            if delay:
+                time.sleep(delay)
+            for _ in range(self.repeat):
+                if not self._play():
+                    return
+        except OSError:
+            pass            # klient się rozłączył albo stop()
+        finally:
+            self.done.set()
+
+    def _play(self):
+        start = time.monotonic()
+        t0 = None
+        for ts, data in self.records:
+            if not self._running:
+                return False
+            if t0 is None:
+                t0 = ts
+            if self.speed:
+                wait = start + (ts - t0) / self.speed - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            self._write(data)
+            self.sent_bytes += len(data)
+            self.sent_records += 1
+        return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Nagrywanie i odtwarzanie ruchu z portów szeregowych.")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('capture', help='nagraj bajty z portu')
+    p.add_argument('port')
+    p.add_argument('out')
+    p.add_argument('--baud', type=int, default=115200)
+    p.add_argument('--duration', type=float, help='sekundy (domyślnie do Ctrl+C)')
+    p = sub.add_parser('from-log', help='zamień logi CSV na nagranie')
+    p.add_argument('logs', nargs='+')
+    p.add_argument('out')
+    p = sub.add_parser('play', help='odtwórz nagranie')
+    p.add_argument('capture')
+    p.add_argument('--speed', default='1', help="mnożnik tempa albo 'max'")
+    p.add_argument('--to', default='pty', help="pty albo socket://host:port")
+    p.add_argument('--delay', type=float, default=1.0, help='sekundy na otwarcie portu przez czytelnika')
+    p.add_argument('--repeat', type=int, default=1)
+    p = sub.add_parser('info', help='podsumowanie nagrania')
+    p.add_argument('capture')
+    args = ap.parse_args()
+
+    if args.cmd == 'capture':
+        n = capture(args.port, args.baud, args.out, args.duration)
+        print(f"Nagrano {n} rekordów do {args.out}")
+    elif args.cmd == 'from-log':
+        print(f"Zapisano {from_log(args.logs, args.out)} ramek do {args.out}")
+    elif args.cmd == 'info':
+        n = size = 0
+        first = last = None
+        for ts, data in read_capture(args.capture):
+            n += 1
+            size += len(data)
+            first = ts if first is None else first
+            last = ts
+        span = (last - first) if n else 0
+        print(f"{n} rekordów, {size} B, {span / 3600:.1f} h")
+    else:
+        speed = 0.0 if args.speed == 'max' else float(args.speed)
+        records = list(read_capture(args.capture))
+        player = Player(records, speed, args.to, args.delay, args.repeat)
+        print(f"Odtwarzanie {len(records)} rekordów na {player.port} (tempo {args.speed})")
+        t = time.perf_counter()
+        player.start()
+        try:
+            player.done.wait()
+        except KeyboardInterrupt:
+            pass
+        player.stop()
+        dt = time.perf_counter() - t
+        print(f"Wysłano {player.sent_records} rekordów, {player.sent_bytes} B w {dt:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
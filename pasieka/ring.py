@@ -0,0 +1,76 @@
+"""
+Bufor cykliczny ostatnich pomiarów jednego ula.
+
+Tablica SAMPLE_DTYPE o stałej pojemności jest alokowana raz. Pisze jeden
+pisarz (Hive.write), czytać może dowolnie wielu (komendy SMS, detektor,
+panel), także z innych wątków, bez blokad - jak seqlock:
+
+* pisarz wpisuje wiersz do komórki written % capacity i dopiero potem
+  zwiększa written (publikacja),
+* czytelnik zapamiętuje written, kopiuje wiersze i sprawdza written
+  jeszcze raz; jeśli pisarz zdążył dojść do którejś z kopiowanych komórek,
+  kopia jest powtarzana (najwyżej RETRIES razy, potem czytelnik dostaje
+  tylko nienaruszone, najnowsze wiersze - nigdy nie czeka na pisarza).
+
+latest() to jeden wiersz (O(1)), snapshot(n) - kopia n ostatnich
+wierszy, od najstarszego; bez napisów i bez czytania plików.
+"""
+
+import numpy as np
+
+from .telemetry import SAMPLE_DTYPE, Sample
+
+CAPACITY = 4096         # przy ramce co ~6 s to prawie 7 h
+RETRIES = 3
+
+
+class SampleRing:
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.written = 0        # liczba opublikowanych pomiarów od startu
+        self._data = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def append(self, sample):
+        self._data[self.written % self.capacity] = tuple(sample)
+        self.written += 1       # po wpisaniu wiersza - czytelnik nie zobaczy połowy
+
+    def latest(self):
+        """Ostatni pomiar (telemetry.Sample) albo None."""
+        while True:
+            w = self.written
+            if w == 0:
+                return None
+            row = self._data[(w - 1) % self.capacity].item()
+            if self.written - w < self.capacity - 1:
+                return Sample(*row)
+
+    def snapshot(self, n=None):
+        """
+        Kopia najwyżej n ostatnich pomiarów (domyślnie wszystkich w buforze)
+        jako tablica SAMPLE_DTYPE, od najstarszego.
+        """
+        for _ in range(RETRIES):
+            w = self.written
+            count = min(w, self.capacity) if n is None else min(n, w, self.capacity)
+            lo = w - count
+            start = lo % self.capacity
+            if start + count <= self.capacity:
+                out = self._data[start:start + count].copy()
+            else:
+                out = np.concatenate((self._data[start:], self._data[:start + count - self.capacity]))
+            # pisarz mógł już nadpisać (albo właśnie nadpisuje) komórki pomiarów
+            # starszych niż written - capacity + 1
+            intact = self.written - self.capacity + 1
+            if intact <= lo:
+                return out
+        # pisarz bez przerwy zapełnia bufor (kopia zwalnia GIL): zamiast czekać
+        # bez końca oddajemy nienaruszoną, nowszą część kopii
+        return out[intact - lo:]
+
+    def since(self, t0):
+        """Pomiary z ts >= t0 (tylko te, które są jeszcze w buforze)."""
+        rows = self.snapshot()
+        return rows[np.searchsorted(rows['ts'], t0, 'left'):]
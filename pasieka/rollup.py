@@ -0,0 +1,391 @@
+"""
+Agregaty minutowe, godzinowe i dobowe dla masy, temperatur i wilgotności.
+
+Dla każdego przedziału i każdej wielkości trzymamy liczbę pomiarów (bez
+NaN), min, max, sumę (średnia = suma / liczba), pierwszą i ostatnią
+wartość. Przedziały liczone są w czasie lokalnym (doba od północy).
+
+Rollup.add() aktualizuje otwarte przedziały w O(1); zamknięty przedział
+to jeden wiersz o stałej szerokości dopisywany do rollup/<nazwa>.bin
+(partiami, najwyżej co flush_interval sekund, z fsync). Po restarcie ten
+sam przedział może mieć dwa wiersze - przy odczycie są scalane
+(coalesce()). backfill() liczy te same wiersze z tablicy pomiarów
+wektorowo (reduceat), do odbudowy z historii:
+
+    python3 -m pasieka.rollup pasieka_logi
+
+Po każdej partii rollup/state.json podaje dla każdej rozdzielczości
+długość pliku i czas covered: pomiary wcześniejsze są już w pliku. Po
+zaniku zasilania pliki są przycinane do tej długości, a otwarte przedziały
+i niezapisane wiersze odtwarza restore() z ogona logu (Hive w
+pasieka/ingest.py). Z io= (pasieka/pipeline.DiskWriter) zapisy wykonuje
+wątek zapisu.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from .catalog import Catalog
+from .pipeline import apply
+from .telemetry import FIELDS
+
+METRICS = FIELDS[1:]   # mass, t1, h1, t2, h2
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+STATE_FILE = 'state.json'
+
+_cols = [('start', '<i8')]
+for _m in METRICS:
+    _cols += [(f'{_m}_n', '<u4'), (f'{_m}_min', '<f4'), (f'{_m}_max', '<f4'),
+              (f'{_m}_sum', '<f8'), (f'{_m}_first', '<f4'), (f'{_m}_last', '<f4')]
+ROW_DTYPE = np.dtype(_cols)
+
+
+DAY = 86400
+
+
+def local_midnight(year, month, day):
+    return int(time.mktime((year, month, day, 0, 0, 0, 0, 0, -1)))
+
+
+def bucket_bounds(ts, width):
+    """
+    Początek i koniec (czas uniksowy) przedziału zawierającego ts. Minuty i
+    godziny wyrównujemy do UTC (strefy przesunięte o pełne godziny dają to
+    samo), doba to lokalna północ-północ (23 albo 25 h przy zmianie czasu).
+    """
+    if width < DAY:
+        start = int(ts) // width * width
+        return start, start + width
+    lt = time.localtime(ts)
+    return (local_midnight(lt.tm_year, lt.tm_mon, lt.tm_mday),
+            local_midnight(lt.tm_year, lt.tm_mon, lt.tm_mday + 1))
+
+
+def bucket_starts(ts, width):
+    """Wektorowo: początek przedziału dla każdego ts."""
+    if width < DAY:
+        return ts.astype(np.int64) // width * width
+    # lokalna data: offset strefy liczony raz na godzinę występującą w danych
+    hours, inverse = np.unique(ts.astype(np.int64) // 3600, return_inverse=True)
+    off = np.array([time.localtime(h * 3600).tm_gmtoff for h in hours.tolist()], dtype=np.int64)
+    local_days = (ts.astype(np.int64) + off[inverse]) // DAY
+    days, inverse = np.unique(local_days, return_inverse=True)
+    starts = np.array([local_midnight(*time.gmtime(d * DAY)[:3]) for d in days.tolist()], dtype=np.int64)
+    return starts[inverse]
+
+
+class _Bucket:
+    """Otwarty przedział: akumulatory na zwykłych floatach."""
+    __slots__ = ('start', 'end', 'acc')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        # [n, min, max, sum, first, last] dla każdej wielkości
+        self.acc = [[0, math.inf, -math.inf, 0.0, math.nan, math.nan] for _ in METRICS]
+
+    @classmethod
+    def from_row(cls, row, width):
+        """Otwarty przedział z wiersza ROW_DTYPE (np. z backfill() po restarcie)."""
+        b = cls(*bucket_bounds(int(row['start']), width))
+        for a, m in zip(b.acc, METRICS):
+            n = int(row[f'{m}_n'])
+            if n:
+                a[:] = [n, float(row[f'{m}_min']), float(row[f'{m}_max']), float(row[f'{m}_sum']),
+                        float(row[f'{m}_first']), float(row[f'{m}_last'])]
+        return b
+
+    def add(self, values):
+        for a, v in zip(self.acc, values):
+            if v != v:      # NaN - błąd czujnika, pomijamy
+                continue
+            if a[0] == 0:
+                a[4] = v
+            a[0] += 1
+            if v < a[1]:
+                a[1] = v
+            if v > a[2]:
+                a[2] = v
+            a[3] += v
+            a[5] = v
+
+    def row(self):
+        vals = [self.start]
+        for n, lo, hi, s, first, last in self.acc:
+            if n == 0:
+                lo = hi = math.nan
+            vals += [n, lo, hi, s, first, last]
+        return tuple(vals)
+
+
+def coalesce(rows):
+    """Scala wiersze o tym samym początku przedziału (posortowane po start)."""
+    if len(rows) < 2 or not (rows['start'][1:] == rows['start'][:-1]).any():
+        return rows
+    starts = np.flatnonzero(np.r_[True, rows['start'][1:] != rows['start'][:-1]])
+    out = np.empty(len(starts), dtype=ROW_DTYPE)
+    out['start'] = rows['start'][starts]
+    for m in METRICS:
+        n = rows[f'{m}_n']
+        out[f'{m}_n'] = np.add.reduceat(n, starts)
+        out[f'{m}_min'] = np.fmin.reduceat(rows[f'{m}_min'], starts)
+        out[f'{m}_max'] = np.fmax.reduceat(rows[f'{m}_max'], starts)
+        out[f'{m}_sum'] = np.add.reduceat(rows[f'{m}_sum'], starts)
+        out[f'{m}_first'] = _pick(rows[f'{m}_first'], n > 0, starts, first=True)
+        out[f'{m}_last'] = _pick(rows[f'{m}_last'], n > 0, starts, first=False)
+    return out
+
+
+def _pick(values, valid, starts, first):
+    """Pierwsza/ostatnia ważna wartość w każdej grupie zaczynającej się od starts."""
+    idx = np.arange(len(values))
+    if first:
+        pos = np.minimum.reduceat(np.where(valid, idx, len(values)), starts)
+    else:
+        pos = np.maximum.reduceat(np.where(valid, idx, -1), starts)
+    ok = (pos >= 0) & (pos < len(values))
+    out = np.full(len(starts), np.nan, dtype=np.float32)
+    out[ok] = values[pos[ok]]
+    return out
+
+
+def backfill(samples, width):
+    """Tablica pomiarów (SAMPLE_DTYPE, rosnąco po ts) -> wiersze ROW_DTYPE."""
+    if len(samples) == 0:
+        return np.empty(0, dtype=ROW_DTYPE)
+    keys = bucket_starts(samples['ts'], width)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    out = np.empty(len(starts), dtype=ROW_DTYPE)
+    out['start'] = keys[starts]
+    for m in METRICS:
+        v = samples[m]
+        valid = ~np.isnan(v)
+        out[f'{m}_n'] = np.add.reduceat(valid.astype(np.uint32), starts)
+        with np.errstate(invalid='ignore'):
+            out[f'{m}_min'] = np.fmin.reduceat(v, starts)
+            out[f'{m}_max'] = np.fmax.reduceat(v, starts)
+        out[f'{m}_sum'] = np.add.reduceat(np.where(valid, v, 0).astype(np.float64), starts)
+        out[f'{m}_first'] = _pick(v, valid, starts, first=True)
+        out[f'{m}_last'] = _pick(v, valid, starts, first=False)
+    return out
+
+
+def mean(rows, metric):
+    """Średnie z wierszy (NaN dla przedziałów bez pomiarów)."""
+    n = rows[f'{metric}_n']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, rows[f'{metric}_sum'] / n, np.nan)
+
+
+class Rollup:
+    """
+    Agregaty aktualizowane na bieżąco z potoku pomiarów. covered: {rozdzielczość:
+    czas}, od którego pomiary trzeba odtworzyć po restarcie (restore()).
+    """
+
+    def __init__(self, directory, resolutions=RESOLUTIONS, flush_rows=60, flush_interval=60.0, io=None):
+        self.directory = directory
+        self.resolutions = dict(resolutions)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.io = io            # pasieka/pipeline.DiskWriter albo None (zapis od razu)
+        self.state_path = os.path.join(directory, STATE_FILE)
+        self._open = {name: None for name in self.resolutions}
+        self._closed = {name: [] for name in self.resolutions}
+        self._inflight = {name: [] for name in self.resolutions}    # zlecone io, może jeszcze nie w pliku
+        self._fds = {}
+        self._last_ts = None
+        self._last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        self.covered, self._size = self._recover()
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{name}.bin')
+
+    def _recover(self):
+        """Przycina pliki do długości ze state.json; zwraca (covered, długości plików)."""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        covered, sizes = {}, {}
+        for name, width in self.resolutions.items():
+            path = self.path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            try:
+                cov, keep = state[name]
+            except (KeyError, TypeError, ValueError):
+                cov, keep = None, size      # bez stanu (starsza wersja): cały plik
+            if keep > size:
+                cov, keep = None, size      # plik krótszy niż w stanie - liczymy od ostatniego wiersza
+            keep -= keep % ROW_DTYPE.itemsize
+            if keep < size:
+                # wiersze dopisane po ostatnim stanie (odtworzy je restore()) albo urwany wiersz
+                os.truncate(path, keep)
+            if cov is None:
+                rows = mapped(path)
+                cov = bucket_bounds(int(rows['start'][-1]), width)[1] if len(rows) else 0.0
+            covered[name], sizes[name] = float(cov), keep
+        return covered, sizes
+
+    def _do(self, op):
+        if self.io:
+            self.io.put(op)
+        else:
+            apply(op)
+
+    def restore(self, samples):
+        """
+        Po restarcie: pomiary z ogona logu (SAMPLE_DTYPE, rosnąco) od covered
+        stają się zamkniętymi wierszami do zapisu, a ostatni przedział otwartym.
+        """
+        for name, width in self.resolutions.items():
+            rows = backfill(samples[samples['ts'] >= self.covered[name]], width)
+            if len(rows):
+                self._closed[name].extend(rows[:-1].tolist())
+                self._open[name] = _Bucket.from_row(rows[-1], width)
+        if len(samples):
+            self._last_ts = float(samples['ts'][-1])
+
+    def add(self, sample):
+        """Dodaje telemetry.Sample; O(1) na rozdzielczość."""
+        ts = sample.ts
+        values = sample[1:]
+        for name, width in self.resolutions.items():
+            b = self._open[name]
+            if b is None or not b.start <= ts < b.end:
+                if b is not None:
+                    self._closed[name].append(b.row())
+                b = self._open[name] = _Bucket(*bucket_bounds(ts, width))
+            b.add(values)
+        self._last_ts = ts
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """Zapisuje zamknięte przedziały co flush_rows wierszy albo flush_interval s (wołać też w bezczynności)."""
+        pending = max(map(len, self._closed.values()))
+        if pending and (pending >= self.flush_rows
+                        or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def _unwritten(self, name, on_disk):
+        """Wiersze zlecone wątkowi zapisu, których jeszcze nie ma w pliku (on_disk wierszy)."""
+        inflight = self._inflight[name]
+        missing = self._size[name] // ROW_DTYPE.itemsize - on_disk
+        del inflight[:max(0, len(inflight) - missing)]
+        return inflight
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        written = False
+        for name in self.resolutions:
+            pending = self._closed[name]
+            if pending:
+                data = np.array(pending, dtype=ROW_DTYPE).tobytes()
+                if name not in self._fds:
+                    self._fds[name] = os.open(self.path(name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                if self.io:
+                    self._unwritten(name, os.path.getsize(self.path(name)) // ROW_DTYPE.itemsize)
+                    self._inflight[name].extend(pending)
+                self._do(('write', self._fds[name], data))
+                self._do(('fsync', self._fds[name]))
+                self._size[name] += len(data)
+                pending.clear()
+                written = True
+            b = self._open[name]
+            if b is not None:
+                # wszystko przed otwartym przedziałem jest już w pliku
+                self.covered[name] = max(self.covered[name], float(b.start))
+        if written:
+            # po wierszach (ta sama kolejka io): stan nigdy nie wyprzedza pliku
+            state = {name: [self.covered[name], self._size[name]] for name in self.resolutions}
+            self._do(('replace', self.state_path, json.dumps(state).encode()))
+
+    def close(self):
+        """Zapisuje także otwarte przedziały (po restarcie zostaną scalone przy odczycie)."""
+        for name, b in self._open.items():
+            if b is not None:
+                self._closed[name].append(b.row())
+                self._open[name] = None
+        if self._last_ts is not None:
+            after = math.nextafter(self._last_ts, math.inf)
+            self.covered = {name: max(cov, after) for name, cov in self.covered.items()}
+        self.flush()
+        for fd in self._fds.values():
+            self._do(('close', fd))
+        self._fds = {}
+
+    def current(self, name):
+        """Otwarty przedział jako jeden wiersz ROW_DTYPE (albo pusta tablica)."""
+        b = self._open[name]
+        return np.array([b.row()] if b else [], dtype=ROW_DTYPE)
+
+    def table(self, name, t0=None, t1=None):
+        """
+        Wiersze z dysku + niezapisane + otwarty przedział, dla start w [t0, t1).
+        Plik jest mapowany, więc czytamy tylko wybrany zakres.
+        """
+        on_disk = mapped(self.path(name))
+        rows = select(on_disk, t0, t1)
+        extra = (self._unwritten(name, len(on_disk)) + self._closed[name]
+                 + ([self._open[name].row()] if self._open[name] else []))
+        if extra:
+            extra = select(np.array(extra, dtype=ROW_DTYPE), t0, t1)
+            rows = np.concatenate([rows, extra])
+        return coalesce(rows)
+
+
+def mapped(path):
+    """Plik agregatów jako np.memmap (bez scalania duplikatów)."""
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if size < ROW_DTYPE.itemsize:
+        return np.empty(0, dtype=ROW_DTYPE)
+    return np.memmap(path, dtype=ROW_DTYPE, mode='r', shape=(size // ROW_DTYPE.itemsize,))
+
+
+def load(path):
+    return coalesce(np.array(mapped(path)))
+
+
+def select(rows, t0=None, t1=None):
+    lo = 0 if t0 is None else np.searchsorted(rows['start'], t0, 'left')
+    hi = len(rows) if t1 is None else np.searchsorted(rows['start'], t1, 'left')
+    return rows[lo:hi]
+
+
+def rebuild(directory, samples, resolutions=RESOLUTIONS):
+    """Nadpisuje pliki agregatów wyliczonymi z historii (backfill)."""
+    os.makedirs(directory, exist_ok=True)
+    out = {}
+    covered = math.nextafter(float(samples['ts'][-1]), math.inf) if len(samples) else 0.0
+    state = {}
+    for name, width in resolutions.items():
+        rows = backfill(samples, width)
+        tmp = os.path.join(directory, f'{name}.bin.tmp')
+        rows.tofile(tmp)
+        os.replace(tmp, os.path.join(directory, f'{name}.bin'))
+        out[name] = len(rows)
+        state[name] = [covered, rows.nbytes]
+    apply(('replace', os.path.join(directory, STATE_FILE), json.dumps(state).encode()))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Odbudowa agregatów z historycznych logów.")
+    ap.add_argument('log_dir', nargs='?', default='pasieka_logi')
+    args = ap.parse_args()
+    t = time.perf_counter()
+    samples = Catalog(args.log_dir).read_range()
+    counts = rebuild(os.path.join(args.log_dir, 'rollup'), samples)
+    print(f"{len(samples)} pomiarów -> " + ", ".join(f"{k}: {v}" for k, v in counts.items())
+          + f" ({time.perf_counter() - t:.2f} s)")
+
+
+if __name__ == '__main__':
+    main()
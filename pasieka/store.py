@@ -0,0 +1,204 @@
+"""
+Kolumnowy, binarny magazyn pomiarów (zamiast ciągłego dopisywania CSV).
+
+Segment to katalog NNN_YYYYMMDD.seg/ z jednym plikiem na kolumnę:
+
+    ts.f8  mass.f4  t1.f4  h1.f4  t2.f4  h2.f4
+
+Każdy plik to goła tablica little-endian o stałej szerokości. Zapis
+zbiera wiersze w array.array i dopisuje je partiami (jeden write na
+kolumnę co flush_rows wierszy albo flush_interval sekund), więc karta SD
+dostaje mało dużych zapisów. Odczyt mapuje pliki (np.memmap) i zwraca
+widoki bez kopiowania; po zaniku zasilania długość segmentu to długość
+najkrótszej kolumny, więc niedopisana partia jest po prostu pomijana.
+
+    python3 -m pasieka.store import pasieka_logi/001_20250501.csv
+    python3 -m pasieka.store export pasieka_logi/001_20250501.seg wynik.csv
+"""
+
+import argparse
+import math
+import os
+import time
+from array import array
+
+import numpy as np
+
+from .pipeline import write_all
+from .telemetry import FIELDS, SAMPLE_DTYPE, format_log_line, load_log
+
+SUFFIX = '.seg'
+# typecode array.array dla każdej kolumny (musi zgadzać się z SAMPLE_DTYPE)
+TYPECODES = {name: 'd' if SAMPLE_DTYPE[name].itemsize == 8 else 'f' for name in FIELDS}
+
+
+def column_filename(name):
+    dt = SAMPLE_DTYPE[name]
+    return f"{name}.{dt.kind}{dt.itemsize}"
+
+
+def segment_path(log_path):
+    """pasieka_logi/001_20250501.csv -> pasieka_logi/001_20250501.seg"""
+    return os.path.splitext(log_path)[0] + SUFFIX
+
+
+class SegmentWriter:
+    """Dopisuje pomiary (telemetry.Sample) do segmentu partiami."""
+
+    def __init__(self, path, flush_rows=64, flush_interval=60.0, io=None):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.io = io            # pasieka/pipeline.DiskWriter albo None (zapis od razu)
+        os.makedirs(path, exist_ok=True)
+        self._fds = {name: os.open(os.path.join(path, column_filename(name)),
+                                   os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                     for name in FIELDS}
+        self._cols = {name: array(TYPECODES[name]) for name in FIELDS}
+        self._last_flush = time.monotonic()
+
+    def append(self, sample):
+        for name, value in zip(FIELDS, sample):
+            self._cols[name].append(value)
+        if (len(self._cols['ts']) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def extend(self, samples):
+        """Dopisuje tablicę SAMPLE_DTYPE (np. z telemetry.load_log) jedną partią."""
+        self.flush()
+        for name in FIELDS:
+            self._write(self._fds[name], np.ascontiguousarray(samples[name]).tobytes())
+
+    def _write(self, fd, data):
+        if self.io:
+            self.io.put(('write', fd, data))
+        else:
+            write_all(fd, data)
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._cols['ts']:
+            return
+        # ts na końcu: czytelnik bierze najkrótszą kolumnę, więc wiersz pojawia się w całości
+        for name in FIELDS[1:] + FIELDS[:1]:
+            self._write(self._fds[name], self._cols[name].tobytes())
+            del self._cols[name][:]
+
+    def close(self):
+        self.flush()
+        for fd in self._fds.values():
+            if self.io:
+                self.io.put(('close', fd))
+            else:
+                os.close(fd)
+        self._fds = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Segment:
+    """Segment do odczytu; kolumny to widoki np.memmap (bez kopiowania)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = {}
+        lengths = []
+        for name in FIELDS:
+            fname = os.path.join(path, column_filename(name))
+            size = os.path.getsize(fname) if os.path.exists(fname) else 0
+            lengths.append(size // SAMPLE_DTYPE[name].itemsize)
+        self.length = min(lengths)
+        for name in FIELDS:
+            if self.length == 0:
+                self.columns[name] = np.empty(0, dtype=SAMPLE_DTYPE[name])
+            else:
+                self.columns[name] = np.memmap(os.path.join(path, column_filename(name)),
+                                               dtype=SAMPLE_DTYPE[name], mode='r', shape=(self.length,))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def slice_for(self, t0=None, t1=None):
+        """Zakres wierszy z t0 <= ts < t1 (ts w segmencie jest rosnący)."""
+        ts = self.columns['ts']
+        lo = 0 if t0 is None else int(np.searchsorted(ts, t0, 'left'))
+        hi = self.length if t1 is None else int(np.searchsorted(ts, t1, 'left'))
+        return slice(lo, hi)
+
+    def range(self, t0=None, t1=None):
+        """Widoki kolumn dla t0 <= ts < t1: {nazwa: ndarray}."""
+        sl = self.slice_for(t0, t1)
+        return {name: col[sl] for name, col in self.columns.items()}
+
+    def to_array(self, t0=None, t1=None):
+        """Kopia zakresu jako tablica SAMPLE_DTYPE."""
+        sl = self.slice_for(t0, t1)
+        out = np.empty(sl.stop - sl.start, dtype=SAMPLE_DTYPE)
+        for name, col in self.columns.items():
+            out[name] = col[sl]
+        return out
+
+
+def list_segments(log_dir):
+    """Ścieżki segmentów w katalogu, posortowane po numerze sekwencji."""
+    return sorted(os.path.join(log_dir, f) for f in os.listdir(log_dir) if f.endswith(SUFFIX))
+
+
+def read_range(paths, t0=None, t1=None):
+    """Pomiary z t0 <= ts < t1 ze wszystkich podanych segmentów (jedna tablica)."""
+    parts = [Segment(p).to_array(t0, t1) for p in paths]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=SAMPLE_DTYPE)
+
+
+def _fmt(value, digits):
+    return 'nan' if math.isnan(value) else f"{value:.{digits}f}"
+
+
+def export_csv(seg_path, out_path):
+    """Zapisuje segment w układzie logu CSV (ramka jak z MAIN.ino). Zwraca liczbę wierszy."""
+    seg = Segment(seg_path)
+    with open(out_path, 'w') as out:
+        for ts, mass, t1, h1, t2, h2 in zip(*(seg[name].tolist() for name in FIELDS)):
+            frame = (f"{_fmt(mass, 3)}kg {_fmt(t1, 1)}C {_fmt(h1, 1)}% "
+                     f"{_fmt(t2, 1)}C {_fmt(h2, 1)}%")
+            out.write(format_log_line(ts, frame))
+    return len(seg)
+
+
+def import_csv(log_path, seg_path=None):
+    """Zamienia istniejący log CSV na segment. Zwraca (ścieżka, liczba wierszy)."""
+    seg_path = seg_path or segment_path(log_path)
+    samples = load_log(log_path)
+    with SegmentWriter(seg_path) as w:
+        w.extend(samples)
+    return seg_path, len(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Konwersja między logiem CSV a segmentem binarnym.")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('import', help='CSV -> segment')
+    p.add_argument('csv')
+    p.add_argument('seg', nargs='?')
+    p = sub.add_parser('export', help='segment -> CSV')
+    p.add_argument('seg')
+    p.add_argument('csv')
+    args = ap.parse_args()
+    if args.cmd == 'import':
+        path, n = import_csv(args.csv, args.seg)
+        print(f"Zapisano {n} pomiarów do {path}")
+    else:
+        n = export_csv(args.seg, args.csv)
+        print(f"Zapisano {n} pomiarów do {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Parsowanie ramek telemetrii z odbiornika (UNO) do typowanych rekordów.
+
+Obsługiwane układy ramek (z dowolnym prefiksem, np. "Odebrano: "):
+
+    M:12.345kg T1:21.0C H1:55.0% T2:22.0C H2:60.0%    (sscanf w Odbiiornik_dane)
+    12.345kg 21.0C 55.0% 22.0C 60.0%                   (MAIN.ino)
+
+Przed ramką może stać identyfikator ula, np. "UL:2 12.345kg ..." albo
+"HIVE#2 ..." (parse_hive()); bez niego ul wynika z portu, z którego
+przyszła linia. Błąd DHT (Arduino wypisuje "nan") daje NaN. Linia logu to
+"<YYYY-mm-dd HH:MM:SS>;<ramka>", jak w PI_logger.py. Parser działa na
+bajtach prekompilowanym wyrażeniem, a load_log() zamienia cały plik na
+tablicę NumPy w jednym przebiegu, bez pętli po liniach w Pythonie.
+"""
+
+import math
+import re
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+NAN = math.nan
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_NUM = rb'([-+]?(?:\d+\.?\d*|\.\d+)|nan|inf)'
+FRAME_PATTERN = (rb'(?:M:)?' + _NUM + rb'\s*kg\s+(?:T1:)?' + _NUM + rb'\s*C\s+(?:H1:)?' + _NUM
+                 + rb'\s*%\s+(?:T2:)?' + _NUM + rb'\s*C\s+(?:H2:)?' + _NUM + rb'\s*%')
+FRAME_RE = re.compile(FRAME_PATTERN, re.I)
+HIVE_RE = re.compile(rb'\b(?:UL|HIVE)[:#]\s*(\w+)', re.I)
+# Cała linia logu: znacznik czasu Pi, średnik, ramka gdzieś dalej w linii
+LOG_RE = re.compile(rb'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d);[^\n]*?' + FRAME_PATTERN, re.I | re.M)
+
+# Układ rekordu w tablicach NumPy (i w plikach binarnych)
+SAMPLE_DTYPE = np.dtype([('ts', '<f8'), ('mass', '<f4'),
+                         ('t1', '<f4'), ('h1', '<f4'), ('t2', '<f4'), ('h2', '<f4')])
+FIELDS = SAMPLE_DTYPE.names
+
+
+class Sample(NamedTuple):
+    """Jeden pomiar z ula."""
+    ts: float       # czas uniksowy [s]
+    mass: float     # [kg]
+    t1: float       # [°C], NaN gdy DHT1 nie odpowiedział
+    h1: float       # [%]
+    t2: float
+    h2: float
+
+
+def parse_frame(raw, ts=None):
+    """Ramka (bytes) -> Sample albo None, gdy linia nie jest ramką pomiaru."""
+    m = FRAME_RE.search(raw)
+    if m is None:
+        return None
+    mass, t1, h1, t2, h2 = map(float, m.groups())
+    return Sample(time.time() if ts is None else ts, mass, t1, h1, t2, h2)
+
+
+def parse_hive(raw):
+    """Identyfikator ula z linii (str) albo None, gdy linia go nie zawiera."""
+    m = HIVE_RE.search(raw)
+    return m.group(1).decode('ascii', errors='replace') if m else None
+
+
+def parse_timestamp(text):
+    """b'2025-05-01 12:00:00' (czas lokalny) -> czas uniksowy."""
+    return time.mktime((int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                        int(text[11:13]), int(text[14:16]), int(text[17:19]), 0, 0, -1))
+
+
+def format_timestamp(ts):
+    return time.strftime(TS_FORMAT, time.localtime(ts))
+
+
+def parse_log_line(line):
+    """Linia logu "<czas>;<ramka>" -> Sample albo None."""
+    ts_text, sep, raw = line.partition(b';')
+    if not sep or len(ts_text) != 19:
+        return None
+    try:
+        ts = parse_timestamp(ts_text)
+    except ValueError:
+        return None
+    return parse_frame(raw, ts)
+
+
+def format_log_line(ts, raw):
+    """Linia logu w układzie PI_logger.py: "<czas>;<ramka>\\n"."""
+    return f"{format_timestamp(ts)};{raw}\n"
+
+
+def local_to_epoch(naive):
+    """
+    Sekundy "czasu lokalnego traktowanego jak UTC" -> czas uniksowy.
+    Przesunięcie strefy liczymy raz na każdą godzinę występującą w danych.
+    """
+    hours, inverse = np.unique(naive // 3600, return_inverse=True)
+    offsets = np.array([h * 3600 - time.mktime(time.gmtime(h * 3600)[:8] + (-1,))
+                        for h in hours.tolist()])
+    return naive - offsets[inverse]
+
+
+def parse_log(data):
+    """Zawartość logu (bytes) -> tablica SAMPLE_DTYPE; linie bez ramki są pomijane."""
+    groups = LOG_RE.findall(data)
+    out = np.empty(len(groups), dtype=SAMPLE_DTYPE)
+    if not groups:
+        return out
+    cols = np.array(groups)
+    naive = cols[:, 0].astype('datetime64[s]').astype(np.int64)
+    out['ts'] = local_to_epoch(naive)
+    values = cols[:, 1:].astype(np.float32)
+    for i, name in enumerate(FIELDS[1:]):
+        out[name] = values[:, i]
+    return out
+
+
+def load_log(path):
+    """Cały plik logu (CSV) -> tablica SAMPLE_DTYPE, w jednym przebiegu."""
+    with open(path, 'rb') as f:
+        return parse_log(f.read())
@@ -0,0 +1,582 @@
+"""
+Wysyłka pomiarów na serwer przez GPRS modemu SIM868 (store-and-forward).
+
+Każdy zapisany pomiar trafia też do kolejki na karcie (Spool: plik
+rekordów o stałej długości + stan z potwierdzonym numerem rekordu), więc
+brak zasięgu, restart Pi czy wyłączony serwer niczego nie gubią (zanik
+zasilania - najwyżej ostatnią niezapisaną partię, jak w logu CSV). Co
+interval sekund (domyślnie raz na godzinę) Uplink bierze niepotwierdzone
+rekordy partiami i wysyła je jednym żądaniem HTTP POST na partię:
+
+    AT+SAPBR=3,1,"CONTYPE","GPRS"; AT+SAPBR=3,1,"APN",...; AT+SAPBR=1,1
+    AT+HTTPINIT; AT+HTTPPARA="URL",...; AT+HTTPDATA=<B>,<ms> + bajty
+    AT+HTTPACTION=1 -> URC +HTTPACTION: 1,200,<B>; AT+HTTPREAD; AT+HTTPTERM
+
+Partia (encode_batch()) to gzip z nagłówkiem JSON w pierwszej linii i
+kolumnami per ul: wartości skalowane do liczb całkowitych (czas w 0.1 s,
+masa w g, reszta w 0.1 - jak w pasieka/frame.py) i zapisane jako różnice
+kolejnych wierszy (int32), plus maska brakujących odczytów. Godzina
+pomiarów co 6 s to około 2 KB zamiast 600 SMS-ów.
+
+Wznawianie: nagłówek niesie numery rekordów [start, end), serwer
+odpowiada {"ack": N} - ile rekordów tej stacji ma u siebie. Rekordy
+poniżej N są zwalniane z kolejki; powtórzona partia (np. odpowiedź nie
+doszła) jest przez serwer przycinana, a luka (serwer stracił dane)
+kończy się kodem 409 i wysyłką od jego N, jeśli rekordy są jeszcze w
+kolejce.
+
+Serwer odbiorczy (np. na komputerze w domu) zapisuje pomiary jako
+segmenty pasieka/store.py, po jednym na stację i ul:
+
+    python3 -m pasieka.uplink serve --port 8080 --dir odebrane
+    python3 -m pasieka.uplink show pasieka_logi/uplink   # stan kolejki na Pi
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .frame import MASS_SCALE, SCALE
+from .metrics import METRICS
+from .pipeline import apply
+from .store import SegmentWriter
+from .telemetry import FIELDS, SAMPLE_DTYPE
+
+FORMAT = 1
+HIVE_LEN = 16
+SPOOL_DTYPE = np.dtype([('hive', f'S{HIVE_LEN}')] + SAMPLE_DTYPE.descr)
+SCALES = {'ts': 10, 'mass': MASS_SCALE, 't1': SCALE, 'h1': SCALE, 't2': SCALE, 'h2': SCALE}
+MAX_DELTA = 2 ** 31 - 1
+COMPACT_ROWS = 10000    # tyle potwierdzonych rekordów na początku pliku -> plik od nowa
+SPOOL_RE = re.compile(r'^spool_(\d+)\.bin$')
+BATCH_ROWS = 5000       # ~20 KB skompresowane; AT+HTTPDATA przyjmuje do ~300 KB
+HTTPACTION_TIMEOUT = 120.0
+BEARER_TIMEOUT = 85.0   # najdłuższe zestawianie kontekstu GPRS w SIM868
+BEARER_POLL = 2.0       # co tyle s pytamy AT+SAPBR=2,1 o stan kontekstu
+SAPBR_STATE_RE = re.compile(r'^\+SAPBR: 1,(\d)')
+CONTENT_TYPE = 'application/octet-stream'
+
+
+# --- format partii ---
+
+def encode_batch(records, start, station, oldest=None):
+    """
+    Rekordy SPOOL_DTYPE o numerach [start, start + len) -> bajty partii.
+    oldest - najstarszy rekord, który nadawca jeszcze ma (dla serwera po utracie danych).
+    """
+    names, first_row, order = np.unique(records['hive'], return_index=True, return_inverse=True)
+    if len(names) > 255:
+        raise ValueError("więcej niż 255 uli w partii")
+    # numery uli w kolejności pierwszego wystąpienia; kolumna order odtwarza kolejność rekordów
+    rank = np.empty(len(names), dtype=np.uint8)
+    rank[np.argsort(first_row)] = np.arange(len(names))
+    order = rank[order]
+    hives, body = [], [order.tobytes()]
+    for i, name in enumerate(names[np.argsort(first_row)]):
+        rows = records[order == i]
+        first = []
+        for col in FIELDS:
+            values = rows[col].astype(np.float64)
+            missing = np.isnan(values)
+            q = np.round(np.where(missing, 0, values) * SCALES[col]).astype(np.int64)
+            if missing.any():
+                # brak odczytu powtarza poprzednią wartość - różnica 0 zamiast skoku
+                q = q[np.maximum.accumulate(np.where(missing, 0, np.arange(len(q))))]
+            delta = np.diff(q, prepend=q[:1])
+            if np.abs(delta).max() > MAX_DELTA:
+                raise ValueError(f"różnica {col} poza zakresem int32")
+            first.append(int(q[0]))
+            body += [delta.astype('<i4').tobytes(), np.packbits(missing).tobytes()]
+        hives.append({'id': name.decode('utf-8', errors='replace'), 'rows': len(rows), 'first': first})
+    header = {'v': FORMAT, 'station': station, 'start': start, 'end': start + len(records),
+              'oldest': start if oldest is None else oldest, 'hives': hives}
+    return gzip.compress(json.dumps(header).encode() + b'\n' + b''.join(body), 6)
+
+
+def decode_batch(data):
+    """Bajty partii -> (nagłówek, rekordy SPOOL_DTYPE w kolejności nadawcy); ValueError przy złym formacie."""
+    try:
+        raw = gzip.decompress(data)
+        line, _, body = raw.partition(b'\n')
+        header = json.loads(line)
+        if header.get('v') != FORMAT:
+            raise ValueError(f"nieznana wersja partii: {header.get('v')}")
+        total = header['end'] - header['start']
+        order = np.frombuffer(body, np.uint8, total)
+        out = np.empty(total, dtype=SPOOL_DTYPE)
+        pos = total
+        for i, hive in enumerate(header['hives']):
+            n = hive['rows']
+            mask_len = (n + 7) // 8
+            at = np.flatnonzero(order == i)
+            if len(at) != n:
+                raise ValueError("liczba rekordów ula nie zgadza się z nagłówkiem")
+            out['hive'][at] = hive['id'].encode()[:HIVE_LEN]
+            for col, first in zip(FIELDS, hive['first']):
+                delta = np.frombuffer(body, '<i4', n, pos)
+                missing = np.unpackbits(np.frombuffer(body, np.uint8, mask_len, pos + 4 * n))[:n].astype(bool)
+                pos += 4 * n + mask_len
+                values = (first + np.cumsum(delta, dtype=np.int64)) / SCALES[col]
+                out[col][at] = np.where(missing, np.nan, values)
+    except (OSError, EOFError, ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"uszkodzona partia: {e}") from None
+    return header, out
+
+
+# --- kolejka na karcie ---
+
+class Spool:
+    """
+    Kolejka rekordów SPOOL_DTYPE na karcie. Numery rekordów rosną od
+    pierwszego uruchomienia; plik spool_<base>.bin zaczyna się od rekordu
+    base (numer w nazwie - plik i numeracja zmieniają się jednym rename),
+    a state.json trzyma liczbę potwierdzonych rekordów (acked).
+    Potwierdzony początek jest wycinany co compact_rows rekordów.
+
+    Rekordy czekają w pamięci i trafiają do pliku jednym write() co
+    flush_rows rekordów albo flush_interval sekund, jak w SegmentWriter.
+    Z io= (pasieka/pipeline.DiskWriter) zapisy, stan i wycinanie wykonuje
+    wątek zapisu; read() widzi wtedy tylko rekordy już dopisane do pliku.
+    """
+
+    def __init__(self, directory, compact_rows=COMPACT_ROWS, flush_rows=64, flush_interval=60.0, io=None):
+        self.directory = directory
+        self.compact_rows = compact_rows
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.io = io            # pasieka/pipeline.DiskWriter albo None (zapis od razu)
+        os.makedirs(directory, exist_ok=True)
+        self.state_path = os.path.join(directory, 'state.json')
+        self.acked = 0
+        self._row = np.zeros(1, dtype=SPOOL_DTYPE)
+        self._batch = bytearray()
+        self._last_flush = time.monotonic()
+        try:
+            with open(self.state_path) as f:
+                self.acked = json.load(f)['acked']
+        except (OSError, ValueError, KeyError):
+            pass
+        bases = sorted(int(m.group(1)) for name in os.listdir(directory) if (m := SPOOL_RE.match(name)))
+        for old in bases[:-1]:
+            os.remove(self._path(old))      # przerwane wycinanie: nowszy plik jest kompletny
+        self.base = bases[-1] if bases else self.acked
+        self._open()
+        if self.total < self.acked:
+            # plik zginął (np. ręcznie usunięty) - nowa numeracja od acked, żeby serwer nie wziął
+            # nowych rekordów za powtórzone
+            self._replace(self.acked, b'')
+
+    def _path(self, base):
+        return os.path.join(self.directory, f'spool_{base}.bin')
+
+    def _open(self):
+        self.path = self._path(self.base)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size % SPOOL_DTYPE.itemsize:
+            # urwany ostatni rekord (zanik zasilania w trakcie zapisu)
+            size -= size % SPOOL_DTYPE.itemsize
+            os.ftruncate(self._fd, size)
+        self.total = self.base + size // SPOOL_DTYPE.itemsize
+
+    def _do(self, op):
+        if self.io:
+            self.io.put(op)
+        else:
+            apply(op)
+
+    def _replace(self, base, data):
+        """Nowy plik od rekordu base z data; stary usuwany dopiero po rename."""
+        path = self._path(base)
+        tmp = path + '.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_TRUNC, 0o644)
+        if data:
+            self._do(('write', fd, data))
+        # deskryptor zostaje ważny po rename - kolejne rekordy idą już do nowego pliku
+        self._do(('rename', tmp, path))
+        self._do(('close', self._fd))
+        if path != self.path:
+            self._do(('remove', self.path))
+        self._fd, self.path, self.base = fd, path, base
+        self.total = base + len(data) // SPOOL_DTYPE.itemsize
+
+    def __len__(self):
+        """Rekordy czekające na potwierdzenie."""
+        return self.total - self.acked
+
+    def append(self, hive, sample):
+        row = self._row
+        row['hive'] = hive.encode()[:HIVE_LEN]
+        for name, value in zip(FIELDS, sample):
+            row[name] = value
+        self._batch += row.tobytes()
+        self.total += 1
+        if (len(self._batch) >= self.flush_rows * SPOOL_DTYPE.itemsize
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if self._batch:
+            self._do(('write', self._fd, bytes(self._batch)))
+            self._batch.clear()
+
+    def read(self, start, limit=BATCH_ROWS):
+        """
+        Rekordy od numeru start (nie starsze niż base), najwyżej limit. Z io=
+        może ich być mniej: reszta czeka jeszcze w kolejce wątku zapisu.
+        """
+        self.flush()
+        start = max(start, self.base)
+        n = max(0, min(limit, self.total - start))
+        data = b''
+        if n:
+            try:
+                with open(self.path, 'rb') as f:
+                    f.seek((start - self.base) * SPOOL_DTYPE.itemsize)
+                    data = f.read(n * SPOOL_DTYPE.itemsize)
+            except FileNotFoundError:
+                pass        # nowy plik po wycinaniu jeszcze w kolejce wątku zapisu
+        return start, np.frombuffer(data, dtype=SPOOL_DTYPE, count=len(data) // SPOOL_DTYPE.itemsize)
+
+    def ack(self, n):
+        """Serwer ma rekordy do numeru n."""
+        self.acked = max(self.base, min(n, self.total))
+        self._do(('replace', self.state_path, json.dumps({'acked': self.acked}).encode()))
+        if self.acked > self.base and (self.acked - self.base >= self.compact_rows or self.acked == self.total):
+            start, tail = self.read(self.acked, self.total - self.acked)
+            # reszta jeszcze w drodze na kartę: wycinanie przy następnym ack
+            if start + len(tail) == self.total:
+                self._replace(self.acked, tail.tobytes())
+
+    def close(self):
+        if self._fd is None:
+            return
+        self.flush()
+        self._do(('close', self._fd))
+        self._fd = None
+
+
+# --- wysyłka ---
+
+class UplinkError(Exception):
+    pass
+
+
+def parse_httpaction(value):
+    """'1,200,15' -> (status, długość odpowiedzi)."""
+    parts = value.split(',')
+    try:
+        return int(parts[1]), int(parts[2])
+    except (IndexError, ValueError):
+        return None, 0
+
+
+class Uplink:
+    """
+    modem: AsyncATEngine (attach() po połączeniu, jak outbox.Outbox);
+    handler URC: modem.on('+HTTPACTION', uplink.on_httpaction); io: DiskWriter
+    dla kolejki (Spool), jak w Ingest.
+    """
+
+    def __init__(self, directory, url, station='pasieka', apn='internet', interval=3600.0,
+                 batch_rows=BATCH_ROWS, retry_delay=60.0, keep_bearer=False, modem=None,
+                 clock=time.monotonic, io=None):
+        self.spool = Spool(directory, io=io)
+        self.url = url
+        self.station = station
+        self.apn = apn
+        self.interval = interval
+        self.batch_rows = batch_rows
+        self.retry_delay = retry_delay
+        self.keep_bearer = keep_bearer      # False: kontekst GPRS zamykany po wysyłce (mniej prądu)
+        self.modem = modem
+        self.clock = clock
+        self.failures = 0                   # kolejne nieudane wysyłki, do odstępu ponowień
+        self.last_success = None
+        self.counts = {'batches': 0, 'records': 0, 'bytes': 0, 'failed': 0, 'resent': 0}
+        self._action = None                 # future na URC +HTTPACTION
+        self._wakeup = asyncio.Event()
+
+    def attach(self, modem):
+        self.modem = modem
+        if self._action is not None and not self._action.done():
+            # wysyłka czeka na +HTTPACTION ze starego portu - nie przyjdzie
+            self._action.set_exception(UplinkError("modem odłączony"))
+        self._wakeup.set()
+
+    def add(self, hive, sample):
+        """Pomiar zapisany przez Ingest (on_sample) - do kolejki."""
+        self.spool.append(hive, sample)
+
+    def flush_now(self):
+        """Wysyłka bez czekania na interval (np. komenda SMS)."""
+        self._wakeup.set()
+
+    async def run(self):
+        """Zadanie wysyłki; działa do anulowania."""
+        try:
+            # pierwsza wysyłka zaraz po starcie - zaległości z czasu, gdy Pi było wyłączone
+            wait = 0.0
+            while True:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                if self.modem is None or not len(self.spool):
+                    wait = self.interval
+                    continue
+                try:
+                    await self.upload()
+                    self.failures = 0
+                    wait = self.interval
+                except UplinkError as e:
+                    self.failures += 1
+                    self.counts['failed'] += 1
+                    wait = min(self.interval, self.retry_delay * 2 ** (self.failures - 1))
+                    print(f"Wysyłka pomiarów nieudana ({e}), ponowienie za {wait:.0f} s, "
+                          f"w kolejce {len(self.spool)} pomiarów")
+        finally:
+            self.spool.close()
+
+    async def upload(self):
+        """Wysyła wszystkie niepotwierdzone rekordy; UplinkError przy błędzie (kolejka zostaje)."""
+        start_time = self.clock()
+        m = self.modem      # attach(None) w trakcie wysyłki kończy ją UplinkError (_command)
+        await self._open_bearer(m)
+        try:
+            sent = 0
+            end = self.spool.total      # pomiary dopisane w trakcie wysyłki poczekają na następną
+            while self.spool.acked < end:
+                start, records = self.spool.read(self.spool.acked, min(self.batch_rows, end - self.spool.acked))
+                if not len(records):
+                    break       # reszta jeszcze w kolejce zapisu na kartę - w następnej wysyłce
+                data = encode_batch(records, start, self.station, self.spool.base)
+                status, body = await self._post(m, data)
+                try:
+                    ack = int(json.loads(body)['ack'])
+                except (ValueError, KeyError, TypeError):
+                    raise UplinkError(f"HTTP {status}, odpowiedź bez ack: {body[:60]!r}") from None
+                if status == 409:
+                    # serwer ma mniej, niż myślimy - od jego ack (jeśli jeszcze mamy te rekordy)
+                    self.counts['resent'] += 1
+                    print(f"Serwer potwierdza {ack} pomiarów, wysyłka od nowa od tego miejsca")
+                    self.spool.acked = max(self.spool.base, min(ack, self.spool.acked))
+                    continue
+                if status != 200:
+                    raise UplinkError(f"HTTP {status}")
+                if ack <= start:
+                    raise UplinkError(f"serwer nie przyjął partii (ack {ack})")
+                self.spool.ack(ack)
+                sent += ack - start
+                self.counts['batches'] += 1
+                self.counts['records'] += ack - start
+                self.counts['bytes'] += len(data)
+        finally:
+            if not self.keep_bearer:
+                try:
+                    await self._command(m, 'AT+SAPBR=0,1', timeout=10)
+                except UplinkError:
+                    pass        # modem odłączony: kontekst zamknie restart modemu
+        self.last_success = self.clock()
+        METRICS.observe('uplink_seconds', self.last_success - start_time)
+        print(f"Wysłano {sent} pomiarów na serwer w {self.last_success - start_time:.1f} s")
+
+    def _check(self, m):
+        """UplinkError, gdy modem odłączono (attach) albo jego port jest zamknięty."""
+        if m is None or self.modem is not m or m.transport.is_closing():
+            raise UplinkError("modem odłączony")
+
+    async def _command(self, m, cmd, timeout=None):
+        self._check(m)
+        resp = await m.command(cmd, timeout)
+        self._check(m)
+        return resp
+
+    async def _bearer_state(self, m):
+        """Stan kontekstu z AT+SAPBR=2,1: 0 łączenie, 1 otwarty, 2 zamykanie, 3 zamknięty; None bez odpowiedzi."""
+        resp = await self._command(m, 'AT+SAPBR=2,1')
+        for line in resp.lines:
+            if m := SAPBR_STATE_RE.match(line):
+                return int(m.group(1))
+        return None
+
+    async def _open_bearer(self, m):
+        if await self._bearer_state(m) == 1:
+            return      # kontekst już otwarty
+        for cmd in ('AT+SAPBR=3,1,"CONTYPE","GPRS"', f'AT+SAPBR=3,1,"APN","{self.apn}"'):
+            await self._command(m, cmd)
+        # zestawienie połączenia GPRS potrafi trwać kilkadziesiąt sekund: nie trzymamy
+        # modemu przez cały ten czas, tylko pytamy o stan krótkimi komendami - między
+        # nimi odpowiedzi SMS i alarmy (outbox) dostają modem bez czekania
+        resp = await self._command(m, 'AT+SAPBR=1,1', timeout=BEARER_POLL)
+        if resp.ok:
+            return
+        if resp.final is not None:
+            raise UplinkError(f"brak połączenia GPRS ({resp.final})")
+        for _ in range(int(BEARER_TIMEOUT / BEARER_POLL)):
+            await asyncio.sleep(BEARER_POLL)
+            state = await self._bearer_state(m)
+            if state == 1:
+                return
+            if state in (2, 3):
+                raise UplinkError("brak połączenia GPRS (kontekst zamknięty)")
+        raise UplinkError("brak połączenia GPRS (brak odpowiedzi)")
+
+    async def _post(self, m, data):
+        """POST partii przez AT+HTTP...; zwraca (status, treść odpowiedzi)."""
+        await self._command(m, 'AT+HTTPTERM')      # sesja z przerwanej wysyłki blokowałaby HTTPINIT
+        if not (await self._command(m, 'AT+HTTPINIT')).ok:
+            raise UplinkError("AT+HTTPINIT")
+        try:
+            for name, value in (('CID', '1'), ('URL', self.url), ('CONTENT', CONTENT_TYPE)):
+                if not (await self._command(m, f'AT+HTTPPARA="{name}","{value}"')).ok:
+                    raise UplinkError(f"AT+HTTPPARA {name}")
+            self._check(m)
+            resp = await m.send_data(f'AT+HTTPDATA={len(data)},10000', data)
+            if not resp.ok:
+                raise UplinkError(f"AT+HTTPDATA ({resp.final or 'brak odpowiedzi'})")
+            self._action = asyncio.get_running_loop().create_future()
+            if not (await self._command(m, 'AT+HTTPACTION=1')).ok:
+                raise UplinkError("AT+HTTPACTION")
+            try:
+                status, length = await asyncio.wait_for(self._action, HTTPACTION_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise UplinkError("brak +HTTPACTION") from None
+            if status is None or status >= 600:
+                raise UplinkError(f"błąd sieci {status}")     # 60x - kody SIM868, nie HTTP
+            body = ''
+            if length:
+                resp = await self._command(m, 'AT+HTTPREAD', timeout=10)
+                body = '\n'.join(line for line in resp.lines if not line.startswith('+HTTPREAD'))
+            return status, body
+        finally:
+            self._action = None
+            try:
+                await self._command(m, 'AT+HTTPTERM')
+            except UplinkError:
+                pass
+
+    async def on_httpaction(self, urc):
+        """Handler URC +HTTPACTION: <metoda>,<status>,<długość>."""
+        if self._action is not None and not self._action.done():
+            self._action.set_result(parse_httpaction(urc.value))
+
+    def metrics(self):
+        out = {f'uplink_{name}_total': n for name, n in self.counts.items()}
+        out['uplink_pending_records'] = len(self.spool)
+        if self.last_success is not None:
+            out['uplink_last_success_age_seconds'] = round(self.clock() - self.last_success)
+        return out
+
+
+# --- serwer odbiorczy ---
+
+class Receiver:
+    """
+    Przyjmuje partie (handle()) i zapisuje pomiary do
+    directory/<stacja>/<ul>.seg; ack.json pamięta, ile rekordów każdej
+    stacji już jest.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.acks = {}
+        self._path = os.path.join(directory, 'ack.json')
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self._path) as f:
+                self.acks = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def handle(self, data):
+        """Bajty partii -> (status HTTP, odpowiedź)."""
+        try:
+            header, records = decode_batch(data)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        station = os.path.basename(str(header.get('station'))) or 'pasieka'
+        start, end = header['start'], header['end']
+        with self._lock:
+            ack = self.acks.get(station, 0)
+            if start > max(ack, header.get('oldest', start)):
+                return 409, {'ack': ack}    # luka, a nadawca ma jeszcze starsze rekordy
+            if end > ack:
+                # powtórzona partia (odpowiedź nie doszła) - tylko rekordy od ack
+                self._store(station, records[max(ack - start, 0):])
+                self.acks[station] = end
+                self._save()
+            return 200, {'ack': self.acks[station]}
+
+    def _store(self, station, records):
+        for name in np.unique(records['hive']):
+            hive = os.path.basename(name.decode('utf-8', errors='replace')) or 'main'
+            rows = records[records['hive'] == name]
+            with SegmentWriter(os.path.join(self.directory, station, f'{hive}.seg')) as w:
+                w.extend(rows[list(FIELDS)])
+            print(f"{station}/{hive}: {len(rows)} pomiarów")
+
+    def _save(self):
+        tmp = self._path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.acks, f)
+        os.replace(tmp, self._path)
+
+    def serve(self, host='0.0.0.0', port=8080):
+        """Serwer HTTP przyjmujący POST z partią (adres dowolny); zwraca ThreadingHTTPServer."""
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, reply = receiver.handle(data)
+                body = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Wysyłka pomiarów przez GPRS: serwer odbiorczy i stan kolejki.")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('serve', help='serwer przyjmujący partie')
+    p.add_argument('--host', default='0.0.0.0')
+    p.add_argument('--port', type=int, default=8080)
+    p.add_argument('--dir', default='odebrane')
+    p = sub.add_parser('show', help='stan kolejki na Pi')
+    p.add_argument('directory')
+    args = ap.parse_args()
+    if args.cmd == 'serve':
+        server = Receiver(args.dir).serve(args.host, args.port)
+        print(f"Odbiór partii na {args.host}:{args.port}, zapis do {args.dir}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+    else:
+        spool = Spool(args.directory)
+        print(f"{spool.total} rekordów, potwierdzone {spool.acked}, w kolejce {len(spool)}")
+        spool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@ import serial
 import time
 import re
 
+from pasieka.modem import ATEngine
+
 # ---- KONFIGURACJA ----
 SERIAL_PORT = '/dev/ttyAMA0'  # lub '/dev/serial0', '/dev/ttyS0' – dostosuj
 BAUDRATE = 115200
@@ -11,25 +13,13 @@ TRIGGER_TEXT = 'status'
 REPLY_TEXT = 'hello'
 
 
-def send_at(cmd, ser, timeout=2):
-    """Wyślij komendę AT i zwróć odpowiedź jako listę linii."""
-    ser.write((cmd + '\r').encode())
-    time.sleep(timeout)
-    lines = []
-    while ser.in_waiting:
-        line = ser.readline().decode(errors='ignore').strip()
-        if line:
-            lines.append(line)
-    return lines
-
-
-def init_modem(ser):
+def init_modem(modem):
     """Ustaw modem w tryb tekstowego SMS."""
-    send_at('AT', ser)
-    send_at('ATE0', ser)             # wyłącz echo
-    send_at('AT+CMGF=1', ser)        # SMS Text Mode
-    send_at('AT+CSCS="GSM"', ser)    # charset
-    # opcjonalnie: send_at('AT+CNMI=2,1,0,0,0', ser)  # powiadomienia o nowych SMS
+    modem.command('AT')
+    modem.command('ATE0')             # wyłącz echo
+    modem.command('AT+CMGF=1')        # SMS Text Mode
+    modem.command('AT+CSCS="GSM"')    # charset
+    # opcjonalnie: modem.command('AT+CNMI=2,1,0,0,0')  # powiadomienia o nowych SMS
 
 
 def parse_cmgl(lines):
@@ -62,35 +52,29 @@ def parse_cmgl(lines):
     return messages
 
 
-def delete_message(idx, ser):
+def delete_message(idx, modem):
     """Usuń SMS o podanym indexie."""
-    send_at(f'AT+CMGD={idx}', ser)
+    modem.command(f'AT+CMGD={idx}')
 
 
-def send_sms(number, text, ser):
+def send_sms(number, text, modem):
     """Wyślij SMS na numer number z treścią text."""
-    send_at('AT+CMGS="{}"'.format(number), ser)
-    ser.write(text.encode() + b'\x1A')  # Ctrl+Z kończy wiadomość
-    # czekaj na potwierdzenie
-    time.sleep(5)
-    # opcjonalnie: odczytaj odpowiedź
-    resp = []
-    while ser.in_waiting:
-        resp.append(ser.readline().decode(errors='ignore').strip())
-    return resp
+    # czekaj na potwierdzenie +CMGS / OK (albo błąd)
+    return modem.send_sms(number, text).lines
 
 
 def main():
     ser = serial.Serial(SERIAL_PORT, BAUDRATE, timeout=1)
     time.sleep(1)
-    init_modem(ser)
+    modem = ATEngine(ser)
+    init_modem(modem)
     print("Modem zainicjalizowany, start pętli sprawdzania SMS...")
 
     try:
         while True:
             # 1) pobierz wszystkie SMS
-            lines = send_at('AT+CMGL="ALL"', ser, timeout=3)
-            msgs = parse_cmgl(lines)
+            resp = modem.command('AT+CMGL="ALL"', timeout=3)
+            msgs = parse_cmgl(resp.lines)
 
             # 2) przetwarzaj
             for m in msgs:
@@ -98,10 +82,10 @@ def main():
                 if (m['sender'] == TARGET_NUMBER and
                         m['text'].lower() == TRIGGER_TEXT.lower()):
                     print("-> Znaleziono komendę status – wysyłam odpowiedź")
-                    send_sms(TARGET_NUMBER, REPLY_TEXT, ser)
+                    send_sms(TARGET_NUMBER, REPLY_TEXT, modem)
 
                 # 3) usuń każdy odczytany SMS, aby zrobić miejsce
-                delete_message(m['index'], ser)
+                delete_message(m['index'], modem)
                 print(f"-> Usunięto SMS#{m['index']}")
 
             # 4) pauza przed następnym sprawdzeniem
@@ -0,0 +1,104 @@
+import datetime
+import json
+import os
+
+import numpy as np
+
+from pasieka.catalog import CATALOG_NAME, CHECKPOINT_DTYPE, Catalog, checkpoint_path, read_checkpoints
+from pasieka.logwriter import LogWriter
+from pasieka.pipeline import DiskWriter
+from pasieka.telemetry import format_log_line
+
+T0 = 1_750_000_000.0
+FRAME = 'M:{:.3f}kg T1:20.0C H1:50.0% T2:21.0C H2:55.0%'
+
+
+def write_log(cat, n, start=T0, close=True, io=None):
+    """n pomiarów co 6 s do nowego logu, jak ingest.Hive.write."""
+    path, entry = cat.next_log(datetime.date.fromtimestamp(start))
+    with LogWriter(path, 'none', io=io) as log:
+        for i in range(n):
+            ts = start + i * 6
+            offset, end = log.write(format_log_line(ts, FRAME.format(30 + i / 1000)))
+            cat.record(entry, ts, offset, end)
+    if close:
+        cat.close()
+    return path, entry
+
+
+def test_reload_keeps_entries_and_ranges(tmp_path):
+    cat = Catalog(str(tmp_path), checkpoint_rows=16)
+    write_log(cat, 100)
+    write_log(cat, 50, start=T0 + 86400)
+    again = Catalog(str(tmp_path), checkpoint_rows=16)
+    assert [(e.seq, e.rows, e.first_ts, e.last_ts, e.size) for e in again.sorted()] == \
+           [(e.seq, e.rows, e.first_ts, e.last_ts, e.size) for e in cat.sorted()]
+    assert again.next_seq == 3
+    samples = again.read_range(T0 + 300, T0 + 600)
+    assert samples['ts'].tolist() == [T0 + 300 + 6 * i for i in range(50)]
+
+
+def test_record_does_not_rewrite_head(tmp_path):
+    cat = Catalog(str(tmp_path), checkpoint_rows=16)
+    path, entry = write_log(cat, 0, close=False)
+    head = (tmp_path / CATALOG_NAME).read_bytes()
+    for i in range(1000):
+        cat.record(entry, T0 + i, i * 10, i * 10 + 10)
+    # punkty kontrolne idą do <log>.cp, głowa katalogu zostaje ta sama
+    assert (tmp_path / CATALOG_NAME).read_bytes() == head
+    assert len(read_checkpoints(path)) == 1000 // 16 + 1
+    assert len(head) < 200
+
+
+def test_recovers_open_log_after_crash(tmp_path):
+    cat = Catalog(str(tmp_path), checkpoint_rows=16)
+    path, entry = write_log(cat, 100, close=False)     # bez close(): głowa z chwili otwarcia logu
+    with open(checkpoint_path(path), 'ab') as f:
+        # punkt kontrolny, którego partia CSV nie zdążyła na kartę
+        f.write(np.array([(T0 + 9999, 112, os.path.getsize(path) + 100)],
+                         dtype=CHECKPOINT_DTYPE).tobytes())
+    again = Catalog(str(tmp_path), checkpoint_rows=16)
+    e = again.entries[entry.name]
+    assert (e.rows, e.first_ts, e.last_ts, e.size) == (100, T0, T0 + 99 * 6, os.path.getsize(path))
+    assert [cp[1] for cp in read_checkpoints(path)] == list(range(0, 100, 16))
+    assert len(again.read_range()) == 100
+
+
+def test_migrates_version_1(tmp_path):
+    cat = Catalog(str(tmp_path), checkpoint_rows=16)
+    path, entry = write_log(cat, 40)
+    checkpoints = read_checkpoints(path)
+    os.remove(checkpoint_path(path))
+    with open(tmp_path / CATALOG_NAME, 'w') as f:
+        json.dump({'version': 1, 'files': [{'seq': 1, 'date': entry.date, 'name': entry.name,
+                                            'first_ts': entry.first_ts, 'last_ts': entry.last_ts,
+                                            'rows': 40, 'size': entry.size, 'checkpoints': checkpoints}]}, f)
+    again = Catalog(str(tmp_path), checkpoint_rows=16)
+    assert read_checkpoints(path) == checkpoints
+    assert json.loads((tmp_path / CATALOG_NAME).read_text())['version'] == 2
+    assert again.entries[entry.name].rows == 40
+
+
+def test_rebuild_without_catalog(tmp_path):
+    cat = Catalog(str(tmp_path), checkpoint_rows=16)
+    write_log(cat, 70)
+    os.remove(tmp_path / CATALOG_NAME)
+    again = Catalog(str(tmp_path), checkpoint_rows=16)
+    assert [e.rows for e in again.sorted()] == [70]
+    assert again.next_log()[1].seq == 2
+
+
+def test_writes_go_through_disk_writer(tmp_path):
+    io = DiskWriter()
+    try:
+        cat = Catalog(str(tmp_path), checkpoint_rows=16, io=io)
+        before = io.submitted
+        path, entry = write_log(cat, 64, io=io)
+        assert io.drain(5)
+        # głowa (next_log, close) i punkty kontrolne przez wątek zapisu
+        assert io.submitted - before >= 2 + 64 // 16
+    finally:
+        io.close()
+    again = Catalog(str(tmp_path), checkpoint_rows=16)
+    assert again.entries[entry.name].rows == 64
+    assert len(read_checkpoints(path)) == 4
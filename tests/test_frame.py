@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+
+from pasieka import frame
+
+FRAMES = [frame.encode(1, 10, 31.25, 20.5, 55.0, 21.0, 60.1),
+          frame.encode(2, 11, -0.5, math.nan, 45.5, -3.2, math.nan, flags=frame.FLAG_BOOT),
+          frame.encode(1, 65535, 120.0, 35.0, 99.9, 34.9, 100.0)]
+
+
+def test_encode_size_and_crc():
+    data = FRAMES[0]
+    assert len(data) == frame.FRAME_SIZE == 20
+    assert frame.crc16(data[:-2]) == int.from_bytes(data[-2:], 'little')
+
+
+def test_decode_round_trip():
+    frames, rejected = frame.decode(b''.join(FRAMES))
+    assert rejected == 0
+    assert frames['hive'].tolist() == [1, 2, 1]
+    assert frames['seq'].tolist() == [10, 11, 65535]
+    samples = frame.to_samples(frames, 1000.0)
+    np.testing.assert_allclose(samples['mass'], [31.25, -0.5, 120.0])
+    assert math.isnan(samples['t1'][1]) and math.isnan(samples['h2'][1])
+    assert samples['t2'][1] == np.float32(-3.2)
+
+
+def test_decode_skips_garbage_and_rejects_bad_crc():
+    broken = bytearray(FRAMES[1])
+    broken[8] ^= 0x01
+    buf = b'\x00\xbe' + FRAMES[0] + b'xyz' + bytes(broken) + FRAMES[2] + b'\xbe\x01'
+    frames, rejected = frame.decode(buf)
+    assert frames['seq'].tolist() == [10, 65535]
+    assert rejected == 1
+
+
+def test_unpack_matches_decode():
+    buf = b'??' + b''.join(FRAMES)
+    frames, _ = frame.decode(buf)
+    unpacked, rejected = frame.unpack(buf)
+    assert rejected == 0
+    assert [f[4] for f in unpacked] == frames['seq'].tolist()
+    assert [f[5] for f in unpacked] == frames['mass'].tolist()
+
+
+def test_parse_line():
+    line = frame.encode_line(FRAMES[:2])
+    parsed = frame.parse_line(line, 5.0)
+    assert [(hive, seq, flags) for hive, seq, flags, _ in parsed] == [('1', 10, 0), ('2', 11, frame.FLAG_BOOT)]
+    assert parsed[0][3].mass == 31.25 and parsed[0][3].ts == 5.0
+    # uszkodzona linia binarna: None; tekst bez ramki: []; ramka tekstowa z ulem
+    one = frame.encode_line(FRAMES[:1])
+    assert frame.parse_line(one[:-4] + b'0000', 5.0) is None
+    assert frame.parse_line(one[:-1], 5.0) is None
+    assert len(frame.parse_line(line[:-4] + b'0000', 5.0)) == 1     # druga ramka z błędnym CRC
+    assert frame.parse_line(b'odbiornik gotowy', 5.0) == []
+    (hive, seq, _, sample), = frame.parse_line(b'UL:3 M:12.5kg T1:20.0C H1:50.0% T2:21.0C H2:55.0%', 5.0)
+    assert (hive, seq, sample.mass) == ('3', None, 12.5)
+
+
+def test_format_text_is_parsed_back():
+    _, seq, _, sample = frame.parse_line(frame.encode_line(FRAMES[:1]), 5.0)[0]
+    (hive, _, _, again), = frame.parse_line(frame.format_text('1', seq, sample).encode(), 5.0)
+    assert hive == '1' and again[1:] == sample[1:]
+
+
+def test_sequence_tracker():
+    t = frame.SequenceTracker()
+    assert t.check('1', 65534) == ('ok', 0)
+    assert t.check('1', 65535) == ('ok', 0)
+    assert t.check('1', 2) == ('gap', 2)            # przez zawinięcie: zgubione 0 i 1
+    assert t.check('1', 2) == ('duplicate', 0)
+    assert t.check('1', 1) == ('duplicate', 0)      # spóźniona starsza ramka
+    assert t.check('1', 0, frame.FLAG_BOOT) == ('restart', 0)
+    assert t.check('2', 7) == ('ok', 0)
+
+
+def test_sequence_report():
+    frames, _ = frame.decode(b''.join(frame.encode(4, s, 1, 1, 1, 1, 1) for s in (1, 2, 2, 5)))
+    assert frame.sequence_report(frames) == {'4': {'frames': 4, 'missing': 2, 'duplicates': 1, 'restarts': 0}}
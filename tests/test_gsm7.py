@@ -0,0 +1,77 @@
+from pasieka import gsm7, inbox
+
+DATE = '25/05/01,12:30:00+08'
+
+
+def test_pack_unpack_round_trip():
+    for fill in range(7):
+        septets = gsm7.encode('Ul 1: 31.2kg {ok} [x] ~ €')
+        assert gsm7.unpack(gsm7.pack(septets, fill), len(septets), fill) == septets
+
+
+def test_to_gsm7_and_fit():
+    assert gsm7.to_gsm7('Pszczoły żółte') == 'Pszczoly zolte'
+    assert gsm7.septets('a{b}') == 6
+    text = gsm7.fit('x' * 200)
+    assert gsm7.septets(text) == gsm7.SINGLE_SEGMENT and text.endswith('..')
+    assert gsm7.fit('krótko') == 'krotko'
+
+
+def test_split_keeps_extended_chars_whole():
+    parts = gsm7.split('a' * 152 + '{' + 'b' * 10)
+    assert parts == ['a' * 152, '{' + 'b' * 10]
+    assert all(gsm7.septets(p) <= gsm7.MULTI_SEGMENT for p in parts)
+
+
+def test_submit_single_and_multipart():
+    (pdu, length), = gsm7.submit_pdus('+48123456789', 'status ok', ref=7)
+    assert len(bytes.fromhex(pdu)) == length + 1      # + pusty adres SMSC
+    pdus = gsm7.submit_pdus('+48123456789', 'x' * 400, ref=7)
+    assert len(pdus) == 3
+    for seq, (pdu, length) in enumerate(pdus, 1):
+        tpdu = bytes.fromhex(pdu)[1:]
+        assert tpdu[0] & 0x40                           # TP-UDHI
+        assert bytes([5, 0, 3, 7, 3, seq]) in tpdu
+
+
+def test_deliver_round_trip():
+    for text in ('status', 'Masa [kg] {ul 2} ~ 30€', 'x' * 160):
+        pdu, _ = gsm7.deliver_pdu('+48123456789', text, DATE)
+        assert gsm7.parse_deliver(pdu) == ('+48123456789', DATE, text, None)
+
+
+def test_deliver_concat_round_trip():
+    pdu, _ = gsm7.deliver_pdu('+48500100200', 'druga część^', DATE, concat=(42, 2, 2))
+    sender, date, text, concat = gsm7.parse_deliver(pdu)
+    assert (sender, text, concat) == ('+48500100200', 'druga czesc^', (42, 2, 2))
+
+
+def listing(parts):
+    lines = []
+    for index, (text, concat) in enumerate(parts, 1):
+        pdu, length = gsm7.deliver_pdu('+48500100200', text, DATE, concat)
+        lines += [f'+CMGL: {index},0,,{length}', pdu]
+    return lines + ['OK']
+
+
+def test_assemble_out_of_order_parts():
+    records = inbox.parse_listing(listing([('świat', (9, 2, 2)), ('status', None), ('witaj ', (9, 2, 1))]))
+    assert [r.index for r in records] == [1, 2, 3]
+    messages = inbox.assemble(records)
+    assert [(m.text, m.complete, sorted(m.indices)) for m in messages] == \
+           [('witaj swiat', True, [1, 3]), ('status', True, [2])]
+
+
+def test_assemble_incomplete():
+    messages = inbox.assemble(inbox.parse_listing(listing([('a', (3, 3, 1)), ('c', (3, 3, 3))])))
+    assert [(m.text, m.complete, m.parts) for m in messages] == [('ac', False, 3)]
+
+
+def test_submit_requests_status_report():
+    # bez TP-SRR sieć nie przysyła +CDS i Outbox.on_cds nie widzi doręczenia
+    single, = gsm7.submit_pdus('+48123456789', 'status ok', ref=7)
+    parts = gsm7.submit_pdus('+48123456789', 'x' * 400, ref=7)
+    firsts = [bytes.fromhex(pdu)[1] for pdu, _ in [single] + parts]
+    assert firsts == [0x21] + [0x61] * 3
+    for first in firsts:
+        assert first & 0x03 == 0x01 and first & 0x20      # SMS-SUBMIT, TP-SRR
@@ -0,0 +1,106 @@
+import asyncio
+import math
+import os
+import shutil
+
+from pasieka import frame
+from pasieka.catalog import Catalog
+from pasieka.commands import CommandHandler
+from pasieka.ingest import DEFAULT_HIVE, Ingest, SourceStats
+from pasieka.pipeline import DiskWriter
+from pasieka.store import segment_path
+
+T0 = 1_750_000_000.0
+
+
+def route(ingest, lines, default=DEFAULT_HIVE):
+    stats = SourceStats('port')
+    for i, line in enumerate(lines):
+        ingest._route(stats, default, line, T0 + i)
+    return stats
+
+
+def test_stock_frame_reaches_primary_hive(tmp_path):
+    ingest = Ingest(str(tmp_path), [])
+    # MAIN.ino: HIVE_ID = 1
+    route(ingest, [frame.encode_line([frame.encode(1, s, 31.25, 20.5, 55.0, 21.0, 60.1)]) for s in (7, 8, 8)])
+    assert list(ingest.hives) == [DEFAULT_HIVE]
+    primary = ingest.hive(DEFAULT_HIVE)
+    assert primary.counts['duplicates'] == 1
+    reply = CommandHandler(primary.recent.latest, primary.rollup).handle('status')
+    assert reply.startswith('31.25kg T1 20.5C')
+    primary.close()
+    assert not os.path.exists(tmp_path / 'ul_1')
+
+
+def test_frame_hive_mapping(tmp_path):
+    ingest = Ingest(str(tmp_path), [], frame_hives={'1': 'lipa', '2': DEFAULT_HIVE})
+    route(ingest, [frame.encode_line([frame.encode(1, 1, 10, 20, 50, 20, 50),
+                                      frame.encode(2, 1, 11, 20, 50, 20, 50),
+                                      frame.encode(3, 1, 12, 20, 50, 20, 50)]),
+                   b'UL:1 M:13.000kg T1:20.0C H1:50.0% T2:21.0C H2:55.0%',
+                   b'M:14.000kg T1:20.0C H1:50.0% T2:21.0C H2:55.0%'], default='2')
+    assert sorted(ingest.hives) == ['2', '3', 'lipa', DEFAULT_HIVE]
+    assert ingest.latest('lipa').mass == 13.0
+    assert ingest.latest(DEFAULT_HIVE).mass == 11.0
+    assert ingest.latest('2').mass == 14.0      # tekst bez "UL:" - ul portu, nazwa bez mapowania
+    for h in ingest.hives.values():
+        h.close()
+
+
+def test_rollups_survive_power_loss(tmp_path):
+    ingest = Ingest(str(tmp_path), [])
+    lines = [f'M:{30 + i / 100:.3f}kg T1:20.0C H1:50.0% T2:21.0C H2:55.0%'.encode() for i in range(300)]
+    stats = SourceStats('port')
+    for i, line in enumerate(lines):
+        ingest._route(stats, DEFAULT_HIVE, line, T0 + 60 * i)
+    hive = ingest.hive(DEFAULT_HIVE)
+    hive.logfile.flush(sync=True)       # log na karcie, agregaty jeszcze w pamięci - i prąd znika
+    hive.store.flush()
+    day, = hive.rollup.table('day')
+    restarted = Ingest(str(tmp_path), []).hive(DEFAULT_HIVE)
+    again, = restarted.rollup.table('day')
+    assert again['mass_n'] == day['mass_n'] == 300
+    assert again['mass_last'] == day['mass_last'] and math.isclose(again['mass_sum'], day['mass_sum'])
+    assert len(restarted.rollup.table('minute')) == 300
+
+
+def test_failed_disk_write_reaches_hive(tmp_path, capsys):
+    async def main():
+        disk = DiskWriter()
+        ingest = Ingest(str(tmp_path), [], io=disk)
+        stats = SourceStats('port')
+        line = b'M:30.000kg T1:20.0C H1:50.0% T2:21.0C H2:55.0%'
+        for i in range(64):
+            ingest._route(stats, DEFAULT_HIVE, line, T0 + i)
+        hive = ingest.hive(DEFAULT_HIVE)
+        first, path = hive.entry, hive.log_path
+        disk.drain()
+        full = os.open('/dev/full', os.O_WRONLY)
+        os.dup2(full, hive.logfile._fd)     # karta pełna: kolejne partie logu nie trafiają na dysk
+        os.close(full)
+        for i in range(64, 128):
+            ingest._route(stats, DEFAULT_HIVE, line, T0 + i)
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if hive.counts['dropped']:
+                break
+        ingest._route(stats, DEFAULT_HIVE, line, T0 + 200)     # następna linia: nowy plik
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if first.rows == 64:
+                break
+        hive.close()
+        disk.close()
+        return hive, first, path
+
+    hive, first, path = asyncio.run(main())
+    assert hive.counts['dropped'] == 64 and hive.disk_error
+    assert 'Błąd zapisu na kartę: [Errno 28]' in capsys.readouterr().out
+    assert hive.entry is not first
+    # katalog opisuje to, co jest na karcie, nie to, co było zlecone
+    assert (first.rows, first.size) == (64, os.path.getsize(path))
+    # segmenty dostały wszystkie linie; z samego CSV katalog czyta tylko zapisane
+    assert len(Catalog(str(tmp_path)).read_range(T0, T0 + 300)) == 129
+    shutil.rmtree(segment_path(path))
+    assert len(Catalog(str(tmp_path)).read_range(T0, T0 + 300)) == 65
@@ -0,0 +1,185 @@
+import asyncio
+import errno
+import os
+import threading
+import time
+import tty
+
+import pytest
+
+from pasieka.aio import MAX_LINE, LineReader, open_serial
+from pasieka.ingest import Ingest
+from pasieka.pipeline import CLOSED, BoundedQueue, DiskWriter, write_all
+
+FRAME = b'M:30.000kg T1:20.0C H1:50.0% T2:21.0C H2:55.0%\n'
+
+
+def test_put_from_thread_blocks():
+    q = BoundedQueue(1)
+    q.put(1)
+    threading.Thread(target=lambda: (time.sleep(0.1), q.get())).start()
+    start = time.monotonic()
+    q.put(2)
+    assert time.monotonic() - start > 0.05
+    assert q.overflowed == 0
+
+
+def test_put_from_loop_never_blocks():
+    async def main():
+        q = BoundedQueue(2)
+        seen = []
+        q.add_listener(seen.append)
+        start = time.monotonic()
+        for i in range(6):
+            q.put(i)
+        assert time.monotonic() - start < 0.05
+        assert (len(q), q.overflowed, q.pressure) == (6, 4, True)
+        await asyncio.sleep(0)
+        assert seen == [True]
+        out = [q.get() for _ in range(6)]
+        await asyncio.sleep(0)
+        return out, seen, q
+
+    out, seen, q = asyncio.run(main())
+    assert out == list(range(6))        # kolejność zostaje mimo przepełnienia
+    assert seen == [True, False] and not q.pressure
+    q.close()
+    assert q.get() is CLOSED
+
+
+def test_spill_limit_then_overflow_keeps_order(tmp_path):
+    async def main():
+        q = BoundedQueue(2, 'spill', str(tmp_path / 'spill.bin'), spill_limit=200)
+        for i in range(30):
+            q.put(('write', 1, bytes([i]) * 20))
+        return q, [q.get()[2][0] for _ in range(30)]
+
+    q, out = asyncio.run(main())
+    assert out == list(range(30))
+    assert q.spilled > 0 and q.overflowed > 0
+    q.remove_spill()
+
+
+def test_transport_pause_reasons():
+    async def main():
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        reader = LineReader()
+        transport = await open_serial(os.ttyname(slave), 115200, reader)
+        try:
+            transport.pause_reading('disk')
+            transport.pause_reading()
+            transport.resume_reading()          # LineReader wznawia, ale karta nadal wstrzymuje
+            assert transport.paused
+            os.write(master, b'linia\n')
+            await asyncio.sleep(0.05)
+            assert reader.lines.qsize() == 0
+            transport.resume_reading('disk')
+            assert await asyncio.wait_for(reader.readline(), 1) == b'linia'
+        finally:
+            transport.close()
+            os.close(master)
+            os.close(slave)
+
+    asyncio.run(main())
+
+
+
+def test_line_reader_caps_buffer():
+    async def main():
+        reader = LineReader()
+        reader.data_received(b'szum' * MAX_LINE)        # zła prędkość portu: bajty bez \n
+        assert len(reader._buf) == 0 and reader.dropped == 1
+        reader.data_received(b'dalej szum\nlinia\n' + b'x' * (MAX_LINE + 1) + b'\nM:1\n')
+        return [reader.lines.get_nowait() for _ in range(reader.lines.qsize())], reader.dropped
+
+    assert asyncio.run(main()) == ([b'linia', b'M:1'], 2)
+
+def test_ingest_pauses_ports_on_disk_pressure(tmp_path):
+    async def main():
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        port = os.ttyname(slave)
+        pipe_r, pipe_w = os.pipe()
+        disk = DiskWriter(capacity=2)
+        # wątek zapisu utknie na zapisie do pełnego potoku - jak zawieszona karta
+        disk.put(('write', pipe_w, b'x' * (1 << 20)))
+        drained = threading.Thread(target=lambda: all(iter(lambda: os.read(pipe_r, 1 << 16), b'')))
+        ingest = Ingest(str(tmp_path), [port], rescan=0.05, io=disk)
+        task = asyncio.create_task(ingest.run())
+        try:
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if port in ingest._open_ports:
+                    break
+            transport, _ = ingest._open_ports[port]
+            for _ in range(200):
+                os.write(master, FRAME)
+                await asyncio.sleep(0.002)      # pętla działa dalej, mimo że karta stoi
+                if transport.paused:
+                    break
+            assert transport.paused and disk.queue.pressure
+            assert disk.queue.overflowed > 0
+            # karta wraca: kolejka się opróżnia, porty są czytane dalej
+            drained.start()
+            for _ in range(200):
+                await asyncio.sleep(0.01)
+                if not transport.paused:
+                    break
+            assert not transport.paused and not disk.queue.pressure
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            if not drained.is_alive():
+                drained.start()
+            disk.close()
+            os.close(pipe_w)        # koniec potoku - wątek czytający kończy
+            drained.join()
+            for fd in (master, slave, pipe_r):
+                os.close(fd)
+
+    asyncio.run(main())
+
+
+def test_write_all_finishes_short_writes(tmp_path, monkeypatch):
+    real_write = os.write
+    monkeypatch.setattr(os, 'write', lambda fd, data: real_write(fd, bytes(data[:3])))
+    fd = os.open(tmp_path / 'f', os.O_WRONLY | os.O_CREAT)
+    write_all(fd, b'0123456789')
+    os.close(fd)
+    assert (tmp_path / 'f').read_bytes() == b'0123456789'
+    full = os.open('/dev/full', os.O_WRONLY)
+    try:
+        with pytest.raises(OSError) as e:
+            write_all(full, b'x')
+        assert e.value.errno == errno.ENOSPC
+    finally:
+        os.close(full)
+
+
+def test_disk_client_reports_failures():
+    async def main():
+        disk = DiskWriter()
+        seen = []
+        client = disk.client(lambda op, exc: seen.append((op[0], exc and exc.errno)))
+        full = os.open('/dev/full', os.O_WRONLY)
+        try:
+            client.put(('write', full, b'abc'))
+            disk.put(('write', full, b'abc'))       # bez klienta: tylko licznik etapu
+            client.notify('gotowe')
+            client.release()
+            client.notify('po release')
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if len(seen) == 2:
+                    break
+            disk.drain()
+            await asyncio.sleep(0.01)
+        finally:
+            disk.close()
+            os.close(full)
+        return seen, disk.errors
+
+    seen, errors = asyncio.run(main())
+    assert seen == [('write', errno.ENOSPC), ('notify', None)]
+    assert errors == 2
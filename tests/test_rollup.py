@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+
+from pasieka.pipeline import DiskWriter
+from pasieka.rollup import DAY, RESOLUTIONS, ROW_DTYPE, Rollup, backfill, coalesce, load
+from pasieka.telemetry import SAMPLE_DTYPE, Sample
+
+T0 = 1_750_000_000.0
+
+
+def samples(n=3000, step=97.0):
+    rng = np.random.default_rng(1)
+    out = np.empty(n, dtype=SAMPLE_DTYPE)
+    out['ts'] = T0 + np.arange(n) * step
+    out['mass'] = 30 + np.cumsum(rng.normal(0, 0.01, n))
+    out['t1'] = rng.normal(20, 3, n)
+    out['h1'] = rng.normal(50, 5, n)
+    out['t2'] = rng.normal(21, 3, n)
+    out['h2'] = rng.normal(55, 5, n)
+    out['t1'][::17] = np.nan        # DHT bez odczytu
+    out['mass'][5:40] = np.nan
+    return out
+
+
+def assert_rows_equal(a, b):
+    assert a.dtype == b.dtype == ROW_DTYPE
+    assert len(a) == len(b)
+    for name in ROW_DTYPE.names:
+        np.testing.assert_allclose(a[name], b[name], rtol=1e-6, equal_nan=True, err_msg=name)
+
+
+def test_incremental_matches_backfill(tmp_path):
+    data = samples()
+    rollup = Rollup(str(tmp_path), flush_rows=7)
+    for row in data.tolist():
+        rollup.add(Sample(*row))
+    # przed zamknięciem: dysk + niezapisane + otwarty przedział
+    for name, width in RESOLUTIONS.items():
+        assert_rows_equal(rollup.table(name), backfill(data, width))
+    rollup.close()
+    for name, width in RESOLUTIONS.items():
+        assert_rows_equal(load(rollup.path(name)), backfill(data, width))
+
+
+def test_restart_rows_are_coalesced(tmp_path):
+    data = samples()
+    half = len(data) // 2 + 3
+    for part in (data[:half], data[half:]):
+        rollup = Rollup(str(tmp_path))
+        for row in part.tolist():
+            rollup.add(Sample(*row))
+        rollup.close()
+    assert_rows_equal(load(rollup.path('hour')), backfill(data, 3600))
+
+
+def test_coalesce_split_backfill():
+    data = samples()
+    rows = np.concatenate([backfill(part, DAY) for part in np.array_split(data, 5)])
+    assert_rows_equal(coalesce(rows), backfill(data, DAY))
+
+
+def test_empty_bucket_mean_is_nan():
+    data = samples(10)
+    data['h2'] = np.nan
+    row, = backfill(data, DAY)
+    assert row['h2_n'] == 0 and math.isnan(row['h2_min'])
+    assert row['mass_n'] == 5
+
+
+def test_crash_recovery_from_log_tail(tmp_path):
+    data = samples()
+    half = len(data) // 2
+    rollup = Rollup(str(tmp_path), flush_rows=10 ** 6, flush_interval=3600)
+    for row in data[:half].tolist():
+        rollup.add(Sample(*row))
+    rollup.flush()
+    for row in data[half:].tolist():
+        rollup.add(Sample(*row))
+    # zanik zasilania: wiersze z pamięci przepadły, a za stanem został urwany zapis
+    with open(rollup.path('minute'), 'ab') as f:
+        f.write(bytes(ROW_DTYPE.itemsize + 7))
+    again = Rollup(str(tmp_path))
+    assert again.covered['day'] <= again.covered['hour'] <= again.covered['minute'] <= data['ts'][half - 1]
+    again.restore(data[data['ts'] >= min(again.covered.values())])
+    for name, width in RESOLUTIONS.items():
+        assert_rows_equal(again.table(name), backfill(data, width))
+    again.close()
+    for name, width in RESOLUTIONS.items():
+        assert_rows_equal(load(again.path(name)), backfill(data, width))
+
+
+def test_clean_close_needs_no_restore(tmp_path):
+    data = samples(300)
+    rollup = Rollup(str(tmp_path))
+    for row in data.tolist():
+        rollup.add(Sample(*row))
+    rollup.close()
+    assert min(Rollup(str(tmp_path)).covered.values()) > data['ts'][-1]
+
+
+def test_closed_rows_flushed_on_interval(tmp_path):
+    data = samples(200)
+    rollup = Rollup(str(tmp_path), flush_interval=0)
+    for row in data.tolist():
+        rollup.add(Sample(*row))
+    on_disk = load(rollup.path('minute'))
+    assert len(on_disk) == len(backfill(data, 60)) - 1      # bez otwartej minuty
+    rollup.close()
+
+
+def test_writes_through_disk_writer(tmp_path):
+    disk = DiskWriter(capacity=4)
+    data = samples(500)
+    rollup = Rollup(str(tmp_path), flush_interval=0, io=disk)
+    for row in data.tolist():
+        rollup.add(Sample(*row))
+        assert len(rollup.table('minute')) == len(backfill(data[data['ts'] <= row[0]], 60))
+    disk.drain()
+    assert_rows_equal(rollup.table('hour'), backfill(data, 3600))
+    rollup.close()
+    disk.close()
+    assert_rows_equal(load(rollup.path('minute')), backfill(data, 60))
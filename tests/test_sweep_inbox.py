@@ -0,0 +1,57 @@
+import asyncio
+
+import merge1
+from pasieka.aio import open_serial
+from pasieka.fake_modem import FakeModem
+from pasieka.modem import AsyncATEngine
+
+SENDER = '+48600100200'
+
+
+async def sweep_twice(fake, pause):
+    modem = AsyncATEngine()
+    transport = await open_serial(fake.port, 115200, modem)
+    dispatcher = asyncio.create_task(modem.dispatch())
+    try:
+        await merge1.init_modem(modem)
+        await merge1.sweep_inbox(modem)
+        first = sorted(fake.inbox)
+        await asyncio.sleep(pause)
+        await merge1.sweep_inbox(modem)
+        return first, sorted(fake.inbox)
+    finally:
+        dispatcher.cancel()
+        transport.close()
+
+
+def run(monkeypatch, pause):
+    handled = []
+
+    async def handle_sms(sender, text, modem):
+        handled.append((sender, text))
+
+    monkeypatch.setattr(merge1, 'handle_sms', handle_sms)
+    monkeypatch.setattr(merge1, 'FRAGMENT_TIMEOUT', 0.3)
+    monkeypatch.setattr(merge1, 'fragments', {})
+    fake = FakeModem().start()
+    try:
+        fake.add_sms(SENDER, 'status')
+        fake.add_long_sms(SENDER, 'a' * 153 + 'b' * 153 + 'c' * 10, ref=5, missing=(2,))
+        first, second = asyncio.run(sweep_twice(fake, pause))
+    finally:
+        fake.stop()
+    return handled, first, second
+
+
+def test_incomplete_message_waits_within_timeout(monkeypatch):
+    handled, first, second = run(monkeypatch, 0.0)
+    assert handled == [(SENDER, 'status')]
+    assert len(first) == len(second) == 2          # obie obecne części czekają na SIM
+    assert len(merge1.fragments) == 1
+
+
+def test_incomplete_message_expires(monkeypatch):
+    handled, first, second = run(monkeypatch, 0.4)
+    assert handled == [(SENDER, 'status'), (SENDER, 'a' * 153 + 'c' * 10)]
+    assert len(first) == 2 and second == []
+    assert merge1.fragments == {}
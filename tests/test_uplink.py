@@ -0,0 +1,200 @@
+import asyncio
+import math
+import os
+import time
+
+import numpy as np
+import pytest
+
+from pasieka import uplink
+from pasieka.aio import open_serial
+from pasieka.fake_modem import FakeModem
+from pasieka.modem import AsyncATEngine
+from pasieka.pipeline import DiskWriter
+from pasieka.store import Segment
+from pasieka.telemetry import Sample
+
+T0 = 1_750_000_000.0
+
+
+def sample(i):
+    return Sample(T0 + 6 * i, 30 + i / 1000, 20.5 if i % 5 else math.nan, 50.0, 21.0, 55.0)
+
+
+def records(n, hives=('main', '2')):
+    out = np.zeros(n, dtype=uplink.SPOOL_DTYPE)
+    for i in range(n):
+        out[i]['hive'] = hives[i % len(hives)].encode()
+        for name, value in zip(uplink.FIELDS, sample(i)):
+            out[i][name] = value
+    return out
+
+
+def test_batch_round_trip():
+    recs = records(500, ('main', '2', '17'))
+    header, back = uplink.decode_batch(uplink.encode_batch(recs, 1000, 'pasieka', oldest=900))
+    assert (header['start'], header['end'], header['oldest'], header['station']) == (1000, 1500, 900, 'pasieka')
+    assert back['hive'].tolist() == recs['hive'].tolist()
+    for name in uplink.FIELDS:
+        np.testing.assert_allclose(back[name], recs[name], atol=0.06 if name == 'ts' else 1e-3, equal_nan=True)
+
+
+def test_decode_rejects_garbage():
+    data = bytearray(uplink.encode_batch(records(10), 0, 'pasieka'))
+    data[20] ^= 0xFF
+    with pytest.raises(ValueError):
+        uplink.decode_batch(bytes(data))
+
+
+def test_spool_ack_and_reopen(tmp_path):
+    spool = uplink.Spool(str(tmp_path), compact_rows=100)
+    for i in range(30):
+        spool.append('main', sample(i))
+    start, recs = spool.read(0, 10)
+    assert (start, len(recs), len(spool)) == (0, 10, 30)
+    spool.ack(10)
+    spool.close()
+    spool = uplink.Spool(str(tmp_path), compact_rows=100)
+    assert (spool.acked, spool.total, len(spool)) == (10, 30, 20)
+    start, recs = spool.read(spool.acked)
+    assert start == 10 and recs['ts'].tolist() == [T0 + 6 * i for i in range(10, 30)]
+
+
+def test_spool_compaction_keeps_numbering(tmp_path):
+    spool = uplink.Spool(str(tmp_path), compact_rows=100)
+    for i in range(250):
+        spool.append('main', sample(i))
+    spool.ack(120)
+    assert spool.base == 120
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['spool_120.bin', 'state.json']
+    spool.append('main', sample(250))
+    start, recs = spool.read(0)             # starsze niż base już nie ma
+    assert start == 120 and len(recs) == 131 and recs['ts'][-1] == T0 + 6 * 250
+    spool.ack(251)                          # wszystko potwierdzone: pusty plik od 251
+    spool.close()
+    spool = uplink.Spool(str(tmp_path), compact_rows=100)
+    assert (spool.base, spool.total, len(spool)) == (251, 251, 0)
+
+
+def test_spool_batches_appends(tmp_path):
+    spool = uplink.Spool(str(tmp_path), flush_rows=8)
+    for i in range(10):
+        spool.append('main', sample(i))
+    assert os.path.getsize(spool.path) == 8 * uplink.SPOOL_DTYPE.itemsize
+    assert len(spool.read(0)[1]) == 10          # read() dopisuje czekającą partię
+    spool.close()
+
+
+def test_spool_through_disk_writer(tmp_path):
+    disk = DiskWriter(capacity=4)
+    spool = uplink.Spool(str(tmp_path), compact_rows=100, flush_rows=16, io=disk)
+    for i in range(250):
+        spool.append('main', sample(i))
+    spool.flush()
+    disk.drain()
+    start, recs = spool.read(0)
+    assert (start, len(recs)) == (0, 250)
+    spool.ack(120)
+    spool.append('main', sample(250))
+    spool.flush()
+    disk.drain()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['spool_120.bin', 'state.json']
+    start, recs = spool.read(0)
+    assert start == 120 and len(recs) == 131 and recs['ts'][-1] == T0 + 6 * 250
+    spool.close()
+    disk.close()
+    spool = uplink.Spool(str(tmp_path), compact_rows=100)
+    assert (spool.base, spool.acked, spool.total) == (120, 120, 251)
+    spool.close()
+
+
+def test_spool_recovers_torn_record(tmp_path):
+    spool = uplink.Spool(str(tmp_path))
+    for i in range(5):
+        spool.append('main', sample(i))
+    spool.close()
+    with open(spool.path, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    assert uplink.Spool(str(tmp_path)).total == 5
+
+
+def test_receiver_trims_duplicates(tmp_path):
+    receiver = uplink.Receiver(str(tmp_path))
+    recs = records(20)
+    assert receiver.handle(uplink.encode_batch(recs[:15], 0, 'p')) == (200, {'ack': 15})
+    # powtórka z nakładką: zapisane są tylko rekordy od 15
+    assert receiver.handle(uplink.encode_batch(recs[10:], 10, 'p')) == (200, {'ack': 20})
+    assert receiver.handle(uplink.encode_batch(recs[18:], 18, 'p')) == (200, {'ack': 20})
+    # luka, a nadawca ma starsze rekordy: serwer prosi o cofnięcie
+    assert receiver.handle(uplink.encode_batch(recs[:5], 30, 'p', oldest=0)) == (409, {'ack': 20})
+    assert receiver.handle(b'nie partia')[0] == 400
+    stored = np.concatenate([Segment(str(tmp_path / 'p' / f'{h}.seg')).to_array() for h in ('main', '2')])
+    assert sorted(stored['ts'].tolist()) == sorted(recs['ts'].tolist())
+
+
+def open_bearer(tmp_path, fake):
+    async def main():
+        modem = AsyncATEngine()
+        transport = await open_serial(fake.port, 115200, modem)
+        dispatcher = asyncio.create_task(modem.dispatch())
+        up = uplink.Uplink(str(tmp_path), 'http://127.0.0.1:1/', modem=modem)
+        try:
+            bearer = asyncio.create_task(up._open_bearer(modem))
+            await asyncio.sleep(0.1)
+            start = time.monotonic()
+            resp = await modem.command('AT+CSQ')        # np. odpowiedź na SMS w trakcie łączenia
+            waited = time.monotonic() - start
+            await bearer
+            return resp.ok, waited
+        finally:
+            up.spool.close()
+            dispatcher.cancel()
+            transport.close()
+
+    fake.start()
+    try:
+        return asyncio.run(main())
+    finally:
+        fake.stop()
+
+
+def test_bearer_open_does_not_hold_modem(tmp_path, monkeypatch):
+    monkeypatch.setattr(uplink, 'BEARER_POLL', 0.2)
+    fake = FakeModem(bearer_delay=1.0)
+    ok, waited = open_bearer(tmp_path, fake)
+    assert ok and waited < 0.5
+    assert fake.bearer
+
+
+def test_bearer_open_fails_without_gprs(tmp_path):
+    with pytest.raises(uplink.UplinkError):
+        open_bearer(tmp_path, FakeModem(gprs=False))
+
+
+def test_modem_detached_during_bearer_poll(tmp_path, monkeypatch):
+    monkeypatch.setattr(uplink, 'BEARER_POLL', 0.1)
+    fake = FakeModem(bearer_delay=5.0).start()
+
+    async def main():
+        modem = AsyncATEngine()
+        transport = await open_serial(fake.port, 115200, modem)
+        up = uplink.Uplink(str(tmp_path), 'http://127.0.0.1:1/', retry_delay=60.0)
+        up.add('main', sample(0))
+        up.attach(modem)
+        task = asyncio.create_task(up.run())
+        try:
+            await asyncio.sleep(0.35)       # AT+SAPBR=1,1 wysłane, trwa pytanie o stan
+            up.attach(None)                 # port modemu padł (merge1.sms_listener)
+            transport.close()
+            await asyncio.sleep(0.3)
+            return task.done(), dict(up.counts), len(up.spool)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    try:
+        done, counts, pending = asyncio.run(main())
+    finally:
+        fake.stop()
+    assert not done                         # zadanie wysyłki żyje i czeka na modem
+    assert counts['failed'] == 1 and pending == 1